@@ -0,0 +1,2 @@
+# Benchmarks for discovery, tab build, settings I/O and apply at catalog scale.
+# Run with `python -m bench`; see bench/__main__.py for options.
@@ -0,0 +1,279 @@
+from __future__ import annotations
+import argparse, importlib, json, os, platform, shutil, statistics, sys, tempfile, time, tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+# Benchmark suite. Generates synthetic tweak packages (bench/catalog.py) and
+# times discovery, grouping, settings I/O, tab construction, plan building,
+# a full apply and an idle drift check against the in-memory registry backend
+# and a stand-in PowerShell host (bench/fakeps.py), so it runs on a headless
+# Linux box.
+#
+#   python -m bench [--sizes 10,1000,10000] [--repeat 5] [--output FILE] [--compare OLD]
+#
+# Output is JSON with sorted keys; results are keyed "<bench>/<size>" so two
+# runs can be diffed or compared with --compare.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+SCHEMA = 1
+DEFAULT_SIZES = (10, 1000, 10000)
+
+
+def measure(fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    runs: List[float] = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {"median_ms": round(statistics.median(runs) * 1000, 3), "min_ms": round(min(runs) * 1000, 3), "runs": len(runs)}
+
+
+def footprint(fn: Callable[[], Any], setup: Optional[Callable[[], Any]] = None) -> float:
+    """KiB still allocated by fn's result (and anything it imported) once it returns."""
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        keep = fn()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del keep
+    return round(size / 1024, 1)
+
+
+def _purge(package: str):
+    from tweaks import manifest
+    for name in [m for m in sys.modules if m == package or m.startswith(package + ".")]:
+        del sys.modules[name]
+    for name in [m for m in manifest._resolved if m.startswith(package + ".")]:
+        del manifest._resolved[name]
+    importlib.invalidate_caches()
+
+
+def _qt_app():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PySide6.QtWidgets import QApplication
+    except ImportError:
+        return None
+    return QApplication.instance() or QApplication([])
+
+
+def bench_size(size: int, repeat: int, workdir: str) -> Dict[str, Any]:
+    from bench.catalog import generate, generate_data
+    from tweaks import load_all_tweaks, group_by_category, manifest
+    from tweaks.journal import run_group
+    from tweaks.plan import Plan
+    from tweaks.watch import Watcher, applied_baseline
+    from tweaks.catalog import load_catalog
+    from tweaks.search import SearchIndex
+    from tweaks.state import CategoryState
+    from util import registry as r
+    from util.settings import SettingsStore
+
+    package = f"bench_catalog_{size}"
+    paths = [generate(workdir, package, size)]
+    os.environ["TWEAKER_CACHE_DIR"] = os.path.join(workdir, f"cache-{size}")
+    cache = manifest.manifest_path()
+    out: Dict[str, Any] = {}
+
+    def discover(use_manifest: bool):
+        return load_all_tweaks(use_manifest=use_manifest, package=package, paths=paths)
+
+    def drop_manifest():
+        _purge(package)
+        if os.path.exists(cache):
+            os.remove(cache)
+
+    # Compile bytecode once so the import numbers are not dominated by the first run
+    discover(False)
+    out["load_all_tweaks.import"] = measure(lambda: discover(False), repeat, setup=lambda: _purge(package))
+    out["load_all_tweaks.manifest_cold"] = measure(lambda: discover(True), repeat, setup=drop_manifest)
+    discover(True)
+    out["load_all_tweaks.manifest_warm"] = measure(lambda: discover(True), repeat, setup=lambda: _purge(package))
+
+    # The same tweaks as a declarative catalog
+    data = generate_data(os.path.join(workdir, f"data-{size}"), package, size)
+    out["load_catalog"] = measure(lambda: load_catalog(data), repeat)
+    out["memory_kb"] = {
+        "modules": footprint(lambda: discover(False), setup=lambda: _purge(package)),
+        "catalog": footprint(lambda: load_catalog(data)),
+    }
+
+    _purge(package)
+    tweaks = discover(False)
+    out["group_by_category"] = measure(lambda: group_by_category(tweaks), repeat)
+    grouped = group_by_category(tweaks)
+
+    out["search_index"] = measure(lambda: SearchIndex(tweaks), repeat)
+    index = SearchIndex(tweaks)
+
+    def keystrokes():
+        # Typing a query letter by letter, as the search box sees it
+        for q in ("s", "sy", "syn", "synthetic", "synthetic t", "synthetic toggle", "synthetic toggle 1"):
+            index.categories(index.search(q))
+
+    out["search_keystrokes"] = measure(keystrokes, repeat)
+
+    settings_file = os.path.join(workdir, f"settings-{size}.json")
+    settings = SettingsStore(settings_file)
+    states = [CategoryState(cat, items, settings) for cat, items in grouped.items()]
+
+    def fresh_store():
+        # Empty store each run, so every save writes the whole profile
+        nonlocal settings
+        if os.path.exists(settings_file):
+            os.remove(settings_file)
+        settings = SettingsStore(settings_file)
+        for s in states:
+            s.settings = settings
+
+    def load_all():
+        for s in states:
+            s.load_settings()
+
+    def save_all():
+        with settings.batch():
+            for s in states:
+                s.save_settings()
+
+    load_all()
+    out["save_settings"] = measure(save_all, repeat, setup=fresh_store)
+    out["save_settings"]["writes"] = settings.writes
+    out["settings_open"] = measure(lambda: SettingsStore(settings_file), repeat)
+    out["load_settings"] = measure(load_all, repeat)
+
+    app = _qt_app()
+    if app is None:
+        out["tab_build"] = {"skipped": "PySide6 not installed"}
+    else:
+        from tweaks.base import TweakTab
+        built: List[Any] = []
+
+        def build():
+            built.extend(TweakTab(s.category, s.tweaks, settings, state=s) for s in states)
+
+        def teardown():
+            for w in built:
+                w.deleteLater()
+            built.clear()
+            app.processEvents()
+
+        out["tab_build"] = measure(build, repeat, setup=teardown)
+        teardown()
+
+        # The whole catalog as one category: cost of opening a very large tab
+        big = CategoryState("bench", tweaks, settings)
+
+        def build_one():
+            tab = TweakTab("bench", tweaks, settings, state=big)
+            tab.resize(900, 700)
+            tab.show()
+            app.processEvents()
+            built.append(tab)
+
+        out["tab_build.one_category"] = measure(build_one, repeat, setup=teardown)
+        teardown()
+
+    failed: set = set()
+
+    owner = {t.id: s for s in states for t in s.tweaks}
+
+    def build_plan() -> Plan:
+        return Plan.build([(t, s.value(t)) for s in states for t in s.pending_tweaks(force=True)])
+
+    out["plan_build"] = measure(build_plan, repeat)
+
+    def apply_all():
+        # GUI apply_all without the dialogs: one plan over every category, forced, then recorded
+        plan = build_plan()
+        with run_group():
+            for (t, ok, _), step in zip(plan.execute(), plan.steps):
+                if ok:
+                    owner[t.id].mark_applied(t, step.value)
+                else:
+                    failed.add(t.id)
+
+    out["apply_all"] = measure(apply_all, repeat, setup=lambda: r.set_backend(r.MemoryBackend()))
+    out["apply_all"]["failed"] = len(failed)
+
+    # One drift-watch check right after the apply: nothing drifted, so just the batched probe read
+    apply_all()
+    watcher = Watcher(applied_baseline(states))
+    out["watch_check_idle"] = measure(watcher.check, repeat)
+    out["watch_check_idle"]["watched"] = watcher.check().watched
+    _purge(package)
+    return out
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> str:
+    lines = [f"{'benchmark':<40} {'old ms':>10} {'new ms':>10} {'ratio':>7}"]
+    for key in sorted(set(old.get("results", {})) | set(new["results"])):
+        a = old.get("results", {}).get(key, {}).get("median_ms")
+        b = new["results"].get(key, {}).get("median_ms")
+        if a is None or b is None:
+            lines.append(f"{key:<40} {a if a is not None else '-':>10} {b if b is not None else '-':>10} {'-':>7}")
+        else:
+            lines.append(f"{key:<40} {a:>10.2f} {b:>10.2f} {b / a if a else 0:>7.2f}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m bench", description="Benchmark tweak discovery, settings, tabs and apply.")
+    ap.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Comma-separated catalog sizes")
+    ap.add_argument("--repeat", type=int, default=5, help="Runs per benchmark (median and min are reported)")
+    ap.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    ap.add_argument("--compare", metavar="OLD", help="Print a comparison against an earlier results file")
+    args = ap.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    from util import ps, registry as r
+    ps.configure_pool([sys.executable, "-m", "bench.fakeps"], dialect="powershell").warm()
+    backend = r.get_backend()
+    workdir = tempfile.mkdtemp(prefix="tweaker-bench-")
+    saved_env = {k: os.environ.get(k) for k in ("TWEAKER_CACHE_DIR", "TWEAKER_JOURNAL_DIR")}
+    os.environ["TWEAKER_JOURNAL_DIR"] = os.path.join(workdir, "journal")
+    sys.path.insert(0, workdir)
+    results: Dict[str, Any] = {}
+    try:
+        for size in sizes:
+            for name, res in bench_size(size, max(1, args.repeat), workdir).items():
+                results[f"{name}/{size}"] = res
+    finally:
+        r.set_backend(backend)
+        ps.shutdown_pool()
+        sys.path.remove(workdir)
+        for k, v in saved_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "schema": SCHEMA,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "sizes": sizes,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print(compare(json.load(f), report), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+from __future__ import annotations
+import json, os
+from typing import Any, Dict, List
+
+# Generates synthetic tweak packages shaped like the real modules: literal
+# Tweak(...) entries, registry writes on HKCU/HKLM, a PowerShell fragment on
+# every tenth tweak and lookup-table probes on toggles. generate_data writes
+# the same tweaks as a declarative catalog (tweaks.catalog).
+
+TWEAKS_PER_MODULE = 100
+TWEAKS_PER_CATEGORY = 40
+TYPES = ("toggle", "dropdown", "number", "slider", "text")
+
+_HEADER = '''from __future__ import annotations
+from typing import List
+from tweaks.model import Tweak, reg_probe
+from util import registry as r
+from util.psbatch import PSFragment
+
+KEY = r"SOFTWARE\\TweakerBench\\{module}"
+OPTIONS = ["Alpha", "Beta", "Gamma", "Delta"]
+
+
+def get_tweaks() -> List[Tweak]:
+    return [
+'''
+
+_FOOTER = '''    ]
+'''
+
+
+def _tweak(i: int) -> str:
+    kind = TYPES[i % len(TYPES)]
+    root = "r.HKEY_CURRENT_USER" if i % 2 == 0 else "r.HKEY_LOCAL_MACHINE"
+    name = f"V{i:05d}"
+    lines = [
+        "        Tweak(",
+        f'            id="t{i:05d}",',
+        f'            category="Category {i // TWEAKS_PER_CATEGORY:03d}",',
+        f'            label="Synthetic tweak {i}",',
+        f'            type="{kind}",',
+        f'            tooltip="Synthetic {kind} tweak number {i} for benchmarks.",',
+    ]
+    if kind == "toggle":
+        lines.append("            default=True,")
+        value = "int(v)"
+    elif kind == "dropdown":
+        lines += ['            options=OPTIONS,', '            default="Alpha",']
+        value = "OPTIONS.index(v)"
+    elif kind in ("number", "slider"):
+        lines += ["            minimum=0, maximum=100, step=5,", "            default=50,"]
+        value = "int(v)"
+    else:
+        lines.append(f'            default="value {i}",')
+        value = "str(v)"
+    if i % 10 == 0:
+        lines.append(f'            ps_fragment=lambda v: PSFragment(f"Set-Item -Path Env:BENCH_{i} -Value \'{{v}}\'"),')
+    else:
+        reg_type = ", r.REG_SZ" if kind == "text" else ""
+        lines.append(f'            reg_ops=lambda v: [r.set_op({root}, KEY, "{name}", {value}{reg_type})],')
+        if kind == "toggle":
+            lines.append(f'            probe=reg_probe({root}, KEY, "{name}", {{1: True, 0: False}}),')
+    lines.append("        ),")
+    return "\n".join(lines) + "\n"
+
+
+def generate(root: str, package: str, count: int) -> str:
+    """Write a package with `count` tweaks under root; returns the package directory."""
+    pkg_dir = os.path.join(root, package)
+    os.makedirs(pkg_dir, exist_ok=True)
+    with open(os.path.join(pkg_dir, "__init__.py"), "w", encoding="utf-8") as f:
+        f.write("")
+    modules: List[str] = []
+    for start in range(0, count, TWEAKS_PER_MODULE):
+        module = f"mod_{start // TWEAKS_PER_MODULE:04d}"
+        body = "".join(_tweak(i) for i in range(start, min(count, start + TWEAKS_PER_MODULE)))
+        with open(os.path.join(pkg_dir, module + ".py"), "w", encoding="utf-8") as f:
+            f.write(_HEADER.replace("{module}", module) + body + _FOOTER)
+        modules.append(module)
+    return pkg_dir
+
+
+def _entry(i: int) -> Dict[str, Any]:
+    kind = TYPES[i % len(TYPES)]
+    e: Dict[str, Any] = {
+        "id": f"t{i:05d}",
+        "category": f"Category {i // TWEAKS_PER_CATEGORY:03d}",
+        "label": f"Synthetic tweak {i}",
+        "type": kind,
+        "tooltip": f"Synthetic {kind} tweak number {i} for benchmarks.",
+    }
+    options = ["Alpha", "Beta", "Gamma", "Delta"]
+    if kind == "toggle":
+        e["default"] = True
+    elif kind == "dropdown":
+        e["options"], e["default"] = options, "Alpha"
+    elif kind in ("number", "slider"):
+        e.update(minimum=0, maximum=100, step=5, default=50)
+    else:
+        e["default"] = f"value {i}"
+    if i % 10 == 0:
+        e["powershell"] = {"script": f"Set-Item -Path Env:BENCH_{i} -Value {{value}}"}
+        return e
+    module = f"mod_{i // TWEAKS_PER_MODULE:04d}"
+    e["registry"] = [{"hive": "HKCU" if i % 2 == 0 else "HKLM", "path": f"SOFTWARE\\TweakerBench\\{module}",
+                      "name": f"V{i:05d}", "kind": "sz" if kind == "text" else "dword"}]
+    if kind == "toggle":
+        e["values"] = {"true": 1, "false": 0}
+    elif kind == "dropdown":
+        e["values"] = {o: n for n, o in enumerate(options)}
+    return e
+
+
+def generate_data(root: str, name: str, count: int) -> str:
+    """Write the same `count` tweaks as one catalog file; returns its path."""
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, name + ".tweaks.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "tweaks": [_entry(i) for i in range(count)]}, f, indent=1)
+    return path
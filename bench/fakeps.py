@@ -0,0 +1,30 @@
+from __future__ import annotations
+import base64, re, sys
+
+# Stand-in PowerShell host for benchmarks off Windows.
+#
+# Speaks the util.ps stdin protocol (PowerShell framing): each input line
+# carries a base64 script and a sentinel token. Every batched fragment in the
+# script is reported as succeeded, then the sentinel is printed with status 0.
+
+_SCRIPT = re.compile(r"FromBase64String\('([A-Za-z0-9+/=]*)'\)")
+_TOKEN = re.compile(r"WriteLine\('(__W11T_DONE__[0-9a-f]+) '")
+_RESULT = re.compile(r"'__W11T_RESULT__ (\d+) '")
+
+
+def main():
+    ok = base64.b64encode(b"ok").decode("ascii")
+    for line in sys.stdin:
+        token = _TOKEN.search(line)
+        if token is None:
+            continue
+        m = _SCRIPT.search(line)
+        script = base64.b64decode(m.group(1)).decode("utf-8", "replace") if m else ""
+        out = [f"__W11T_RESULT__ {idx} 0 {ok}" for idx in _RESULT.findall(script)]
+        out.append(f"{token.group(1)} 0")
+        sys.stdout.write("\n".join(out) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+from __future__ import annotations
+from typing import Dict, List, Optional
+import threading
+from PySide6.QtCore import Qt, QSize, QSettings, QObject, QTimer, Signal
+from PySide6.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QTabWidget, QStatusBar,
+    QToolBar, QMessageBox, QFileDialog, QLineEdit, QSystemTrayIcon, QMenu, QStyle
+)
+from PySide6.QtGui import QAction
+
+from tweaks.base import ActionPreview, Tweak, Category, TweakTab, build_tab_widget, run_side_effects
+from tweaks.state import CategoryState
+from tweaks.constraints import ConstraintEngine
+from tweaks import effects
+from tweaks import load_all_tweaks, group_by_category
+from tweaks.probe import get_engine
+from tweaks.deploy import export_script
+from tweaks.journal import last_journal, run_group
+from tweaks.search import Matches, SearchIndex
+from tweaks.executor import apply_with_progress, run_in_background
+from tweaks.plan import Plan
+from tweaks.watch import Watcher, WatchResult, applied_baseline
+from util.ps import checkpoint, restart_explorer
+from util.admin import ensure_admin, is_admin
+from util import timing
+from util.settings import SettingsStore
+
+APP_ORG = "YourOrg"
+APP_NAME = "Windows 11 Tweaker (Modular)"
+
+
+def open_settings() -> SettingsStore:
+    store = SettingsStore()
+    if not store.existed:
+        # First run on the JSON store: carry the QSettings profile over (same keys)
+        store.migrate_from(QSettings(APP_ORG, APP_NAME))
+    return store
+
+
+class _ProbeSignals(QObject):
+    # Emitted from the probe and drift-watch threads; delivered on the GUI thread
+    done = Signal(dict)
+    watched = Signal(object)  # WatchResult
+
+
+class MainWindow(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle(APP_NAME)
+        self.resize(1000, 720)
+
+        self.settings = open_settings()
+
+        # Load tweaks; bad catalogs are skipped and reported once the window is up
+        catalog_errors: List[str] = []
+        tweaks: List[Tweak] = load_all_tweaks(errors=catalog_errors)
+        self.grouped: Dict[Category, List[Tweak]] = group_by_category(tweaks)
+        self.all_tweaks = tweaks
+        with timing.phase("search_index", tweaks=len(tweaks)):
+            self.index = SearchIndex(tweaks)
+        self.matches: Optional[Matches] = None  # ids matching the search box; None when it is empty
+
+        # Tabs start as empty placeholders and are built on first activation;
+        # global actions work on the per-category state instead of widgets.
+        self.states: Dict[Category, CategoryState] = {
+            cat: CategoryState(cat, items, self.settings) for cat, items in self.grouped.items()
+        }
+        # Cross-field rules, re-checked per edit; validation reads its cached results
+        self.constraints = ConstraintEngine(self.states.values())
+        self.live: Dict[str, object] = {}
+        self.tabs = QTabWidget()
+        self.tabs.setDocumentMode(True)
+        self.tab_widgets: Dict[Category, TweakTab] = {}
+        self._placeholders: Dict[Category, QWidget] = {}
+        for cat in self.grouped:
+            holder = QWidget()
+            QVBoxLayout(holder).setContentsMargins(0, 0, 0, 0)
+            self.tabs.addTab(holder, cat)
+            self._placeholders[cat] = holder
+        self.tabs.currentChanged.connect(self._ensure_tab)
+
+        self.search = QLineEdit()
+        self.search.setPlaceholderText("Search tweaks…")
+        self.search.setClearButtonEnabled(True)
+        self.search.textChanged.connect(self._apply_filter)
+
+        container = QWidget()
+        lay = QVBoxLayout(container)
+        lay.addWidget(self.search)
+        lay.addWidget(self.tabs)
+        container.setObjectName("card")
+        self.setCentralWidget(container)
+
+        tb = QToolBar("Main")
+        tb.setIconSize(QSize(20, 20))
+        self.addToolBar(tb)
+
+        actCheckpoint = QAction("Create Restore Point", self)
+        actCheckpoint.triggered.connect(self.create_restore_point)
+        tb.addAction(actCheckpoint)
+
+        actApplyAll = QAction("Apply All", self)
+        actApplyAll.triggered.connect(lambda: self.apply_all())
+        tb.addAction(actApplyAll)
+
+        self.actForce = QAction("Force re-apply all", self)
+        self.actForce.setCheckable(True)
+        self.actForce.setToolTip("Apply every tweak, not only those changed since the last apply")
+        tb.addAction(self.actForce)
+
+        actSave = QAction("Save", self)
+        actSave.setToolTip("Save choices without applying")
+        actSave.triggered.connect(self.save_all)
+        tb.addAction(actSave)
+
+        actReset = QAction("Reset All", self)
+        actReset.triggered.connect(self.reset_all)
+        tb.addAction(actReset)
+
+        sb = QStatusBar()
+        self.setStatusBar(sb)
+        self.toast(f"Loaded {len(tweaks)} tweak(s)")
+
+        self.apply_styles()
+
+        # Secondary toolbar with extra actions
+        tb2 = QToolBar("Actions")
+        tb2.setIconSize(QSize(20, 20))
+        self.addToolBar(tb2)
+
+        actRevertAll = QAction("Revert All", self)
+        actRevertAll.setToolTip("Reload saved settings (discard unsaved changes)")
+        actRevertAll.triggered.connect(self.revert_all)
+        tb2.addAction(actRevertAll)
+
+        actCheckState = QAction("Check System State", self)
+        actCheckState.setToolTip("Read current values from the machine and mark settings that differ")
+        actCheckState.triggered.connect(lambda: self.check_system_state(refresh=True))
+        tb2.addAction(actCheckState)
+
+        actLoadState = QAction("Load From System", self)
+        actLoadState.setToolTip("Set controls to the values currently active on this machine")
+        actLoadState.triggered.connect(self.load_system_state)
+        tb2.addAction(actLoadState)
+
+        actRollback = QAction("Roll Back Last Apply", self)
+        actRollback.setToolTip("Restore the registry values the last apply changed (from its journal)")
+        actRollback.triggered.connect(self.rollback_last_apply)
+        tb2.addAction(actRollback)
+
+        actExportScript = QAction("Export Script…", self)
+        actExportScript.setToolTip("Save the current choices as a standalone PowerShell script for other machines")
+        actExportScript.triggered.connect(self.export_script)
+        tb2.addAction(actExportScript)
+
+        actRestartExplorer = QAction("Restart Explorer", self)
+        actRestartExplorer.setToolTip("Restart Windows Explorer to apply UI changes")
+        actRestartExplorer.triggered.connect(self.on_restart_explorer)
+        tb2.addAction(actRestartExplorer)
+
+        # Drift watch: re-applies applied settings that the system changed back
+        self.actWatch = QAction("Watch for Drift", self)
+        self.actWatch.setCheckable(True)
+        self.actWatch.setToolTip("Periodically re-apply settings that something (e.g. a Windows update) changed back")
+        self.actWatch.toggled.connect(self.set_watching)
+        tb2.addAction(self.actWatch)
+
+        self._probe = _ProbeSignals(self)
+        self._probe.done.connect(self._on_probe_done)
+        self._probe.watched.connect(self._on_watch_result)
+        self.watcher = Watcher(applied_baseline(list(self.states.values())), on_result=self._probe.watched.emit)
+        self.tray = self._make_tray()
+        watch = self.settings.value("General/Watch", False)
+        self.actWatch.setChecked(watch is True or str(watch).lower() == "true")
+        self._ensure_tab(self.tabs.currentIndex())
+        self.check_system_state()
+        if catalog_errors:
+            QTimer.singleShot(0, lambda: QMessageBox.warning(
+                self, "Catalogs skipped", "These tweak catalogs were not loaded:\n\n" + "\n".join(catalog_errors)))
+
+    def toast(self, msg: str):
+        self.statusBar().showMessage(msg, 3000)
+
+    def apply_styles(self):
+        with timing.phase("apply_styles"):
+            self._apply_styles()
+
+    def _apply_styles(self):
+        self.setStyleSheet(
+            """
+            QMainWindow { background: #f5f7fb; }
+            #card { background: rgba(255,255,255,0.92); border-radius: 18px; margin: 12px; }
+            QGroupBox { background: rgba(255,255,255,0.85); border: 1px solid #e6eaf2; border-radius: 14px; margin-top: 12px; padding: 10px; }
+            QGroupBox::title { subcontrol-origin: margin; subcontrol-position: top left; padding: 4px 8px; color: #334155; font-weight: 600; }
+            QLabel.section { font-size: 14pt; font-weight: 700; color: #1f2937; margin: 6px 0 4px 2px; }
+            QLabel.pill-info, QLabel.pill-hint, QLabel.pill-warn { border-radius: 10px; padding: 8px 10px; margin: 8px 0; }
+            QTabWidget::pane { border: 0px; margin: 6px; }
+            QTabBar::tab { background: rgba(255,255,255,0.85); border: 1px solid #e6eaf2; padding: 8px 14px; margin-right: 6px; border-top-left-radius: 12px; border-top-right-radius: 12px; color: #334155; }
+            QTabBar::tab:selected { background: #ffffff; color: #111827; }
+            QPushButton { background: #ffffff; border: 1px solid #dbe2ee; padding: 8px 14px; border-radius: 12px; }
+            QPushButton:hover { border-color: #bcd0f7; }
+            QPushButton:pressed { background: #f1f5ff; }
+            QTableView { background: #ffffff; border: 1px solid #e6eaf2; border-radius: 10px; selection-background-color: #eef4ff; selection-color: #111827; }
+            QHeaderView::section { background: transparent; border: 0px; border-bottom: 1px solid #e6eaf2; padding: 6px 8px; color: #64748b; font-weight: 600; }
+            QComboBox, QSpinBox, QLineEdit { background: #ffffff; border: 1px solid #dbe2ee; border-radius: 10px; padding: 6px 10px; }
+            QSlider::groove:horizontal { height: 6px; background: #e6eaf2; border-radius: 3px; }
+            QSlider::handle:horizontal { width: 16px; height: 16px; margin: -6px 0; background: #ffffff; border: 1px solid #bcd0f7; border-radius: 8px; }
+            *[drift="true"] { border: 1px solid #f59e0b; color: #b45309; }
+            QStatusBar { background: rgba(255,255,255,0.8); border-top: 1px solid #e6eaf2; }
+            """
+        )
+
+    def _ensure_tab(self, index: int) -> Optional[TweakTab]:
+        if index < 0:
+            return None
+        cat = list(self.grouped)[index]
+        tabw = self.tab_widgets.get(cat)
+        if tabw is None:
+            holder = self._placeholders[cat]
+            with timing.phase("build_tab_widget", category=cat):
+                tabw = build_tab_widget(cat, self.grouped[cat], self.settings, parent=holder, state=self.states[cat])
+            holder.layout().addWidget(tabw)
+            self.tab_widgets[cat] = tabw
+            if self.live:
+                tabw.show_live_state(self.live)
+            if self.matches is not None:
+                tabw.filter(self.matches)
+        return tabw
+
+    def _apply_filter(self, text: str):
+        """Hide non-matching rows and categories in place; tabs are not rebuilt."""
+        self.matches = self.index.search(text)
+        counts = self.index.categories(self.matches)
+        for i, cat in enumerate(self.grouped):
+            self.tabs.setTabVisible(i, cat in counts)
+        for tab in self.tab_widgets.values():
+            tab.filter(self.matches)
+        if self.matches is None:
+            return
+        cur = self.tabs.currentIndex()
+        if counts and (cur < 0 or not self.tabs.isTabVisible(cur)):
+            self.tabs.setCurrentIndex(next(i for i, cat in enumerate(self.grouped) if cat in counts))
+        self.toast(f"{len(self.matches)} tweak(s) in {len(counts)} categor{'y' if len(counts) == 1 else 'ies'} match")
+
+    def _refresh_tabs(self):
+        for tab in self.tab_widgets.values():
+            tab.refresh()
+            if self.live:
+                tab.show_live_state(self.live)
+
+    # ----- Global actions -----
+    def build_plan(self, force: bool = False) -> Plan:
+        """One plan for every tab's pending tweaks; raises ValueError when the values are inconsistent.
+
+        Resolving may run PowerShell queries (network tweaks diff the adapters),
+        so the plan is built off the GUI thread.
+        """
+        ok, msg = self.constraints.check()
+        if not ok:
+            raise ValueError(msg)
+        items = [(t, state.value(t)) for state in self.states.values() for t in state.pending_tweaks(force)]
+        plan = run_in_background(self, "Preparing", lambda: Plan.build(items))
+        if isinstance(plan, tuple):  # Plan.build itself raised: (False, error)
+            raise ValueError(f"building the plan failed: {plan[1]}")
+        return plan
+
+    def check_system_state(self, refresh: bool = False):
+        """Probe live values off the GUI thread; tabs are marked when the result arrives."""
+        tweaks = list(self.all_tweaks)
+        threading.Thread(
+            target=lambda: self._probe.done.emit(get_engine().read_all(tweaks, refresh=refresh)),
+            daemon=True,
+        ).start()
+
+    def _on_probe_done(self, live: dict):
+        self.live = live
+        for tab in self.tab_widgets.values():
+            tab.show_live_state(live)
+        drifted = sum(len(state.drifted(live)) for state in self.states.values())
+        self.toast(f"{drifted} setting(s) differ from the system" if drifted else "All probed settings match the system")
+
+    # ----- Drift watch / tray -----
+    def _make_tray(self) -> Optional[QSystemTrayIcon]:
+        if not QSystemTrayIcon.isSystemTrayAvailable():
+            return None
+        tray = QSystemTrayIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_ComputerIcon), self)
+        tray.setToolTip(APP_NAME)
+        menu = QMenu(self)
+        menu.addAction("Show", self._show_from_tray)
+        menu.addAction(self.actWatch)
+        menu.addAction("Check Now", self.watcher.check_now)
+        menu.addSeparator()
+        menu.addAction("Quit", QApplication.quit)
+        tray.setContextMenu(menu)
+        tray.activated.connect(lambda reason: reason == QSystemTrayIcon.ActivationReason.Trigger and self._show_from_tray())
+        tray.show()
+        return tray
+
+    def _show_from_tray(self):
+        self.showNormal()
+        self.raise_()
+        self.activateWindow()
+
+    def notify(self, title: str, msg: str):
+        if self.tray is not None and not self.isVisible():
+            self.tray.showMessage(title, msg)
+        else:
+            self.toast(msg)
+
+    def set_watching(self, on: bool):
+        self.settings.setValue("General/Watch", on)
+        if on:
+            self.watcher.start()
+            self.toast("Watching for drift")
+        else:
+            self.watcher.stop()
+            self.toast("Drift watch stopped")
+
+    def _on_watch_result(self, res: WatchResult):
+        if not res.drifted:
+            return
+        # Failed writes leave the tweak drifted, so they are among the stuck ones
+        msg = f"Re-applied {len(res.drifted) - len(res.stuck)} drifted setting(s)"
+        if res.stuck:
+            msg += f"; not holding, no longer re-applied: {', '.join(t.label for t, _, _ in res.stuck)}"
+        self.notify("Settings drifted", msg)
+        self.check_system_state(refresh=True)
+
+    def closeEvent(self, event):
+        if self.tray is not None and self.watcher.running():
+            # Keep watching from the tray; Quit in its menu exits
+            event.ignore()
+            self.hide()
+            self.tray.showMessage(APP_NAME, "Still watching for drift in the background.")
+            return
+        self.watcher.stop()
+        super().closeEvent(event)
+
+    def load_system_state(self):
+        for state in self.states.values():
+            state.load_live(self.live)
+        self._refresh_tabs()
+        self.toast("Loaded current values from the system (not saved)")
+
+    def rollback_last_apply(self):
+        j = last_journal()
+        if j is None:
+            QMessageBox.information(self, "Roll Back", "There is no apply to roll back.")
+            return
+        ids = j.tweak_ids()
+        answer = QMessageBox.question(self, "Roll Back", f"Restore the previous registry values of {len(ids)} tweak(s) from the last apply?")
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        ok, out = j.rollback()
+        wanted = set(ids)
+        with self.settings.batch():
+            for state in self.states.values():
+                for t in state.tweaks:
+                    if t.id in wanted:
+                        state.forget_applied(t)
+        get_engine().invalidate()
+        self.check_system_state(refresh=True)
+        if ok:
+            self.toast(f"Rolled back: {out}")
+        else:
+            QMessageBox.warning(self, "Roll Back", f"Failed: {out}")
+
+    def export_script(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export PowerShell Script", "tweaks.ps1", "PowerShell script (*.ps1)")
+        if not path:
+            return
+        items = [(t, state.value(t)) for state in self.states.values() for t in state.tweaks]
+        ok, out = export_script(items, path)
+        if ok:
+            self.toast(f"Exported {len(items)} tweak(s) to {path}")
+        else:
+            QMessageBox.warning(self, "Export Script", out)
+
+    def create_restore_point(self):
+        if not is_admin():
+            ok, msg = ensure_admin()
+            if not ok:
+                QMessageBox.information(self, "Elevation", msg)
+                return
+        ok, out = run_in_background(self, "Creating restore point", lambda: checkpoint("Before Windows11Tweaker ApplyAll"))
+        QMessageBox.information(self, "Restore Point", out if ok else f"Failed: {out}")
+
+    def apply_all(self, force: Optional[bool] = None):
+        if force is None:
+            force = self.actForce.isChecked()
+        if not is_admin():
+            ok, msg = ensure_admin()
+            if not ok:
+                QMessageBox.information(self, "Elevation", msg)
+                return
+        try:
+            plan = self.build_plan(force)
+        except ValueError as e:
+            QMessageBox.warning(self, "Validation error", str(e))
+            return
+        if not plan.steps:
+            self.save_all()
+            self.toast("Nothing changed since the last apply")
+            return
+        if not ActionPreview(plan.actions(), self, plan=plan).exec():
+            return
+        owner = {t.id: state for state in self.states.values() for t in state.tweaks}
+        with self.settings.batch():
+            for state in self.states.values():
+                state.save_settings()
+        # One journal, so one rollback undoes the whole Apply All; side effects
+        # (Explorer restart, policy refresh) run once, after every write
+        with run_group(), effects.deferred() as keys:
+            results = apply_with_progress(self, plan, "Applying all tabs")
+        failures: List[str] = []
+        for (t, ok, out), step in zip(results, plan.steps):
+            if ok:
+                owner[t.id].mark_applied(t, step.value)
+            else:
+                failures.append(f"[{t.category}] {t.label}: {out}")
+        self.settings.sync()
+        if failures:
+            QMessageBox.critical(self, "Some actions failed", "\n".join(failures))
+        else:
+            self.toast(f"All tabs applied ({len(results)} tweak(s))")
+        run_side_effects(self, self.settings, keys)
+
+    def save_all(self):
+        with self.settings.batch():  # one file write for every category
+            for state in self.states.values():
+                state.save_settings()
+        self.toast("All settings saved (no actions executed)")
+
+    def reset_all(self):
+        for state in self.states.values():
+            state.load_defaults()
+        self._refresh_tabs()
+        self.toast("All tabs reset to defaults")
+
+    def revert_all(self):
+        for state in self.states.values():
+            if state.loaded():
+                state.load_settings()
+        self._refresh_tabs()
+        self.toast("All tabs reverted to saved settings")
+
+    def on_restart_explorer(self):
+        ok, out = run_in_background(self, "Restarting Explorer", restart_explorer)
+        QMessageBox.information(self, "Restart Explorer", out if ok else f"Failed: {out}")
+
+
+def run_gui(argv=None):
+    import sys
+    app = QApplication(sys.argv if argv is None else argv)
+    app.setOrganizationName(APP_ORG)
+    app.setApplicationName(APP_NAME)
+    with timing.phase("startup"):
+        w = MainWindow()
+        w.show()
+    if timing.enabled():
+        w.statusBar().showMessage(f"Startup: {timing.summary()} (trace: {timing.dump()})", 10000)
+    sys.exit(app.exec())
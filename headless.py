@@ -0,0 +1,242 @@
+from __future__ import annotations
+import json, sys, time
+from typing import Any, Dict, List, Optional, Tuple
+
+from tweaks import effects, load_all_tweaks
+from tweaks.model import Tweak, coerce_value, strict_value
+from tweaks.constraints import check_values
+from tweaks.plan import Plan
+from tweaks.watch import MIN_INTERVAL, Watcher, WatchResult
+from tweaks.probe import get_engine
+from tweaks.deploy import export_script, write_script
+from tweaks.journal import rollback_last
+from util.admin import is_admin
+from util.settings import SettingsStore
+
+# Headless runs for scripted/fleet use. Never imports PySide6.
+#
+# A profile is JSON, either {"values": {...}} or the mapping itself, keyed by
+# "Category/id" (the same layout as the saved settings) or by bare tweak id.
+# --script compiles the profile (or the saved settings) into a standalone
+# PowerShell script instead of applying it; --rollback undoes the registry
+# writes of the last apply from its journal. Profiles that break a tweak
+# constraint are rejected as bad input. Applies go through one Plan
+# (tweaks/plan.py); --save-plan writes it for review instead of applying,
+# --plan runs (or with --dry-run previews) a saved one. Side effects
+# (Explorer restart, policy refresh) run once after all writes unless
+# --skip-side-effects. Applied values are recorded in the saved settings
+# (".applied"), as the GUI records them. --watch keeps running and re-applies
+# applied tweaks (or with --profile, the profile's values) that drift
+# (tweaks/watch.py), printing one JSON line per check; with --dry-run it only
+# reports the drift.
+# Results are printed as JSON; exit code 0 = all ok, 1 = some tweak failed, 2 = bad input.
+
+EXIT_OK, EXIT_FAILED, EXIT_USAGE = 0, 1, 2
+
+
+def settings_key(t: Tweak) -> str:
+    return f"{t.category}/{t.id}"
+
+
+def load_profile(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    values = data.get("values", data) if isinstance(data, dict) else None
+    if not isinstance(values, dict):
+        raise ValueError("profile must be a JSON object of setting values")
+    return values
+
+
+def resolve_profile(tweaks: List[Tweak], values: Dict[str, Any], include_defaults: bool = False) -> Tuple[List[Tuple[Tweak, Any]], List[str]]:
+    """Match profile keys to tweaks; returns ([(tweak, value)], unknown keys).
+
+    Raises ValueError naming every key whose value the tweak doesn't accept (no fallback to the default).
+    """
+    by_key: Dict[str, Tweak] = {}
+    for t in tweaks:
+        by_key[settings_key(t)] = t
+        by_key.setdefault(t.id, t)
+    chosen: Dict[str, Tuple[Tweak, Any]] = {}
+    unknown: List[str] = []
+    invalid: List[str] = []
+    for k, v in values.items():
+        t = by_key.get(k)
+        if t is None:
+            unknown.append(k)
+            continue
+        try:
+            chosen[settings_key(t)] = (t, strict_value(t, v))
+        except ValueError as e:
+            invalid.append(f"{k}: {e}")
+    if invalid:
+        raise ValueError("invalid profile values: " + "; ".join(invalid))
+    if include_defaults:
+        for t in tweaks:
+            chosen.setdefault(settings_key(t), (t, t.default))
+    order = {settings_key(t): i for i, t in enumerate(tweaks)}
+    return sorted(chosen.values(), key=lambda tv: order[settings_key(tv[0])]), unknown
+
+
+def check_items(tweaks: List[Tweak], items: List[Tuple[Tweak, Any]]):
+    """Raise ValueError when the chosen values break a constraint (rules over unchosen tweaks are skipped)."""
+    ok, msg = check_values(tweaks, {t.id: v for t, v in items})
+    if not ok:
+        raise ValueError(msg)
+
+
+def _entry(t: Tweak, value: Any, **extra) -> Dict[str, Any]:
+    return {"key": settings_key(t), "label": t.label, "value": value, **extra}
+
+
+def export_values(tweaks: List[Tweak]) -> Dict[str, Any]:
+    """Current machine values of every probed tweak, in profile layout."""
+    live = get_engine().read_all(tweaks, refresh=True)
+    return {settings_key(t): live[t.id] for t in tweaks if t.id in live}
+
+
+def saved_values(tweaks: List[Tweak]) -> List[Tuple[Tweak, Any]]:
+    """Every tweak with its value from the saved settings (default if never saved)."""
+    store = SettingsStore()
+    return [(t, coerce_value(t, store.value(settings_key(t), t.default))) for t in tweaks]
+
+
+def applied_values(tweaks: List[Tweak]) -> List[Tuple[Tweak, Any]]:
+    """Every tweak that was applied, with its last applied value (the drift watch baseline)."""
+    store = SettingsStore()  # re-read each time: the GUI may have applied since
+    out: List[Tuple[Tweak, Any]] = []
+    for t in tweaks:
+        raw = store.value(settings_key(t) + ".applied")
+        if raw is not None:
+            out.append((t, coerce_value(t, raw)))
+    return out
+
+
+def mark_applied(results: List[Tuple[Tweak, Any, bool]]):
+    """Record the value of every successful (tweak, value, ok) as applied, as the GUI does after an apply."""
+    store = SettingsStore()
+    with store.batch():
+        for t, value, ok in results:
+            if ok:
+                store.setValue(settings_key(t) + ".applied", value)
+
+
+def forget_applied(tweaks: List[Tweak], ids: List[str]):
+    """Drop the applied markers of rolled back tweaks so the next apply sees them as pending."""
+    store = SettingsStore()
+    wanted = set(ids)
+    with store.batch():
+        for t in tweaks:
+            if t.id in wanted:
+                store.remove(settings_key(t) + ".applied")
+
+
+def watch(tweaks: List[Tweak], args) -> int:
+    """Watch for drift until interrupted; one JSON line per check (appended to --output when given).
+
+    The baseline is the applied values, or the profile's values with --profile.
+    """
+    if args.plan or args.save_plan or args.script or args.export or args.rollback:
+        raise ValueError("--watch only combines with --profile, --dry-run, --skip-side-effects and --watch-interval")
+    if args.profile:
+        items, unknown = resolve_profile(tweaks, load_profile(args.profile), args.all)
+        if unknown:
+            raise ValueError(f"unknown profile keys: {', '.join(unknown)}")
+        check_items(tweaks, items)
+        baseline = lambda: items
+    else:
+        baseline = lambda: applied_values(tweaks)
+    sink = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+
+    def report(res: WatchResult):
+        wanted = {t.id: v for t, v, _ in res.drifted}
+        line = {"mode": "watch", "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "ok": all(ok for _, ok, _ in res.results) and all(ok for _, ok, _ in res.side_effects),
+                "watched": res.watched,
+                "drifted": [_entry(t, v, live=live) for t, v, live in res.drifted],
+                "results": [_entry(t, wanted.get(t.id), ok=ok, message=msg) for t, ok, msg in res.results],
+                "stuck": [_entry(t, v, live=live) for t, v, live in res.stuck],
+                "side_effects": [{"effect": k, "ok": ok, "message": msg} for k, ok, msg in res.side_effects],
+                "next_check": round(res.interval, 1)}
+        sink.write(json.dumps(line, default=str) + "\n")
+        sink.flush()
+
+    watcher = Watcher(baseline, min_interval=args.watch_interval or MIN_INTERVAL,
+                      reapply=not args.dry_run, side_effects=not args.skip_side_effects, on_result=report)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
+    return EXIT_OK
+
+
+def run(args) -> int:
+    out: Dict[str, Any]
+    code = EXIT_OK
+    try:
+        tweaks = load_all_tweaks()
+        if args.watch:
+            return watch(tweaks, args)
+        if args.export:
+            out = {"mode": "export", "ok": True, "values": export_values(tweaks)}
+        elif args.rollback:
+            ok, msg, ids = rollback_last()
+            if ids:
+                forget_applied(tweaks, ids)
+            out = {"mode": "rollback", "ok": ok, "message": msg, "tweaks": ids}
+            code = EXIT_OK if ok else EXIT_FAILED
+        elif args.script:
+            if args.profile:
+                items, unknown = resolve_profile(tweaks, load_profile(args.profile), args.all)
+            else:
+                items, unknown = saved_values(tweaks), []
+            check_items(tweaks, items)
+            if args.script == "-":
+                write_script(items, sys.stdout)
+                return EXIT_OK
+            ok, msg = export_script(items, args.script)
+            if not ok:
+                raise OSError(msg)
+            out = {"mode": "script", "ok": True, "path": args.script, "tweaks": len(items), "unknown": unknown}
+        else:
+            if args.plan:
+                plan, unknown = Plan.load(args.plan, tweaks), []
+                check_items(tweaks, plan.items())
+            elif args.profile:
+                items, unknown = resolve_profile(tweaks, load_profile(args.profile), args.all)
+                check_items(tweaks, items)
+                plan = Plan.build(items, offline=bool(args.save_plan))
+            else:
+                raise ValueError("--profile or --plan is required unless --export is given")
+            if args.save_plan:
+                ok, msg = plan.save(args.save_plan)
+                if not ok:
+                    raise OSError(msg)
+                out = {"mode": "plan", "ok": True, "path": args.save_plan, "tweaks": len(plan.steps),
+                       "writes": plan.writes(), "dropped": plan.dropped, "unknown": unknown}
+            elif args.dry_run:
+                out = {"mode": "preview", "ok": True, "unknown": unknown,
+                       "actions": [_entry(s.tweak, s.value, target=s.target or None) for s in plan.steps],
+                       "dropped": plan.dropped, "side_effects": plan.side_effects()}
+            else:
+                with effects.deferred() as keys:
+                    results = plan.execute()
+                mark_applied([(s.tweak, s.value, r_ok) for s, (_, r_ok, _) in zip(plan.steps, results)])
+                done = [] if args.skip_side_effects else effects.run(keys)
+                ok = all(r_ok for _, r_ok, _ in results) and all(e_ok for _, e_ok, _ in done)
+                out = {"mode": "apply", "ok": ok, "elevated": is_admin(), "unknown": unknown,
+                       "results": [_entry(s.tweak, s.value, ok=r_ok, message=msg) for s, (_, r_ok, msg) in zip(plan.steps, results)],
+                       "side_effects": [{"effect": k, "ok": e_ok, "message": msg} for k, e_ok, msg in done],
+                       "skipped_side_effects": keys if args.skip_side_effects else []}
+                code = EXIT_OK if ok else EXIT_FAILED
+    except (OSError, ValueError) as e:
+        out, code = {"ok": False, "error": str(e)}, EXIT_USAGE
+    text = json.dumps(out, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+    return code
@@ -1,199 +1,51 @@
 from __future__ import annotations
-from typing import Dict, List
-from PySide6.QtCore import Qt, QSize, QSettings
-from PySide6.QtWidgets import (
-    QApplication, QMainWindow, QWidget, QVBoxLayout, QTabWidget, QStatusBar,
-    QToolBar, QMessageBox
-)
-from PySide6.QtGui import QAction
-
-from tweaks.base import Tweak, Category, build_tab_widget
-from tweaks import load_all_tweaks, group_by_category
-from util.ps import checkpoint, restart_explorer
-from util.admin import ensure_admin, is_admin
-
-APP_ORG = "YourOrg"
-APP_NAME = "Windows 11 Tweaker (Modular)"
-
-
-class MainWindow(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle(APP_NAME)
-        self.resize(1000, 720)
-
-        self.settings = QSettings(APP_ORG, APP_NAME)
-
-        # Load tweaks
-        tweaks: List[Tweak] = load_all_tweaks()
-        self.grouped: Dict[Category, List[Tweak]] = group_by_category(tweaks)
-
-        self.tabs = QTabWidget()
-        self.tabs.setDocumentMode(True)
-        self.tab_widgets = {}
-        for cat, items in self.grouped.items():
-            tabw = build_tab_widget(cat, items, self.settings, parent=self)
-            self.tabs.addTab(tabw, cat)
-            self.tab_widgets[cat] = tabw
-
-        container = QWidget()
-        lay = QVBoxLayout(container)
-        lay.addWidget(self.tabs)
-        container.setObjectName("card")
-        self.setCentralWidget(container)
-
-        tb = QToolBar("Main")
-        tb.setIconSize(QSize(20, 20))
-        self.addToolBar(tb)
-
-        actCheckpoint = QAction("Create Restore Point", self)
-        actCheckpoint.triggered.connect(self.create_restore_point)
-        tb.addAction(actCheckpoint)
-
-        actApplyAll = QAction("Apply All", self)
-        actApplyAll.triggered.connect(self.apply_all)
-        tb.addAction(actApplyAll)
-
-        actSave = QAction("Save", self)
-        actSave.setToolTip("Save choices without applying")
-        actSave.triggered.connect(self.save_all)
-        tb.addAction(actSave)
-
-        actReset = QAction("Reset All", self)
-        actReset.triggered.connect(self.reset_all)
-        tb.addAction(actReset)
-
-        sb = QStatusBar()
-        self.setStatusBar(sb)
-        self.toast(f"Loaded {len(tweaks)} tweak(s)")
-
-        self.apply_styles()
-
-        # Secondary toolbar with extra actions
-        tb2 = QToolBar("Actions")
-        tb2.setIconSize(QSize(20, 20))
-        self.addToolBar(tb2)
-
-        actRevertAll = QAction("Revert All", self)
-        actRevertAll.setToolTip("Reload saved settings (discard unsaved changes)")
-        actRevertAll.triggered.connect(self.revert_all)
-        tb2.addAction(actRevertAll)
-
-        actRestartExplorer = QAction("Restart Explorer", self)
-        actRestartExplorer.setToolTip("Restart Windows Explorer to apply UI changes")
-        actRestartExplorer.triggered.connect(self.on_restart_explorer)
-        tb2.addAction(actRestartExplorer)
-
-    def toast(self, msg: str):
-        self.statusBar().showMessage(msg, 3000)
-
-    def apply_styles(self):
-        self.setStyleSheet(
-            """
-            QMainWindow { background: #f5f7fb; }
-            #card { background: rgba(255,255,255,0.92); border-radius: 18px; margin: 12px; }
-            QGroupBox { background: rgba(255,255,255,0.85); border: 1px solid #e6eaf2; border-radius: 14px; margin-top: 12px; padding: 10px; }
-            QGroupBox::title { subcontrol-origin: margin; subcontrol-position: top left; padding: 4px 8px; color: #334155; font-weight: 600; }
-            QLabel.section { font-size: 14pt; font-weight: 700; color: #1f2937; margin: 6px 0 4px 2px; }
-            QLabel.pill-info, QLabel.pill-hint, QLabel.pill-warn { border-radius: 10px; padding: 8px 10px; margin: 8px 0; }
-            QTabWidget::pane { border: 0px; margin: 6px; }
-            QTabBar::tab { background: rgba(255,255,255,0.85); border: 1px solid #e6eaf2; padding: 8px 14px; margin-right: 6px; border-top-left-radius: 12px; border-top-right-radius: 12px; color: #334155; }
-            QTabBar::tab:selected { background: #ffffff; color: #111827; }
-            QPushButton { background: #ffffff; border: 1px solid #dbe2ee; padding: 8px 14px; border-radius: 12px; }
-            QPushButton:hover { border-color: #bcd0f7; }
-            QPushButton:pressed { background: #f1f5ff; }
-            QComboBox, QSpinBox, QLineEdit { background: #ffffff; border: 1px solid #dbe2ee; border-radius: 10px; padding: 6px 10px; }
-            QSlider::groove:horizontal { height: 6px; background: #e6eaf2; border-radius: 3px; }
-            QSlider::handle:horizontal { width: 16px; height: 16px; margin: -6px 0; background: #ffffff; border: 1px solid #bcd0f7; border-radius: 8px; }
-            QStatusBar { background: rgba(255,255,255,0.8); border-top: 1px solid #e6eaf2; }
-            """
-        )
-
-    # ----- Global actions -----
-    def gather_all_actions(self) -> List[str]:
-        actions: List[str] = []
-        for tab in self.tab_widgets.values():
-            ok, msg = tab.validate()
-            if not ok:
-                raise ValueError(msg)
-            actions += tab.collect_actions()
-        return actions
-
-    def create_restore_point(self):
-        if not is_admin():
-            ok, msg = ensure_admin()
-            if not ok:
-                QMessageBox.information(self, "Elevation", msg)
-                return
-        ok, out = checkpoint("Before Windows11Tweaker ApplyAll")
-        QMessageBox.information(self, "Restore Point", out if ok else f"Failed: {out}")
-
-    def apply_all(self):
-        if not is_admin():
-            ok, msg = ensure_admin()
-            if not ok:
-                QMessageBox.information(self, "Elevation", msg)
-                return
-        try:
-            _ = self.gather_all_actions()
-        except ValueError as e:
-            QMessageBox.warning(self, "Validation error", str(e))
-            return
-        for tab in self.tab_widgets.values():
-            tab.apply()
-        self.toast("All tabs applied")
-        self.ask_restart_explorer()
-
-    def save_all(self):
-        for tab in self.tab_widgets.values():
-            tab.save_settings()
-        self.toast("All settings saved (no actions executed)")
-
-    def reset_all(self):
-        for tab in self.tab_widgets.values():
-            tab.load_defaults()
-        self.toast("All tabs reset to defaults")
-
-    def revert_all(self):
-        for tab in self.tab_widgets.values():
-            tab.load_settings()
-        self.toast("All tabs reverted to saved settings")
-
-    def on_restart_explorer(self):
-        ok, out = restart_explorer()
-        QMessageBox.information(self, "Restart Explorer", out if ok else f"Failed: {out}")
-
-    def ask_restart_explorer(self):
-        # Honor persisted preference
-        ask = self.settings.value("General/AskRestartExplorer", True)
-        if not (ask is True or str(ask).lower() == "true"):
-            return
-        box = QMessageBox(self)
-        box.setIcon(QMessageBox.Icon.Question)
-        box.setWindowTitle("Restart Explorer?")
-        box.setText("Some changes may require restarting Windows Explorer to take effect.")
-        box.setInformativeText("Restart Explorer now?")
-        yes = box.addButton("Yes", QMessageBox.ButtonRole.YesRole)
-        no = box.addButton("No", QMessageBox.ButtonRole.NoRole)
-        from PySide6.QtWidgets import QCheckBox
-        cb = QCheckBox("Don't ask again")
-        box.setCheckBox(cb)
-        box.exec()
-        if box.clickedButton() == yes:
-            self.on_restart_explorer()
-        if cb.isChecked():
-            self.settings.setValue("General/AskRestartExplorer", False)
-            self.settings.sync()
-
-
-def main():
-    import sys
-    app = QApplication(sys.argv)
-    app.setOrganizationName(APP_ORG)
-    app.setApplicationName(APP_NAME)
-    w = MainWindow()
-    w.show()
-    sys.exit(app.exec())
+import argparse, sys
+from typing import List, Optional
+
+# Entry point: the Qt GUI by default, or a Qt-free headless run with --headless.
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="main", description="Windows 11 Tweaker")
+    p.add_argument("--headless", action="store_true", help="run without the GUI (never loads Qt)")
+    p.add_argument("--profile", help="JSON profile of setting values (headless)")
+    p.add_argument("--dry-run", action="store_true", help="preview the actions without applying them (headless)")
+    p.add_argument("--export", action="store_true", help="print the machine's current values as a profile (headless)")
+    p.add_argument("--script", metavar="PATH",
+                   help="compile the profile (or the saved settings) into a standalone PowerShell script; '-' for stdout (headless)")
+    p.add_argument("--rollback", action="store_true", help="undo the registry writes of the last apply from its journal (headless)")
+    p.add_argument("--save-plan", metavar="PATH", help="write the execution plan for the profile instead of applying it (headless)")
+    p.add_argument("--plan", metavar="PATH", help="apply (or with --dry-run, preview) a saved execution plan (headless)")
+    p.add_argument("--all", action="store_true", help="also apply defaults for tweaks missing from the profile (headless)")
+    p.add_argument("--skip-side-effects", action="store_true",
+                   help="don't restart Explorer/services or refresh policy after applying (headless)")
+    p.add_argument("--watch", action="store_true",
+                   help="keep running and re-apply applied settings that drift; one JSON line per check (headless)")
+    p.add_argument("--watch-interval", type=float, metavar="SECONDS",
+                   help="shortest time between drift checks; clean checks back off from it (headless, default 300)")
+    p.add_argument("--output", help="write the JSON result to a file instead of stdout (headless)")
+    p.add_argument("--trace", nargs="?", const="", metavar="PATH",
+                   help="record startup/apply phase timings as a JSON trace (also via TWEAKER_TRACE)")
+    p.add_argument("--metrics", metavar="PATH",
+                   help="write apply/registry/PowerShell metrics after each apply and on exit: Prometheus textfile, or JSON for *.json (also via TWEAKER_METRICS)")
+    # Qt consumes its own options (e.g. -platform), so unknown ones are passed through
+    args, _ = p.parse_known_args(argv)
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    if args.trace is not None:
+        from util import timing
+        timing.enable(args.trace or None)
+    if args.metrics:
+        from util import metrics
+        metrics.enable(args.metrics)
+    if args.headless:
+        from headless import run
+        sys.exit(run(args))
+    from gui import run_gui
+    run_gui()
 
 
 if __name__ == "__main__":
@@ -1,27 +1,49 @@
 from __future__ import annotations
-import importlib, pkgutil
-from typing import List, Dict
-from .base import Tweak, Category
+import importlib, os, pkgutil
+from typing import Dict, Iterable, List, Optional
+from .model import Tweak, Category
+from util.timing import phase
 
 __all__ = ["load_all_tweaks", "group_by_category"]
 
+# Support modules living in this package that don't export tweaks
+_INTERNAL_MODULES = {"base", "model", "pipeline", "probe", "executor", "state", "manifest", "deploy", "journal", "search", "catalog", "constraints", "effects", "plan", "watch"}
 
-def load_all_tweaks() -> List[Tweak]:
-    tweaks: List[Tweak] = []
-    pkg = __name__
-    for _, modname, ispkg in pkgutil.iter_modules(__path__):
-        if ispkg or modname in {"base"}:  # skip internal helper
-            continue
-        mod = importlib.import_module(f"{pkg}.{modname}")
-        if hasattr(mod, "get_tweaks"):
-            tweaks.extend(mod.get_tweaks())
-    return tweaks
+
+def load_all_tweaks(use_manifest: bool = True, package: Optional[str] = None, paths: Optional[Iterable[str]] = None,
+                    errors: Optional[List[str]] = None) -> List[Tweak]:
+    """Discover tweaks. By default through the manifest cache, which imports a module only when needed.
+
+    package/paths point discovery at another tweak package (e.g. a generated benchmark catalog).
+    Declarative catalogs (*.tweaks.json / *.tweaks.toml, see tweaks.catalog) load after the modules;
+    catalogs that fail to load are skipped and their errors added to errors.
+    """
+    pkg = package or __name__
+    paths = list(paths) if paths is not None else list(__path__)
+    with phase("load_all_tweaks", manifest=use_manifest):
+        if use_manifest and not os.environ.get("TWEAKER_NO_MANIFEST"):
+            from .manifest import load_tweaks
+            tweaks: List[Tweak] = load_tweaks(pkg, paths, _INTERNAL_MODULES)
+        else:
+            tweaks = []
+            for _, modname, ispkg in pkgutil.iter_modules(paths):
+                if ispkg or modname in _INTERNAL_MODULES:  # skip internal helpers
+                    continue
+                with phase("load_module", module=modname, source="import"):
+                    mod = importlib.import_module(f"{pkg}.{modname}")
+                    if hasattr(mod, "get_tweaks"):
+                        tweaks.extend(mod.get_tweaks())
+        from .catalog import load_catalogs
+        with phase("load_catalogs"):
+            tweaks.extend(load_catalogs(paths, (t.id for t in tweaks), errors))
+        return tweaks
 
 
 def group_by_category(items: List[Tweak]) -> Dict[Category, List[Tweak]]:
-    g: Dict[Category, List[Tweak]] = {}
-    for t in items:
-        g.setdefault(t.category, []).append(t)
-    for k in g:
-        g[k].sort(key=lambda x: x.label.lower())
-    return g
+    with phase("group_by_category", tweaks=len(items)):
+        g: Dict[Category, List[Tweak]] = {}
+        for t in items:
+            g.setdefault(t.category, []).append(t)
+        for k in g:
+            g[k].sort(key=lambda x: x.label.lower())
+        return g
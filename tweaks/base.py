@@ -1,36 +1,22 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
-from PySide6.QtCore import Qt, QSettings
+from typing import Any, Collection, Dict, List, Optional, Set, Tuple, Union
+from PySide6.QtCore import Qt, QSettings, QObject, QModelIndex, QAbstractTableModel
+from PySide6.QtGui import QColor
 from PySide6.QtWidgets import (
-    QWidget, QVBoxLayout, QGroupBox, QFormLayout, QLabel, QPushButton,
+    QWidget, QVBoxLayout, QGroupBox, QLabel, QPushButton,
     QHBoxLayout, QDialog, QDialogButtonBox, QListWidget, QListWidgetItem,
-    QComboBox, QCheckBox, QSpinBox, QSlider, QLineEdit, QMessageBox
+    QComboBox, QCheckBox, QSpinBox, QSlider, QLineEdit, QMessageBox,
+    QTableView, QHeaderView, QAbstractItemView, QStyledItemDelegate, QFileDialog
 )
 
-Category = str
-# Apply returns (ok, message)
-ApplyFn = Callable[[Any], Tuple[bool, str]]
-
-@dataclass
-class Tweak:
-    id: str
-    category: Category
-    label: str
-    type: str  # dropdown|toggle|number|slider|text
-    default: Any
-    tooltip: str = ""
-    help: str = ""
-    warning: str = ""
-    options: Optional[List[str]] = None
-    minimum: Optional[int] = None
-    maximum: Optional[int] = None
-    step: Optional[int] = None
-    apply: ApplyFn = lambda value: (True, "noop")
+from . import effects
+from .model import (  # re-exported for existing imports
+    ApplyFn, Category, FragmentFn, Probe, RegOpsFn, Tweak, coerce_value, reg_probe,
+)
 
 
 class ActionPreview(QDialog):
-    def __init__(self, actions: List[str], parent: Optional[QWidget] = None):
+    def __init__(self, actions: List[str], parent: Optional[QWidget] = None, plan=None):
         super().__init__(parent)
         self.setWindowTitle("Preview & Confirm")
         self.setMinimumSize(560, 420)
@@ -46,37 +32,359 @@ class ActionPreview(QDialog):
         btns = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
         btns.accepted.connect(self.accept)
         btns.rejected.connect(self.reject)
+        self.plan = plan
+        if plan is not None:
+            save = btns.addButton("Save Plan…", QDialogButtonBox.ButtonRole.ActionRole)
+            save.clicked.connect(self.save_plan)
         layout.addWidget(btns)
 
+    def save_plan(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Plan", "plan.json", "Plan (*.json)")
+        if not path:
+            return
+        ok, msg = self.plan.save(path)
+        if ok:
+            QMessageBox.information(self, "Save Plan", f"{msg}\nRun it with: python -m main --headless --plan \"{path}\"")
+        else:
+            QMessageBox.warning(self, "Save Plan", msg)
+
+
+def apply_category(parent: QWidget, state, force: bool = False) -> bool:
+    """Preview and apply a category's pending tweaks; returns True when something was applied."""
+    ok, msg = state.validate()
+    if not ok:
+        QMessageBox.warning(parent, "Validation error", msg)
+        return False
+    pending = state.pending_tweaks(force)
+    if not pending:
+        state.save_settings()
+        QMessageBox.information(parent, "Nothing to apply", f"{state.category}: no changes since the last apply.")
+        return False
+    actions = state.collect_actions(force)
+    actions += [f"Afterwards: {effects.resolve(k).label}" for k in effects.required(pending)]
+    dlg = ActionPreview(actions, parent)
+    if not dlg.exec():
+        return False
+    state.save_settings()
+    from .executor import apply_with_progress  # local import to avoid cycles
+    failures: List[str] = []
+    with effects.deferred() as keys:  # run_apply collects; an outer block (Apply All) may run them later
+        results = apply_with_progress(parent, [(t, state.value(t)) for t in pending], f"Applying {state.category}")
+    for t, ok, out in results:
+        if ok:
+            state.mark_applied(t, state.value(t))
+        else:
+            failures.append(f"{t.label}: {out}")
+    state.settings.sync()
+    if failures:
+        QMessageBox.critical(parent, "Some actions failed", "\n".join(failures))
+    else:
+        QMessageBox.information(parent, "Success", f"{state.category}: all actions applied.")
+    if not effects.deferring():
+        run_side_effects(parent, state.settings, keys)
+    return True
+
+
+def _confirm(parent: QWidget, settings: QSettings, effect: effects.SideEffect) -> bool:
+    """Ask before a disruptive effect, in its own words; 'Don't ask again' is stored under effect.ask_setting."""
+    if effect.ask_setting:
+        ask = settings.value(effect.ask_setting, True)
+        if not (ask is True or str(ask).lower() == "true"):
+            return False
+    box = QMessageBox(parent)
+    box.setIcon(QMessageBox.Icon.Question)
+    box.setWindowTitle(f"{effect.label}?")
+    box.setText(effect.prompt or f"Some changes need this step: {effect.label}.")
+    box.setInformativeText(f"{effect.label} now?")
+    yes = box.addButton("Yes", QMessageBox.ButtonRole.YesRole)
+    box.addButton("No", QMessageBox.ButtonRole.NoRole)
+    cb = None
+    if effect.ask_setting:
+        cb = QCheckBox("Don't ask again")
+        box.setCheckBox(cb)
+    box.exec()
+    if cb is not None and cb.isChecked():
+        settings.setValue(effect.ask_setting, False)
+        settings.sync()
+    return box.clickedButton() == yes
+
+
+def run_side_effects(parent: QWidget, settings: QSettings, keys: List[str]) -> List[Tuple[str, bool, str]]:
+    """Run the collected side effects once each, after every write; returns [(key, ok, message)]."""
+    skip = [k for k in keys if effects.resolve(k).confirm and not _confirm(parent, settings, effects.resolve(k))]
+    todo = [k for k in keys if k not in skip]
+    if not todo:
+        return []
+    from .executor import run_in_background  # local import to avoid cycles
+    results = run_in_background(parent, "Finishing up", lambda: effects.run(todo))
+    if isinstance(results, tuple):  # the call itself raised: (False, error)
+        results = [(k, False, results[1]) for k in todo]
+    failed = [f"{effects.resolve(k).label}: {out}" for k, ok, out in results if not ok]
+    if failed:
+        QMessageBox.warning(parent, "Some follow-up steps failed", "\n".join(failed))
+    return results
+
+
+VALUE_COLUMN = 1
+_HEADERS = ("Setting", "Value", "Note")
+_DRIFT = QColor("#b45309")
+_ERROR = QColor("#b91c1c")
+_ERROR_BG = QColor("#fef2f2")
+
+
+class TweakModel(QAbstractTableModel):
+    """Table over a CategoryState: one row per tweak (setting, value, note); edits go straight to the state."""
+
+    def __init__(self, state, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.state = state
+        self.tweaks: List[Tweak] = state.tweaks
+        self.rows: Dict[str, int] = {t.id: i for i, t in enumerate(self.tweaks)}
+        self.live: Dict[str, Any] = {}
+        self.drifted: Set[str] = set()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.tweaks)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(_HEADERS)
+
+    def headerData(self, section: int, orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return _HEADERS[section]
+        return None
+
+    def tweak(self, row: int) -> Tweak:
+        return self.tweaks[row]
+
+    def flags(self, index: QModelIndex):
+        f = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if index.column() == VALUE_COLUMN:
+            f |= Qt.ItemFlag.ItemIsUserCheckable if self.tweaks[index.row()].type == "toggle" else Qt.ItemFlag.ItemIsEditable
+        return f
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        t, col = self.tweaks[index.row()], index.column()
+        if col == 0:
+            if role == Qt.ItemDataRole.DisplayRole:
+                return t.label
+            if role == Qt.ItemDataRole.ToolTipRole:
+                return t.help or t.tooltip
+        elif col == VALUE_COLUMN:
+            if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+                val = self.state.value(t)
+                if role == Qt.ItemDataRole.EditRole:
+                    return val
+                return "" if t.type == "toggle" else str(val)
+            if role == Qt.ItemDataRole.CheckStateRole and t.type == "toggle":
+                return Qt.CheckState.Checked if self.state.value(t) else Qt.CheckState.Unchecked
+            if role == Qt.ItemDataRole.ToolTipRole:
+                tip = "\n".join(self.state.errors(t) + [t.tooltip])
+                if t.id in self.drifted:
+                    tip += f"\nSystem currently has: {self.live[t.id]}"
+                return tip.strip()
+            if role == Qt.ItemDataRole.ForegroundRole:
+                if self.state.errors(t):
+                    return _ERROR
+                if t.id in self.drifted:
+                    return _DRIFT
+            if role == Qt.ItemDataRole.BackgroundRole and self.state.errors(t):
+                return _ERROR_BG
+        elif role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole, Qt.ItemDataRole.ForegroundRole):
+            errors = self.state.errors(t)
+            if role == Qt.ItemDataRole.ForegroundRole:
+                return _ERROR if errors else None
+            if errors:
+                return "✖ " + " ".join(errors)
+            if t.warning:
+                return f"⚠ {t.warning}"
+        return None
+
+    def setData(self, index: QModelIndex, value: Any, role: int = Qt.ItemDataRole.EditRole) -> bool:
+        if not index.isValid() or index.column() != VALUE_COLUMN:
+            return False
+        t = self.tweaks[index.row()]
+        if role == Qt.ItemDataRole.CheckStateRole and t.type == "toggle":
+            val: Any = Qt.CheckState(value) == Qt.CheckState.Checked
+        elif role == Qt.ItemDataRole.EditRole:
+            val = coerce_value(t, value)
+        else:
+            return False
+        if val == self.state.value(t):
+            return False
+        touched = self.state.set(t, val)
+        self.dataChanged.emit(index, index)
+        # Rows sharing a constraint with this one may have gained or lost their error mark
+        for tid in touched:
+            row = self.rows.get(tid)
+            if row is not None:
+                self.dataChanged.emit(self.index(row, VALUE_COLUMN), self.index(row, len(_HEADERS) - 1))
+        return True
+
+    def refresh(self):
+        """The state changed underneath (load, reset, live values): repaint values and marks."""
+        if self.tweaks:
+            self.dataChanged.emit(self.index(0, VALUE_COLUMN), self.index(len(self.tweaks) - 1, len(_HEADERS) - 1))
+
+    def set_live(self, live: Dict[str, Any]) -> int:
+        self.live = live
+        self.drifted = {t.id for t in self.state.drifted(live)}
+        self.refresh()
+        return len(self.drifted)
+
+
+class TweakDelegate(QStyledItemDelegate):
+    """Editors for the value column, created only for the row being edited."""
+
+    def createEditor(self, parent: QWidget, option, index: QModelIndex) -> Optional[QWidget]:
+        t: Tweak = index.model().tweak(index.row())
+        if t.type == "toggle":
+            return None  # check state is painted and toggled by the view
+        editor = _make_control(t, parent)
+        editor.setAutoFillBackground(True)
+        # Commit on every change, as the user edits, like a form control would
+        if isinstance(editor, QComboBox):
+            editor.currentIndexChanged.connect(lambda _=None, e=editor: self._edited(e))
+        elif isinstance(editor, (QSpinBox, QSlider)):
+            editor.valueChanged.connect(lambda _=None, e=editor: self._edited(e))
+        elif isinstance(editor, QLineEdit):
+            editor.textChanged.connect(lambda _=None, e=editor: self._edited(e))
+        return editor
+
+    def _edited(self, editor: QWidget):
+        editor.setProperty("edited", True)
+        self.commitData.emit(editor)
+
+    def setEditorData(self, editor: QWidget, index: QModelIndex):
+        t: Tweak = index.model().tweak(index.row())
+        blocked = editor.blockSignals(True)  # showing the value is not an edit
+        try:
+            _show_value(editor, t, index.data(Qt.ItemDataRole.EditRole))
+        finally:
+            editor.blockSignals(blocked)
+
+    def setModelData(self, editor: QWidget, model, index: QModelIndex):
+        # The view also commits when it closes an editor; by then every edit was already
+        # written, and the state may have been reloaded underneath, so only write fresh edits
+        if not editor.property("edited"):
+            return
+        editor.setProperty("edited", False)
+        if isinstance(editor, QComboBox):
+            val: Any = editor.currentText()
+        elif isinstance(editor, (QSpinBox, QSlider)):
+            val = editor.value()
+        elif isinstance(editor, QLineEdit):
+            val = editor.text()
+        else:
+            return
+        model.setData(index, val, Qt.ItemDataRole.EditRole)
+
+    def updateEditorGeometry(self, editor: QWidget, option, index: QModelIndex):
+        editor.setGeometry(option.rect)
+
+
+def _make_control(t: Tweak, parent: Optional[QWidget] = None) -> Union[QComboBox, QCheckBox, QSpinBox, QSlider, QLineEdit]:
+    if t.type == "dropdown":
+        cb: QComboBox = QComboBox(parent)
+        cb.addItems(t.options or [])
+        cb.setCurrentIndex(max(0, (t.options or [t.default]).index(t.default)))
+        cb.setToolTip(t.tooltip)
+        return cb
+    elif t.type == "toggle":
+        chk: QCheckBox = QCheckBox(parent)
+        chk.setChecked(bool(t.default))
+        chk.setToolTip(t.tooltip)
+        return chk
+    elif t.type == "number":
+        sp: QSpinBox = QSpinBox(parent)
+        if t.minimum is not None: sp.setMinimum(t.minimum)
+        if t.maximum is not None: sp.setMaximum(t.maximum)
+        if t.step is not None: sp.setSingleStep(t.step)
+        sp.setValue(int(t.default))
+        sp.setToolTip(t.tooltip)
+        return sp
+    elif t.type == "slider":
+        sl: QSlider = QSlider(Qt.Orientation.Horizontal, parent)
+        sl.setMinimum(t.minimum or 0)
+        sl.setMaximum(t.maximum or 100)
+        sl.setSingleStep(t.step or 1)
+        sl.setValue(int(t.default))
+        sl.setToolTip(t.tooltip)
+        return sl
+    elif t.type == "text":
+        le: QLineEdit = QLineEdit(parent)
+        le.setText(str(t.default))
+        le.setToolTip(t.tooltip)
+        return le
+    else:
+        raise ValueError(f"Unknown control type: {t.type}")
+
+
+def _show_value(ctrl: QWidget, t: Tweak, val: Any):
+    if isinstance(ctrl, QComboBox):
+        if t.options and val in t.options:
+            ctrl.setCurrentIndex(t.options.index(val))
+    elif isinstance(ctrl, QCheckBox):
+        ctrl.setChecked(bool(val))
+    elif isinstance(ctrl, (QSpinBox, QSlider)):
+        ctrl.setValue(int(val))
+    elif isinstance(ctrl, QLineEdit):
+        if ctrl.text() != str(val):  # don't reset the cursor while the user types
+            ctrl.setText(str(val))
+
 
 class TweakTab(QWidget):
-    def __init__(self, category: Category, tweaks: List[Tweak], settings: QSettings, parent: Optional[QWidget] = None):
+    """Controls for one category; a view over its CategoryState.
+
+    Tweaks are rows of a table model, so building a tab costs the same for
+    ten tweaks or ten thousand; an editor widget exists only for the row
+    being edited.
+    """
+
+    def __init__(self, category: Category, tweaks: List[Tweak], settings: QSettings, parent: Optional[QWidget] = None, state=None):
         super().__init__(parent)
+        from .state import CategoryState  # local import to avoid cycles
         self.category = category
         self.tweaks = tweaks
         self.settings = settings
-        self.controls: Dict[str, Union[QComboBox, QCheckBox, QSpinBox, QSlider, QLineEdit]] = {}
+        self.state = state if state is not None else CategoryState(category, tweaks, settings)
+        self.live: Dict[str, Any] = {}
+        self.hidden: Set[str] = set()  # ids filtered out by search
 
         self.main = QVBoxLayout(self)
         self.main.setContentsMargins(18, 18, 18, 18)
 
         box = QGroupBox(category)
-        form = QFormLayout(box)
-
-        for t in tweaks:
-            ctrl = self._make_control(t)
-            self.controls[t.id] = ctrl
-            lbl = QLabel(t.label)
-            lbl.setToolTip(t.help or t.tooltip)
-            form.addRow(lbl, ctrl)
-            if t.warning:
-                w = QLabel(f"⚠ {t.warning}")
-                form.addRow("", w)
-
+        inner = QVBoxLayout(box)
+        self.model = TweakModel(self.state, self)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setItemDelegateForColumn(VALUE_COLUMN, TweakDelegate(self.view))
+        self.view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.view.setEditTriggers(QAbstractItemView.EditTrigger.AllEditTriggers)
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.view.setShowGrid(False)
+        self.view.setWordWrap(False)
+        # Fixed row heights and column widths: no per-row measuring, so scrolling stays O(visible rows)
+        rows = self.view.verticalHeader()
+        rows.hide()
+        rows.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        rows.setDefaultSectionSize(38)
+        cols = self.view.horizontalHeader()
+        cols.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        cols.resizeSection(0, 300)
+        cols.resizeSection(VALUE_COLUMN, 240)
+        cols.setStretchLastSection(True)
+        # Focus always lands on the value cell, whose editor opens (CurrentChanged trigger)
+        self.view.selectionModel().currentChanged.connect(self._focus_value)
+        inner.addWidget(self.view)
         self.main.addWidget(box)
 
-        # Subtle hint: some categories may require Explorer restart
-        if self.category.lower().startswith("user interface"):
+        # Subtle hint: some tweaks here need an Explorer restart (offered after Apply)
+        if effects.EXPLORER in effects.required(self.tweaks):
             hint = QLabel("Some UI changes may require restarting Windows Explorer to take effect.")
             try:
                 hint.setProperty("class", "pill-hint")
@@ -89,7 +397,7 @@ class TweakTab(QWidget):
         self.resetBtn = QPushButton("Reset")
         self.revertBtn = QPushButton("Revert")
         self.applyBtn = QPushButton("Apply")
-        self.applyBtn.clicked.connect(self.apply)
+        self.applyBtn.clicked.connect(lambda: self.apply())
         self.resetBtn.clicked.connect(self.load_defaults)
         self.revertBtn.clicked.connect(self.load_settings)
         row.addWidget(self.resetBtn)
@@ -97,154 +405,86 @@ class TweakTab(QWidget):
         row.addWidget(self.applyBtn)
         self.main.addLayout(row)
 
-        self.load_settings()
-
-    def _make_control(self, t: Tweak) -> Union[QComboBox, QCheckBox, QSpinBox, QSlider, QLineEdit]:
-        if t.type == "dropdown":
-            cb: QComboBox = QComboBox()
-            cb.addItems(t.options or [])
-            cb.setCurrentIndex(max(0, (t.options or [t.default]).index(t.default)))
-            cb.setToolTip(t.tooltip)
-            return cb
-        elif t.type == "toggle":
-            chk: QCheckBox = QCheckBox()
-            chk.setChecked(bool(t.default))
-            chk.setToolTip(t.tooltip)
-            return chk
-        elif t.type == "number":
-            sp: QSpinBox = QSpinBox()
-            if t.minimum is not None: sp.setMinimum(t.minimum)
-            if t.maximum is not None: sp.setMaximum(t.maximum)
-            if t.step is not None: sp.setSingleStep(t.step)
-            sp.setValue(int(t.default))
-            sp.setToolTip(t.tooltip)
-            return sp
-        elif t.type == "slider":
-            sl: QSlider = QSlider(Qt.Orientation.Horizontal)
-            sl.setMinimum(t.minimum or 0)
-            sl.setMaximum(t.maximum or 100)
-            sl.setSingleStep(t.step or 1)
-            sl.setValue(int(t.default))
-            sl.setToolTip(t.tooltip)
-            return sl
-        elif t.type == "text":
-            le: QLineEdit = QLineEdit()
-            le.setText(str(t.default))
-            le.setToolTip(t.tooltip)
-            return le
-        else:
-            raise ValueError(f"Unknown control type: {t.type}")
+    def _focus_value(self, current: QModelIndex, _previous: QModelIndex):
+        if current.isValid() and current.column() != VALUE_COLUMN:
+            self.view.setCurrentIndex(self.model.index(current.row(), VALUE_COLUMN))
 
-    def _key(self, tid: str) -> str:
-        return f"{self.category}/{tid}"
+    def refresh(self):
+        """Show the state's values; an open editor is reopened so it shows them too."""
+        current = self.view.currentIndex()
+        self.view.setCurrentIndex(QModelIndex())
+        self.model.refresh()
+        if current.isValid():
+            self.view.setCurrentIndex(current)
 
     def save_settings(self):
-        for t in self.tweaks:
-            ctrl = self.controls[t.id]
-            if isinstance(ctrl, QComboBox):
-                self.settings.setValue(self._key(t.id), ctrl.currentText())
-            elif isinstance(ctrl, QCheckBox):
-                self.settings.setValue(self._key(t.id), ctrl.isChecked())
-            elif isinstance(ctrl, (QSpinBox, QSlider)):
-                self.settings.setValue(self._key(t.id), int(ctrl.value()))
-            elif isinstance(ctrl, QLineEdit):
-                self.settings.setValue(self._key(t.id), ctrl.text())
-        self.settings.sync()
+        self.state.save_settings()
 
     def load_settings(self):
-        for t in self.tweaks:
-            ctrl = self.controls[t.id]
-            val = self.settings.value(self._key(t.id), t.default)
-            if isinstance(ctrl, QComboBox):
-                sval = str(val)
-                if t.options and sval in t.options:
-                    ctrl.setCurrentIndex(t.options.index(sval))
-            elif isinstance(ctrl, QCheckBox):
-                ctrl.setChecked(val is True or str(val).lower() == "true")
-            elif isinstance(ctrl, (QSpinBox, QSlider)):
-                try:
-                    ctrl.setValue(int(str(val)))
-                except Exception:
-                    ctrl.setValue(int(t.default))
-            elif isinstance(ctrl, QLineEdit):
-                ctrl.setText(str(val))
+        self.state.load_settings()
+        self.refresh()
 
     def load_defaults(self):
+        self.state.load_defaults()
+        self.refresh()
+
+    def set_value(self, t: Tweak, val: Any):
+        self.state.set(t, val)
+        self.refresh()
+
+    # ----- Search -----
+    def filter(self, ids: Optional[Collection[str]]) -> int:
+        """Show only the rows of the given tweak ids (all rows for None); returns how many are shown."""
+        shown = 0
         for t in self.tweaks:
-            ctrl = self.controls[t.id]
-            if isinstance(ctrl, QComboBox):
-                if t.options:
-                    ctrl.setCurrentIndex(max(0, t.options.index(t.default)))
-            elif isinstance(ctrl, QCheckBox):
-                ctrl.setChecked(bool(t.default))
-            elif isinstance(ctrl, (QSpinBox, QSlider)):
-                ctrl.setValue(int(t.default))
-            elif isinstance(ctrl, QLineEdit):
-                ctrl.setText(str(t.default))
+            visible = ids is None or t.id in ids
+            shown += visible
+            if visible == (t.id in self.hidden):  # only touch rows whose visibility changes
+                self.view.setRowHidden(self.model.rows[t.id], not visible)
+                if visible:
+                    self.hidden.discard(t.id)
+                else:
+                    self.hidden.add(t.id)
+        return shown
+
+    # ----- Live system state -----
+    def show_live_state(self, live: Dict[str, Any]) -> int:
+        """Mark values that differ from the machine's current value; returns how many drifted."""
+        self.live = live
+        return self.model.set_live(live)
+
+    def load_live_state(self):
+        """Set controls to what the machine currently has (only probed tweaks)."""
+        self.state.load_live(self.live)
+        self.refresh()
+        self.show_live_state(self.live)
 
     def validate(self) -> Tuple[bool, str]:
-        return True, ""
+        return self.state.validate()
 
-    def collect_actions(self) -> List[str]:
-        actions: List[str] = []
-        for t in self.tweaks:
-            v = self.current_value(t)
-            actions.append(f"[{self.category}] {t.label} → {v}")
-        return actions
+    # ----- Dirty tracking -----
+    def applied_value(self, t: Tweak) -> Any:
+        return self.state.applied_value(t)
+
+    def is_dirty(self, t: Tweak) -> bool:
+        return self.state.is_dirty(t)
+
+    def pending_tweaks(self, force: bool = False) -> List[Tweak]:
+        return self.state.pending_tweaks(force)
+
+    def mark_applied(self, t: Tweak, value: Any):
+        self.state.mark_applied(t, value)
+
+    def collect_actions(self, force: bool = False) -> List[str]:
+        return self.state.collect_actions(force)
 
     def current_value(self, t: Tweak) -> Any:
-        ctrl = self.controls[t.id]
-        if isinstance(ctrl, QComboBox):
-            return ctrl.currentText()
-        elif isinstance(ctrl, QCheckBox):
-            return ctrl.isChecked()
-        elif isinstance(ctrl, (QSpinBox, QSlider)):
-            return int(ctrl.value())
-        elif isinstance(ctrl, QLineEdit):
-            return ctrl.text()
-
-    def apply(self):
-        ok, msg = self.validate()
-        if not ok:
-            QMessageBox.warning(self, "Validation error", msg)
-            return
-        actions = self.collect_actions()
-        dlg = ActionPreview(actions, self)
-        if dlg.exec():
-            self.save_settings()
-            failures: List[str] = []
-            for t in self.tweaks:
-                val = self.current_value(t)
-                ok, out = t.apply(val)
-                if not ok:
-                    failures.append(f"{t.label}: {out}")
-            if failures:
-                QMessageBox.critical(self, "Some actions failed", "\n".join(failures))
-            else:
-                QMessageBox.information(self, "Success", f"{self.category}: all actions applied.")
-                # Offer Explorer restart for UI tab, with 'Don't ask again' preference
-                if self.category.lower().startswith("user interface"):
-                    ask = self.settings.value("General/AskRestartExplorer", True)
-                    if ask is True or str(ask).lower() == "true":
-                        box = QMessageBox(self)
-                        box.setIcon(QMessageBox.Icon.Question)
-                        box.setWindowTitle("Restart Explorer?")
-                        box.setText("Some UI changes may require restarting Windows Explorer.")
-                        box.setInformativeText("Restart Explorer now?")
-                        yes = box.addButton("Yes", QMessageBox.ButtonRole.YesRole)
-                        no = box.addButton("No", QMessageBox.ButtonRole.NoRole)
-                        from PySide6.QtWidgets import QCheckBox
-                        cb = QCheckBox("Don't ask again")
-                        box.setCheckBox(cb)
-                        box.exec()
-                        if box.clickedButton() == yes:
-                            from util.ps import restart_explorer  # local import to avoid cycles
-                            ok, out = restart_explorer()
-                            QMessageBox.information(self, "Restart Explorer", out if ok else f"Failed: {out}")
-                        if cb.isChecked():
-                            self.settings.setValue("General/AskRestartExplorer", False)
-                            self.settings.sync()
-
-
-def build_tab_widget(category: Category, tweaks: List[Tweak], settings: QSettings, parent=None) -> TweakTab:
-    return TweakTab(category, tweaks, settings, parent)
+        return self.state.value(t)
+
+    def apply(self, force: bool = False):
+        """Apply tweaks whose value changed since the last successful apply (all of them with force)."""
+        apply_category(self, self.state, force)
+
+
+def build_tab_widget(category: Category, tweaks: List[Tweak], settings: QSettings, parent=None, state=None) -> TweakTab:
+    return TweakTab(category, tweaks, settings, parent, state)
@@ -0,0 +1,376 @@
+from __future__ import annotations
+import glob, json, logging, os, sys
+from typing import Any, Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .effects import resolve as resolve_effect
+from .model import Category, Probe
+from util import registry as r
+from util.psbatch import PSFragment, run_fragment
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+# Declarative tweak catalogs: tweaks described as data (JSON or TOML) rather
+# than code, for large vendor sets. Files named *.tweaks.json / *.tweaks.toml
+# in the tweak package, or listed in TWEAKER_CATALOGS (files or directories,
+# os.pathsep separated), load next to the module tweaks.
+#
+# Entries become CatalogTweak records: __slots__, interned strings and option
+# lists, and one target object per tweak whose class supplies apply, reg_ops,
+# ps_fragment and probe for every tweak of that kind. Records quack like
+# Tweak everywhere tweaks are used; the reg_ops / ps_fragment callables and
+# the probe are built on first use and kept in slots.
+#
+#   {"version": 1, "category": "Vendor",            default category for entries
+#    "tweaks": [{
+#      "id", "label", "type", "default",            as on Tweak; also category, tooltip,
+#                                                   help, warning, options, minimum, maximum, step
+#      "registry": [{"hive": "HKCU"|"HKLM", "path", "name", "kind": "dword"}],
+#                                                   every value is written the same; read back as the probe
+#      "powershell": {"script": "... {value} ...", "prelude": ""},
+#                                                   {value} becomes a PowerShell literal
+#      "values": {"<control value>": <value to write>},
+#      "side_effects": ["explorer" | "policy" | "service:<name>"]
+#    }]}
+#
+# Without "values" the control value is written as is (toggles as 1/0).
+# Control values are keyed as text: "true"/"false", option names, numbers.
+# In JSON a null value deletes the registry value (TOML has no null).
+# Tweak ids must be unique across modules and catalogs; a catalog that is
+# invalid or reuses an id is skipped as a whole (see load_catalogs).
+
+CATALOG_VERSION = 1
+CATALOG_SUFFIXES = (".tweaks.json", ".tweaks.toml")
+TYPES = ("dropdown", "toggle", "number", "slider", "text")
+KINDS = {"sz": r.REG_SZ, "expand_sz": 2, "binary": 3, "dword": r.REG_DWORD, "multi_sz": 7, "qword": 11}
+HIVES = {"HKCU": r.HKEY_CURRENT_USER, "HKLM": r.HKEY_LOCAL_MACHINE}
+_NUMERIC = (r.REG_DWORD, 11)
+
+_options: Dict[Tuple[str, ...], List[str]] = {}
+_value_maps: Dict[Tuple[Tuple[str, Any], ...], Dict[str, Any]] = {}
+
+_log = logging.getLogger(__name__)
+
+
+class CatalogError(ValueError):
+    pass
+
+
+def _intern_options(options: Optional[Sequence[Any]]) -> Optional[List[str]]:
+    """One shared list per distinct option set (treat it as read-only)."""
+    if options is None:
+        return None
+    key = tuple(sys.intern(str(o)) for o in options)
+    found = _options.get(key)
+    if found is None:
+        found = _options[key] = list(key)
+    return found
+
+
+def _intern_values(values: Optional[Dict[Any, Any]]) -> Optional[Dict[str, Any]]:
+    """One shared dict per distinct value map (toggles mostly repeat {"true": 1, "false": 0})."""
+    if values is None:
+        return None
+    items = tuple((sys.intern(str(k)), v) for k, v in values.items())
+    key = tuple((k, _frozen(v)) for k, v in items)
+    try:
+        found = _value_maps.get(key)
+    except TypeError:  # unhashable value (e.g. nested lists); keep it unshared
+        return dict(items)
+    if found is None:
+        found = _value_maps[key] = dict(items)
+    return found
+
+
+def value_key(value: Any) -> str:
+    """Catalog key of a control value."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _frozen(value: Any) -> Any:
+    return tuple(value) if isinstance(value, list) else value
+
+
+# ---- Targets: one class per kind; the behaviour lives here, not per tweak ----
+
+class _Target:
+    __slots__ = ("values",)
+
+    def __init__(self, values: Optional[Dict[str, Any]]):
+        self.values = values
+
+    def mapped(self, t: "CatalogTweak", value: Any) -> Any:
+        if self.values is None:
+            return value
+        try:
+            return self.values[value_key(value)]
+        except KeyError:
+            raise ValueError(f"{t.id}: no catalog value for {value!r}") from None
+
+
+class RegistryTarget(_Target):
+    __slots__ = ("writes", "_reverse")
+
+    def __init__(self, writes: Tuple[Tuple[Any, str, str, int], ...], values: Optional[Dict[str, Any]]):
+        super().__init__(values)
+        self.writes = writes  # (root, path, name, reg type)
+
+    def reg_ops(self, t: "CatalogTweak", value: Any) -> List[r.RegOp]:
+        raw = self.mapped(t, value)
+        if raw is None:
+            return [r.delete_op(root, path, name) for root, path, name, _ in self.writes]
+        return [r.set_op(root, path, name, _raw_value(raw, kind), kind) for root, path, name, kind in self.writes]
+
+    def apply(self, t: "CatalogTweak", value: Any) -> Tuple[bool, str]:
+        return r.write_ops(self.reg_ops(t, value))
+
+    def probe(self, t: "CatalogTweak") -> Probe:
+        return Probe(tuple((root, path, name) for root, path, name, _ in self.writes), lambda *raw: self.decode(t, raw))
+
+    def decode(self, t: "CatalogTweak", raw: Sequence[Any]) -> Any:
+        """Control value the registry values stand for; None when they disagree or map to nothing."""
+        if self.values is not None:
+            try:
+                reverse = self._reverse
+            except AttributeError:  # one target per tweak, so the map is built once
+                reverse = self._reverse = {_frozen(v): _control_value(t, k) for k, v in self.values.items()}
+            found = {reverse.get(_frozen(v)) for v in raw}
+        else:
+            found = {_passthrough(t, v) for v in raw}
+        return found.pop() if len(found) == 1 else None
+
+
+class PowerShellTarget(_Target):
+    __slots__ = ("script", "prelude")
+
+    def __init__(self, script: str, prelude: str, values: Optional[Dict[str, Any]]):
+        super().__init__(values)
+        self.script = script
+        self.prelude = prelude
+
+    def ps_fragment(self, t: "CatalogTweak", value: Any) -> PSFragment:
+        return PSFragment(self.script.replace("{value}", ps_literal(self.mapped(t, value))), self.prelude)
+
+    def apply(self, t: "CatalogTweak", value: Any) -> Tuple[bool, str]:
+        return run_fragment(self.ps_fragment(t, value))
+
+
+def _raw_value(raw: Any, kind: int) -> Any:
+    if kind in _NUMERIC:
+        return int(raw)
+    if kind == 7:
+        return [str(s) for s in raw]
+    if kind == 3:
+        return bytes(raw)
+    return str(raw)
+
+
+def _control_value(t: "CatalogTweak", key: str) -> Any:
+    if t.type == "toggle":
+        return key == "true"
+    if t.type in ("number", "slider"):
+        return int(key)
+    return key
+
+
+def _passthrough(t: "CatalogTweak", raw: Any) -> Any:
+    if raw is None:
+        return None
+    if t.type == "toggle":
+        return {1: True, 0: False}.get(raw)
+    if t.type in ("number", "slider"):
+        return raw if type(raw) is int else None
+    val = str(raw)
+    return val if t.type == "text" or (t.options and val in t.options) else None
+
+
+def ps_literal(value: Any) -> str:
+    if isinstance(value, bool):
+        return "$true" if value else "$false"
+    if isinstance(value, int):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# ---- Records ----
+
+class CatalogTweak:
+    """A tweak loaded from a catalog; same attributes as Tweak, without a per-instance __dict__."""
+
+    __slots__ = ("id", "category", "label", "type", "default", "tooltip", "help", "warning",
+                 "options", "minimum", "maximum", "step", "side_effects", "target",
+                 "_reg_ops", "_ps_fragment", "_probe")  # built on first access
+    constraints = None  # catalogs don't declare cross-field rules
+
+    def __init__(self, id: str, category: Category, label: str, type: str, default: Any, target: _Target,
+                 tooltip: str = "", help: str = "", warning: str = "", options: Optional[List[str]] = None,
+                 minimum: Optional[int] = None, maximum: Optional[int] = None, step: Optional[int] = None,
+                 side_effects: Optional[List[str]] = None):
+        self.id = id
+        self.category = category
+        self.label = label
+        self.type = type
+        self.default = default
+        self.tooltip = tooltip
+        self.help = help
+        self.warning = warning
+        self.options = options
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+        self.side_effects = side_effects
+        self.target = target
+
+    def __repr__(self) -> str:
+        return f"CatalogTweak(id={self.id!r}, category={self.category!r}, type={self.type!r})"
+
+    def apply(self, value: Any) -> Tuple[bool, str]:
+        return self.target.apply(self, value)
+
+    @property
+    def reg_ops(self):
+        try:
+            return self._reg_ops
+        except AttributeError:
+            target = self.target
+            self._reg_ops = (lambda value: target.reg_ops(self, value)) if isinstance(target, RegistryTarget) else None
+            return self._reg_ops
+
+    @property
+    def ps_fragment(self):
+        try:
+            return self._ps_fragment
+        except AttributeError:
+            target = self.target
+            self._ps_fragment = (lambda value: target.ps_fragment(self, value)) if isinstance(target, PowerShellTarget) else None
+            return self._ps_fragment
+
+    @property
+    def probe(self) -> Optional[Probe]:
+        try:
+            return self._probe
+        except AttributeError:
+            self._probe = self.target.probe(self) if isinstance(self.target, RegistryTarget) else None
+            return self._probe
+
+
+# ---- Loading ----
+
+def _read(path: str) -> Dict[str, Any]:
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise CatalogError(f"{path}: TOML catalogs need Python 3.11+")
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _target(e: Dict[str, Any], type_: str) -> _Target:
+    values = _intern_values(e.get("values"))
+    if "registry" in e:
+        writes = []
+        for w in e["registry"]:
+            kind = KINDS[w.get("kind") or ("sz" if type_ in ("text", "dropdown") and values is None else "dword")]
+            writes.append((HIVES[w["hive"]], sys.intern(w["path"]), sys.intern(w["name"]), kind))
+        if not writes:
+            raise ValueError("empty registry list")
+        return RegistryTarget(tuple(writes), values)
+    if "powershell" in e:
+        ps = e["powershell"]
+        return PowerShellTarget(ps["script"], sys.intern(ps.get("prelude", "")), values)
+    raise ValueError("no registry or powershell target")
+
+
+def _record(e: Dict[str, Any], category: Optional[str]) -> CatalogTweak:
+    type_ = e["type"]
+    if type_ not in TYPES:
+        raise ValueError(f"unknown type {type_!r}")
+    options = _intern_options(e.get("options"))
+    default = e["default"]
+    if type_ == "dropdown" and (not options or default not in options):
+        raise ValueError("dropdown default must be one of its options")
+    target = _target(e, type_)
+    for key in e.get("side_effects") or ():
+        resolve_effect(key)  # unknown keys fail at load, not after an apply
+    if target.values is not None:
+        keys = {"dropdown": options, "toggle": ("true", "false")}.get(type_, ())
+        missing = [k for k in keys if k not in target.values]
+        if missing:
+            raise ValueError(f"values missing for {missing}")
+    return CatalogTweak(
+        id=e["id"],
+        category=sys.intern(e.get("category") or category or ""),
+        label=e["label"],
+        type=sys.intern(type_),
+        default=default,
+        target=target,
+        tooltip=e.get("tooltip", ""),
+        help=e.get("help", ""),
+        warning=e.get("warning", ""),
+        options=options,
+        minimum=e.get("minimum"),
+        maximum=e.get("maximum"),
+        step=e.get("step"),
+        side_effects=_intern_options(e.get("side_effects")),
+    )
+
+
+def load_catalog(path: str, taken: Collection[str] = ()) -> List[CatalogTweak]:
+    """Raises CatalogError for an unreadable or invalid file, or one reusing an id in taken (tweaks loaded before it)."""
+    try:
+        data = _read(path)
+    except (OSError, ValueError) as e:
+        raise CatalogError(f"{path}: {e}") from e
+    if data.get("version", CATALOG_VERSION) != CATALOG_VERSION:
+        raise CatalogError(f"{path}: unsupported catalog version {data.get('version')!r}")
+    category = data.get("category")
+    out: List[CatalogTweak] = []
+    seen = set()
+    for i, e in enumerate(data.get("tweaks", [])):
+        try:
+            t = _record(e, category)
+        except (KeyError, TypeError, ValueError) as err:
+            raise CatalogError(f"{path}: tweak #{i} ({e.get('id', '?') if isinstance(e, dict) else '?'}): {err}") from err
+        if not t.category:
+            raise CatalogError(f"{path}: tweak {t.id!r} has no category")
+        if t.id in seen:
+            raise CatalogError(f"{path}: duplicate tweak id {t.id!r}")
+        if t.id in taken:
+            raise CatalogError(f"{path}: tweak id {t.id!r} is already used by another tweak")
+        seen.add(t.id)
+        out.append(t)
+    return out
+
+
+def catalog_files(paths: Iterable[str]) -> List[str]:
+    """Catalog files in the given directories and in TWEAKER_CATALOGS, in a stable order."""
+    entries = list(paths) + [p for p in os.environ.get("TWEAKER_CATALOGS", "").split(os.pathsep) if p]
+    files: List[str] = []
+    for p in entries:
+        if os.path.isdir(p):
+            files += sorted(f for suffix in CATALOG_SUFFIXES for f in glob.glob(os.path.join(p, "*" + suffix)))
+        elif p.endswith(CATALOG_SUFFIXES) and os.path.isfile(p):
+            files.append(p)
+    return list(dict.fromkeys(files))
+
+
+def load_catalogs(paths: Iterable[str], taken: Iterable[str] = (), errors: Optional[List[str]] = None) -> List[CatalogTweak]:
+    """Every valid catalog; a bad one (or one reusing a tweak id) is skipped, its error logged and added to errors."""
+    ids = set(taken)
+    out: List[CatalogTweak] = []
+    for f in catalog_files(paths):
+        try:
+            found = load_catalog(f, ids)
+        except CatalogError as e:
+            _log.warning("skipping catalog %s", e)
+            if errors is not None:
+                errors.append(str(e))
+            continue
+        ids.update(t.id for t in found)
+        out += found
+    return out
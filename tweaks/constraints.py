@@ -0,0 +1,100 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from .model import Constraint, Tweak
+
+# Cross-field constraints.
+#
+# Tweaks declare Constraints (tweak ids + a check over their values); the
+# engine indexes every rule by the ids it references. A changed value
+# re-evaluates only the rules that reference it, and the failures are kept,
+# so validate() and the per-row error marks read cached results. Rules whose
+# tweaks are not all loaded are ignored.
+
+
+def _rules(tweaks: Iterable[Tweak], known: Set[str]) -> List[Constraint]:
+    out: List[Constraint] = []
+    for t in tweaks:
+        for c in t.constraints or ():
+            if all(ref in known for ref in c.refs):
+                out.append(c)
+    return out
+
+
+def _run(c: Constraint, values: Sequence[Any]) -> Optional[str]:
+    """None when the values are consistent, else the message to show."""
+    try:
+        return None if c.check(*values) else c.message
+    except Exception as e:  # a broken rule blocks the apply rather than passing silently
+        return f"{c.message} (check failed: {e})"
+
+
+class ConstraintEngine:
+    """Incremental validation over a set of CategoryStates (attaches itself to them)."""
+
+    def __init__(self, states: Iterable[Any]):
+        self.states = list(states)
+        self._owner: Dict[str, Tuple[Any, Tweak]] = {t.id: (s, t) for s in self.states for t in s.tweaks}
+        self.rules = _rules((t for _, t in self._owner.values()), set(self._owner))
+        self._index: Dict[str, List[int]] = {}
+        for i, c in enumerate(self.rules):
+            for ref in dict.fromkeys(c.refs):
+                self._index.setdefault(ref, []).append(i)
+        self._failed: Dict[int, str] = {}
+        self._pending: Set[int] = set(range(len(self.rules)))  # never evaluated yet
+        self.evaluations = 0
+        for s in self.states:
+            s.constraints = self
+
+    def _evaluate(self, i: int):
+        c = self.rules[i]
+        values = []
+        for ref in c.refs:
+            state, t = self._owner[ref]
+            values.append(state.value(t))
+        self.evaluations += 1
+        self._pending.discard(i)
+        msg = _run(c, values)
+        if msg is None:
+            self._failed.pop(i, None)
+        else:
+            self._failed[i] = msg
+
+    def _rules_of(self, ids: Optional[Iterable[str]]) -> Iterable[int]:
+        if ids is None:
+            return range(len(self.rules))
+        return dict.fromkeys(i for tid in ids for i in self._index.get(tid, ()))
+
+    def changed(self, ids: Iterable[str]) -> Set[str]:
+        """Re-evaluate the rules referencing these tweaks; returns every tweak id those rules cover."""
+        touched: Set[str] = set()
+        for i in self._rules_of(ids):
+            self._evaluate(i)
+            touched.update(self.rules[i].refs)
+        return touched
+
+    def _settle(self, ids: Optional[Iterable[str]]) -> List[int]:
+        rules = list(self._rules_of(ids))
+        for i in rules:
+            if i in self._pending:
+                self._evaluate(i)
+        return rules
+
+    def messages(self, ids: Optional[Iterable[str]] = None) -> List[str]:
+        """Messages of the failing rules that reference any of ids (all rules for None)."""
+        return list(dict.fromkeys(self._failed[i] for i in self._settle(ids) if i in self._failed))
+
+    def errors_for(self, tid: str) -> List[str]:
+        return self.messages((tid,))
+
+    def check(self, ids: Optional[Iterable[str]] = None) -> Tuple[bool, str]:
+        msgs = self.messages(ids)
+        return not msgs, "\n".join(msgs)
+
+
+def check_values(tweaks: Sequence[Tweak], values: Mapping[str, Any]) -> Tuple[bool, str]:
+    """One-shot check of the rules whose tweaks all have a value in `values` (id -> value), e.g. a profile."""
+    msgs = [m for c in _rules(tweaks, set(values))
+            if (m := _run(c, [values[ref] for ref in c.refs])) is not None]
+    msgs = list(dict.fromkeys(msgs))
+    return not msgs, "\n".join(msgs)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, TextIO, Tuple
+
+from .model import Tweak
+from util import psquery, registry as r
+from util.psbatch import PSFragment
+
+# Compiles (tweak, value) pairs into one standalone PowerShell script for
+# machines without Python/Qt. Registry writes come from reg_ops, grouped per
+# key so each key is opened once (HKCU first, then HKLM); ps_fragments follow
+# with shared preludes emitted once. The script records failures per tweak,
+# prints an OK/FAIL/SKIP line for each, optionally writes the results as JSON
+# (-ResultPath) and exits 1 if anything failed.
+#
+# Output is produced chunk by chunk and is deterministic for a given input,
+# so generated scripts can be diffed on any platform.
+
+_KINDS = {r.REG_SZ: "String", 2: "ExpandString", 3: "Binary", r.REG_DWORD: "DWord", 7: "MultiString", 11: "QWord"}
+_TRACK_CHUNK = 50
+
+_HEADER = """\
+# Windows 11 Tweaker deployment script ({count} tweak(s)). Generated; do not edit.
+param([string]$ResultPath)
+$ErrorActionPreference = 'Stop'
+$W11T = [ordered]@{{}}
+$W11TSkipped = New-Object System.Collections.Generic.List[string]
+
+function W11T-Track([string[]]$Ids) {{
+    foreach ($i in $Ids) {{ if (-not $W11T.Contains($i)) {{ $W11T[$i] = New-Object System.Collections.Generic.List[string] }} }}
+}}
+function W11T-Fail([string[]]$Ids, [string]$Message) {{
+    foreach ($i in $Ids) {{ W11T-Track $i; $W11T[$i].Add($Message) }}
+}}
+function W11T-OpenKey([string]$Hive, [string]$Path, [string[]]$Ids, [bool]$Create) {{
+    $root = if ($Hive -eq 'HKLM') {{ [Microsoft.Win32.Registry]::LocalMachine }} else {{ [Microsoft.Win32.Registry]::CurrentUser }}
+    try {{
+        if ($Create) {{ return $root.CreateSubKey($Path) }}
+        return $root.OpenSubKey($Path, $true)
+    }} catch {{ W11T-Fail $Ids "open $Hive\\$Path failed: $($_.Exception.Message)"; return $null }}
+}}
+function W11T-Set($Key, [string]$Id, [string]$Name, [Microsoft.Win32.RegistryValueKind]$Kind, $Value) {{
+    try {{ $Key.SetValue($Name, $Value, $Kind) }} catch {{ W11T-Fail $Id "set $Name failed: $($_.Exception.Message)" }}
+}}
+function W11T-Delete($Key, [string]$Id, [string]$Name) {{
+    try {{ $Key.DeleteValue($Name, $false) }} catch {{ W11T-Fail $Id "delete $Name failed: $($_.Exception.Message)" }}
+}}
+function W11T-Run([string]$Id, [scriptblock]$Script) {{
+    $global:LASTEXITCODE = 0
+    try {{
+        $out = @(& $Script 2>&1)
+        if (($out | Where-Object {{ $_ -is [System.Management.Automation.ErrorRecord] }}) -or $LASTEXITCODE) {{
+            W11T-Fail $Id (($out | Out-String).Trim())
+        }}
+    }} catch {{ W11T-Fail $Id $_.Exception.Message }}
+}}
+
+"""
+
+_FOOTER = """\
+# ---- Results ----
+$W11TFailed = 0
+$W11TResults = foreach ($e in $W11T.GetEnumerator()) {
+    $status = if ($W11TSkipped.Contains($e.Key)) { 'SKIP' } elseif ($e.Value.Count) { 'FAIL' } else { 'OK' }
+    if ($status -eq 'FAIL') { $W11TFailed++ }
+    Write-Output ('{0,-5} {1} {2}' -f $status, $e.Key, ($e.Value -join '; '))
+    [pscustomobject]@{ Id = $e.Key; Status = $status; Message = ($e.Value -join '; ') }
+}
+Write-Output ('{0} tweak(s), {1} failed' -f $W11T.Count, $W11TFailed)
+if ($ResultPath) { $W11TResults | ConvertTo-Json -Depth 3 | Set-Content -Path $ResultPath -Encoding UTF8 }
+exit ([int]($W11TFailed -gt 0))
+"""
+
+
+def quote(s: Any) -> str:
+    """PowerShell single-quoted string literal."""
+    return "'" + str(s).replace("'", "''") + "'"
+
+
+def _ids(ids: Iterable[str]) -> str:
+    return "@(" + ",".join(quote(i) for i in ids) + ")"
+
+
+def value_literal(op: r.RegOp) -> Tuple[str, str]:
+    """(RegistryValueKind, PowerShell literal) for a set operation."""
+    kind = _KINDS.get(op.reg_type or r.REG_DWORD)
+    if kind is None:
+        raise ValueError(f"unsupported registry type {op.reg_type!r} for {op.path}::{op.name}")
+    v = op.value
+    if kind == "DWord":
+        v = int(v) & 0xFFFFFFFF
+        return kind, str(v - (1 << 32) if v >= 1 << 31 else v)  # SetValue takes a signed Int32
+    if kind == "QWord":
+        v = int(v) & 0xFFFFFFFFFFFFFFFF
+        return kind, f"[long]{v - (1 << 64) if v >= 1 << 63 else v}"
+    if kind == "MultiString":
+        return kind, "[string[]]@(" + ",".join(quote(s) for s in v) + ")"
+    if kind == "Binary":
+        return kind, "[byte[]]@(" + ",".join(str(b) for b in bytes(v)) + ")"
+    return kind, quote(v)
+
+
+def _key_block(entries: List[Tuple[str, r.RegOp]]) -> str:
+    first = entries[0][1]
+    hive = r.ROOT_NAMES.get(first.root, "HKCU")
+    create = any(not op.delete for _, op in entries)
+    ids = list(OrderedDict.fromkeys(tid for tid, _ in entries))
+    lines = [
+        f"# {hive}\\{first.path}",
+        f"$k = W11T-OpenKey {quote(hive)} {quote(first.path)} {_ids(ids)} ${str(create).lower()}",
+        "if ($k) {",
+        "    try {",
+    ]
+    for tid, op in entries:
+        if op.delete:
+            lines.append(f"        W11T-Delete $k {quote(tid)} {quote(op.name)}")
+        else:
+            kind, lit = value_literal(op)
+            lines.append(f"        W11T-Set $k {quote(tid)} {quote(op.name)} {kind} {lit}")
+    lines += ["    } finally { $k.Close() }", "}", ""]
+    return "\n".join(lines) + "\n"
+
+
+def _fragment_block(tid: str, label: str, frag: PSFragment) -> str:
+    script = "\n".join("    " + line if line.strip() else "" for line in frag.script.splitlines())
+    return f"# {label}\nW11T-Run {quote(tid)} {{\n{script}\n}}\n\n"
+
+
+def iter_script(items: Sequence[Tuple[Tweak, Any]]) -> Iterator[str]:
+    """Yield the deployment script in chunks; only the operations, not the script text, are held."""
+    # HKCU keys first, then HKLM, each in first-use order
+    keys: Dict[Any, "OrderedDict[Tuple[Any, str], List[Tuple[str, r.RegOp]]]"] = {
+        r.HKEY_CURRENT_USER: OrderedDict(), r.HKEY_LOCAL_MACHINE: OrderedDict()}
+    fragments: List[Tuple[Tweak, PSFragment]] = []
+    problems: List[Tuple[str, str, bool]] = []  # (id, message, skipped)
+    with psquery.offline():  # the script targets other machines: no live queries of this one
+        for t, val in items:
+            try:
+                if t.reg_ops is not None:
+                    ops = t.reg_ops(val)
+                    for op in ops:
+                        if not op.delete:
+                            value_literal(op)  # reject unsupported types before anything is emitted
+                    for op in ops:
+                        keys.setdefault(op.root, OrderedDict()).setdefault(r.key_id(op.root, op.path), []).append((t.id, op))
+                elif t.ps_fragment is not None:
+                    frag = t.ps_fragment(val)
+                    if frag is not None:
+                        fragments.append((t, frag))
+                else:
+                    problems.append((t.id, "not exportable (no reg_ops or ps_fragment)", True))
+            except Exception as e:
+                problems.append((t.id, f"export failed: {e}", False))
+
+    yield _HEADER.format(count=len(items))
+    ids = [t.id for t, _ in items]
+    for i in range(0, len(ids), _TRACK_CHUNK):
+        yield f"W11T-Track {_ids(ids[i:i + _TRACK_CHUNK])}\n"
+    yield "\n"
+    for tid, msg, skipped in problems:
+        if skipped:
+            yield f"$W11TSkipped.Add({quote(tid)}); $W11T[{quote(tid)}].Add({quote(msg)})\n"
+        else:
+            yield f"W11T-Fail {quote(tid)} {quote(msg)}\n"
+    if problems:
+        yield "\n"
+
+    for root, groups in keys.items():
+        if groups:
+            yield f"# ---- Registry: {r.ROOT_NAMES.get(root, root)} ----\n"
+        for entries in groups.values():
+            yield _key_block(entries)
+
+    if fragments:
+        yield "# ---- PowerShell ----\n"
+        seen: List[str] = []
+        for _, frag in fragments:
+            if frag.prelude and frag.prelude not in seen:
+                seen.append(frag.prelude)
+                yield f"try {{ {frag.prelude} }} catch {{ }}\n"
+        yield "\n"
+        for t, frag in fragments:
+            yield _fragment_block(t.id, t.label, frag)
+    yield _FOOTER
+
+
+def write_script(items: Sequence[Tuple[Tweak, Any]], out: TextIO) -> int:
+    """Stream the script to a text file; returns the number of characters written."""
+    n = 0
+    for chunk in iter_script(items):
+        out.write(chunk)
+        n += len(chunk)
+    return n
+
+
+def export_script(items: Sequence[Tuple[Tweak, Any]], path: str) -> Tuple[bool, str]:
+    try:
+        # utf-8-sig: Windows PowerShell 5.1 reads BOM-less scripts as ANSI
+        with open(path, "w", encoding="utf-8-sig", newline="\r\n") as f:
+            write_script(items, f)
+    except OSError as e:
+        return False, f"export failed: {e}"
+    return True, f"wrote {path}"
@@ -0,0 +1,120 @@
+from __future__ import annotations
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .model import Tweak
+from util import ps
+
+# Post-apply side effects (Explorer restart, group-policy refresh, service
+# restarts). Tweaks name the effects they need in Tweak.side_effects; after
+# the writes of an apply, the effects of every tweak that succeeded are
+# collected, de-duplicated and run once each: services first, then the
+# policy refresh, Explorer last.
+#
+# Inside deferred() (e.g. Apply All, one category at a time) applies only
+# collect; whoever opened the outermost block runs the effects after it
+# closes. Outside one, run_apply runs them itself at the end.
+
+EXPLORER = "explorer"
+POLICY = "policy"
+_SERVICE = "service:"
+
+
+def service(name: str) -> str:
+    """Side effect key: restart the named Windows service."""
+    return _SERVICE + name
+
+
+class SideEffect(NamedTuple):
+    key: str
+    label: str
+    run: Callable[[], Tuple[bool, str]]
+    # Disruptive enough that the GUI asks first: with this text, and a "Don't ask again" preference under this key
+    confirm: bool = False
+    prompt: str = ""
+    ask_setting: str = ""
+
+
+def resolve(key: str) -> SideEffect:
+    if key == EXPLORER:
+        return SideEffect(key, "Restart Windows Explorer", ps.restart_explorer, confirm=True,
+                          prompt="Some changes may require restarting Windows Explorer to take effect.",
+                          ask_setting="General/AskRestartExplorer")
+    if key == POLICY:
+        return SideEffect(key, "Refresh group policy", ps.refresh_policy)
+    if key.startswith(_SERVICE):
+        name = key[len(_SERVICE):]
+        return SideEffect(key, f"Restart service {name}", lambda: ps.restart_service(name))
+    raise ValueError(f"unknown side effect {key!r}")
+
+
+def _order(key: str) -> int:
+    return 2 if key == EXPLORER else 1 if key == POLICY else 0
+
+
+def required(tweaks: Iterable[Tweak]) -> List[str]:
+    """Distinct side effect keys of the given tweaks, in the order they should run."""
+    keys = dict.fromkeys(k for t in tweaks for k in getattr(t, "side_effects", None) or ())
+    return sorted(keys, key=_order)  # stable: first-declared order within a rank
+
+
+def run(keys: Iterable[str], skip: Iterable[str] = ()) -> List[Tuple[str, bool, str]]:
+    """Run each effect once, in order; [(key, ok, message)]."""
+    skipped = set(skip)
+    out: List[Tuple[str, bool, str]] = []
+    for key in sorted(dict.fromkeys(keys), key=_order):
+        if key in skipped:
+            continue
+        try:
+            ok, msg = resolve(key).run()
+        except Exception as e:
+            ok, msg = False, str(e)
+        out.append((key, ok, msg))
+    return out
+
+
+# ---- Deferral across applies ----
+#
+# The open block lives in a context variable, so it belongs to one run: a
+# drift-watch check on its thread and a GUI apply never share one. Threads
+# start with an empty context; code that hands an apply to another thread
+# runs it in a copy of its own (contextvars.copy_context(), see
+# tweaks/executor.py) so the block follows it.
+
+_lock = threading.Lock()
+_pending: ContextVar[Optional[List[str]]] = ContextVar("side_effects_pending", default=None)
+
+
+@contextmanager
+def deferred() -> Iterator[List[str]]:
+    """Collect the side effects of every apply in the block; yields the list of keys (shared with an enclosing block)."""
+    acc = _pending.get()
+    if acc is not None:
+        yield acc
+        return
+    acc = []
+    token = _pending.set(acc)
+    try:
+        yield acc
+    finally:
+        _pending.reset(token)
+
+
+def deferring() -> bool:
+    """True inside deferred(): an outer block will run the collected effects."""
+    return _pending.get() is not None
+
+
+def collect(tweaks: Iterable[Tweak]) -> bool:
+    """Add the tweaks' effects to the open deferred() block; False (nothing added) when none is open."""
+    acc = _pending.get()
+    if acc is None:
+        return False
+    keys = required(tweaks)
+    with _lock:
+        for k in keys:
+            if k not in acc:
+                acc.append(k)
+    return True
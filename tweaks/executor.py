@@ -0,0 +1,118 @@
+from __future__ import annotations
+import contextvars, threading
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
+
+from PySide6.QtCore import QObject, QEventLoop, Qt, Signal
+from PySide6.QtWidgets import QProgressDialog, QWidget
+
+from .model import Tweak
+from .pipeline import run_apply, MAX_WORKERS
+from .plan import Plan
+
+# Runs the apply pipeline off the GUI thread. Signals are emitted from worker
+# threads and delivered to receivers on the GUI thread (queued connections).
+# Work runs in a copy of the caller's context, so an effects.deferred() block
+# opened around the call collects the apply's side effects.
+
+
+class ApplyExecutor(QObject):
+    progress = Signal(str, bool, str)  # tweak id, ok, message
+    finished = Signal(list)            # [(Tweak, ok, message)] in input order
+
+    def __init__(self, parent: Optional[QObject] = None, max_workers: int = MAX_WORKERS):
+        super().__init__(parent)
+        self.max_workers = max_workers
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, items: Sequence[Tuple[Tweak, Any]], plan: Optional[Plan] = None):
+        """Apply items, or run a plan (items are then the plan's, for error reporting)."""
+        if self.running():
+            raise RuntimeError("apply already in progress")
+        self._cancel.clear()
+        items = list(items)
+        run = plan.execute if plan is not None else lambda **kw: run_apply(items, **kw)
+
+        def work():
+            try:
+                results = run(progress=lambda t, ok, out: self.progress.emit(t.id, ok, out),
+                              cancel=self._cancel, max_workers=self.max_workers)
+            except Exception as e:
+                results = [(t, False, str(e)) for t, _ in items]
+            self.finished.emit(results)
+
+        ctx = contextvars.copy_context()
+        self._thread = threading.Thread(target=ctx.run, args=(work,), name="apply-executor", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Stop before the next tweak or batch; work already running completes."""
+        self._cancel.set()
+
+
+def apply_with_progress(parent: QWidget, items: Union[Sequence[Tuple[Tweak, Any]], Plan],
+                        title: str = "Applying") -> List[Tuple[Tweak, bool, str]]:
+    """Apply (or run a Plan) in the background behind a cancellable progress dialog; the event loop keeps running meanwhile."""
+    plan = items if isinstance(items, Plan) else None
+    items = plan.items() if plan is not None else list(items)
+    dlg = QProgressDialog(f"{title}…", "Cancel", 0, len(items), parent)
+    dlg.setWindowTitle(title)
+    dlg.setWindowModality(Qt.WindowModality.WindowModal)
+    dlg.setMinimumDuration(300)
+    ex = ApplyExecutor(parent)
+    loop = QEventLoop()
+    out: List[Tuple[Tweak, bool, str]] = []
+    labels = {t.id: t.label for t, _ in items}
+
+    def on_progress(tid: str, ok: bool, msg: str):
+        dlg.setValue(dlg.value() + 1)
+        dlg.setLabelText(f"{labels.get(tid, tid)}: {'ok' if ok else 'failed'}")
+
+    def on_finished(results: list):
+        out.extend(results)
+        loop.quit()
+
+    ex.progress.connect(on_progress)
+    ex.finished.connect(on_finished)
+    dlg.canceled.connect(ex.cancel)
+    ex.start(items, plan)
+    loop.exec()
+    dlg.close()
+    ex.deleteLater()
+    return out
+
+
+class _Done(QObject):
+    done = Signal(object)
+
+
+def run_in_background(parent: QWidget, title: str, fn: Callable[[], Any]) -> Any:
+    """Run a blocking call (restore point, Explorer restart) off the GUI thread and return its result."""
+    dlg = QProgressDialog(f"{title}…", None, 0, 0, parent)
+    dlg.setWindowTitle(title)
+    dlg.setWindowModality(Qt.WindowModality.WindowModal)
+    dlg.setMinimumDuration(300)
+    sig = _Done()
+    loop = QEventLoop()
+    box: List[Any] = []
+
+    def on_done(res):
+        box.append(res)
+        loop.quit()
+
+    sig.done.connect(on_done)
+
+    def work():
+        try:
+            res = fn()
+        except Exception as e:
+            res = (False, str(e))
+        sig.done.emit(res)
+
+    threading.Thread(target=contextvars.copy_context().run, args=(work,), daemon=True).start()
+    loop.exec()
+    dlg.close()
+    return box[0]
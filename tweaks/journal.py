@@ -0,0 +1,191 @@
+from __future__ import annotations
+import base64, glob, json, os, threading, time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from util import registry as r
+from util.settings import config_dir
+
+# Pre-apply journal: a light, per-run alternative to a System Restore point.
+#
+# Before registry writes run, the previous value of every target is read in
+# one grouped pass and appended to a JSON-lines file for the run (absent
+# values included, so rollback deletes what the apply created). Rolling back
+# replays the newest journal that was not rolled back yet as one registry
+# session. Applies inside run_group() share one journal. PowerShell fragments and plain apply functions are not journaled.
+#
+# Record lines:
+#   {"run": ..., "started": ...}                                  header
+#   {"tweak", "root", "path", "name", "absent" | "value"+"type"}  one per target
+#   {"finished": ..., "ok": [...], "failed": [...]}               after apply
+#   {"rolled_back": ...}                                          after rollback
+
+KEEP_RUNS = 20
+_HIVES = {name: root for root, name in r.ROOT_NAMES.items()}
+_lock = threading.Lock()
+_group: Optional["Journal"] = None
+_grouping = 0
+
+
+def journal_dir() -> str:
+    return os.environ.get("TWEAKER_JOURNAL_DIR") or os.path.join(config_dir(), "journal")
+
+
+def encode_value(value: Any) -> Any:
+    """Registry value as JSON (REG_BINARY bytes as {"b64": ...}); shared with saved plans."""
+    if isinstance(value, (bytes, bytearray)):
+        return {"b64": base64.b64encode(bytes(value)).decode("ascii")}
+    return value
+
+
+def decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "b64" in value:
+        return base64.b64decode(value["b64"])
+    return value
+
+
+class Journal:
+    """One apply run's journal file; lines are appended and fsynced, never rewritten."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._recorded: set = set()
+
+    @classmethod
+    def begin(cls, targets: Sequence[Tuple[str, r.RegOp]]) -> Optional["Journal"]:
+        """Record the current value of each (tweak id, op) target; None when the registry can't be read."""
+        global _group
+        # First op per target; later ops in the same run don't change the pre-run value
+        firsts: Dict[Tuple[Any, str, str], Tuple[str, r.RegOp]] = {}
+        for tid, op in targets:
+            firsts.setdefault((*r.key_id(op.root, op.path), op.name.lower()), (tid, op))
+        if not firsts or not r.get_backend().supported:
+            return None
+        with _lock:
+            j = _group
+            if j is not None:
+                for k in j._recorded.intersection(firsts):
+                    del firsts[k]
+        entries = r.get_reg_entries([(op.root, op.path, op.name) for _, op in firsts.values()], cached=False)
+        lines: List[Dict[str, Any]] = []
+        for (tid, op), entry in zip(firsts.values(), entries):
+            if entry is r.UNREADABLE:
+                continue  # can't restore what couldn't be read; leave it alone on rollback
+            rec = {"tweak": tid, "root": r.ROOT_NAMES.get(op.root, op.root), "path": op.path, "name": op.name}
+            if entry is None:
+                rec["absent"] = True
+            else:
+                rec["value"], rec["type"] = encode_value(entry[0]), entry[1]
+            lines.append(rec)
+        with _lock:
+            if j is None:
+                now = time.time_ns()
+                run = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now / 1e9))}-{now % 10**9:09d}"
+                os.makedirs(journal_dir(), exist_ok=True)
+                j = cls(os.path.join(journal_dir(), f"apply-{run}.jsonl"))
+                lines.insert(0, {"run": run, "started": now / 1e9})
+                if _grouping:
+                    _group = j
+            if lines:
+                j._append(lines)
+            j._recorded.update(firsts)
+        _prune()
+        return j
+
+    def _append(self, records: Iterable[Dict[str, Any]]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(rec, sort_keys=True) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def finish(self, results: Sequence[Tuple[Any, bool, str]]):
+        self._append([{"finished": time.time(),
+                       "ok": [t.id for t, ok, _ in results if ok],
+                       "failed": [t.id for t, ok, _ in results if not ok]}])
+
+    def records(self) -> List[Dict[str, Any]]:
+        out = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    out.append(json.loads(line))
+                except ValueError:
+                    break  # torn last line from a crash mid-append
+        return out
+
+    def targets(self) -> List[Dict[str, Any]]:
+        return [rec for rec in self.records() if "name" in rec]
+
+    def rolled_back(self) -> bool:
+        return any("rolled_back" in rec for rec in self.records())
+
+    def tweak_ids(self) -> List[str]:
+        return list(dict.fromkeys(rec["tweak"] for rec in self.targets()))
+
+    def rollback(self) -> Tuple[bool, str]:
+        """Restore every journaled target in one registry session."""
+        session = r.RegistrySession()
+        for rec in self.targets():
+            root = _HIVES.get(rec["root"], rec["root"])
+            if rec.get("absent"):
+                session.delete(root, rec["path"], rec["name"])
+            else:
+                session.set(root, rec["path"], rec["name"], decode_value(rec["value"]), rec["type"])
+        results = session.flush()
+        failed = [m for ok, m in results if not ok]
+        self._append([{"rolled_back": time.time(), "failed": len(failed)}])
+        if results and len(failed) == len(results) and all(m == r.UNSUPPORTED for m in failed):
+            return False, r.UNSUPPORTED
+        if failed:
+            return False, "; ".join(failed)
+        return True, f"restored {len(results)} registry value(s)"
+
+
+@contextmanager
+def run_group():
+    """Journal every apply started inside the block (e.g. Apply All, one category at a time) as one run."""
+    global _group, _grouping
+    with _lock:
+        _grouping += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _grouping -= 1
+            if not _grouping:
+                _group = None
+
+
+def journals() -> List[Journal]:
+    """All journals, newest first (run ids sort by start time)."""
+    paths = glob.glob(os.path.join(journal_dir(), "apply-*.jsonl"))
+    return [Journal(p) for p in sorted(paths, reverse=True)]
+
+
+def last_journal() -> Optional[Journal]:
+    """Newest run that has not been rolled back yet."""
+    for j in journals():
+        try:
+            if not j.rolled_back():
+                return j
+        except OSError:
+            continue
+    return None
+
+
+def rollback_last() -> Tuple[bool, str, List[str]]:
+    """(ok, message, ids of the tweaks touched by the rolled back run)."""
+    j = last_journal()
+    if j is None:
+        return False, "no apply to roll back", []
+    ok, msg = j.rollback()
+    return ok, msg, j.tweak_ids()
+
+
+def _prune():
+    for j in journals()[KEEP_RUNS:]:
+        try:
+            os.remove(j.path)
+        except OSError:
+            pass
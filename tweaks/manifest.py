@@ -0,0 +1,229 @@
+from __future__ import annotations
+import hashlib, importlib, importlib.util, json, os, pkgutil, tempfile, threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .model import Constraint, Probe, Tweak
+from util.timing import phase
+
+# Manifest cache for tweak discovery.
+#
+# Tweak metadata (ids, labels, controls, defaults, options, probe reads,
+# constraint refs, side effects) is
+# cached on disk per module, keyed on the module file's mtime/size and
+# SHA-256. Fresh entries become Tweak objects whose callables import the
+# module only when first called; stale or new modules are imported and
+# their entries rebuilt.
+#
+# Entries also depend on the modules every tweak module builds on (and on
+# this file's entry format); their stamps are kept next to the entries, and
+# when one of them changes, every entry is rebuilt.
+
+MANIFEST_VERSION = 3
+# Tweak, Probe and Constraint; side effect keys; registry ops and constants; PowerShell fragments and queries
+SHARED_MODULES = ("tweaks.model", "tweaks.effects", "util.registry", "util.psbatch", "util.psquery")
+_FIELDS = ("id", "category", "label", "type", "default", "tooltip", "help", "warning",
+           "options", "minimum", "maximum", "step", "side_effects")
+
+
+def cache_dir() -> str:
+    base = (os.environ.get("TWEAKER_CACHE_DIR") or os.environ.get("LOCALAPPDATA")
+            or os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "Windows11Tweaker")
+
+
+def manifest_path() -> str:
+    return os.path.join(cache_dir(), "tweaks-manifest.json")
+
+
+# ---- Lazy resolution ----
+
+_resolved: Dict[str, Dict[str, Tweak]] = {}
+_resolve_lock = threading.Lock()
+
+
+def resolve(module: str, tid: str) -> Tweak:
+    """Import `module` (once) and return its real Tweak `tid`."""
+    with _resolve_lock:
+        tweaks = _resolved.get(module)
+        if tweaks is None:
+            mod = importlib.import_module(module)
+            tweaks = {t.id: t for t in mod.get_tweaks()}
+            _resolved[module] = tweaks
+    return tweaks[tid]
+
+
+class _LazyCall:
+    """Stand-in for a tweak callable (apply, reg_ops, ...) that imports its module on first call.
+
+    attrs is the path from the tweak to the callable; ints index into lists (constraints, 0, check).
+    """
+    __slots__ = ("module", "tid", "attrs")
+
+    def __init__(self, module: str, tid: str, *attrs: Any):
+        self.module = module
+        self.tid = tid
+        self.attrs = attrs
+
+    def __call__(self, *args):
+        target: Any = resolve(self.module, self.tid)
+        for a in self.attrs:
+            target = target[a] if isinstance(a, int) else getattr(target, a)
+        return target(*args)
+
+
+# ---- Entries ----
+
+def _stamp(path: str, prev: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    st = os.stat(path)
+    if prev and prev.get("mtime_ns") == st.st_mtime_ns and prev.get("size") == st.st_size:
+        return prev  # unchanged on disk; skip hashing
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest}
+
+
+def _shared_stamps(prev: Dict[str, Any]) -> Dict[str, Any]:
+    files = {"tweaks.manifest": __file__}
+    for name in SHARED_MODULES:
+        spec = importlib.util.find_spec(name)
+        files[name] = spec.origin if spec is not None else None
+    out: Dict[str, Any] = {}
+    for name, src in files.items():
+        try:
+            out[name] = _stamp(src, prev.get(name)) if src else None
+        except OSError:
+            out[name] = None
+    return out
+
+
+def _digests(stamps: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: (v or {}).get("sha256") for k, v in stamps.items()}
+
+
+def _probe_entry(p: Probe) -> Dict[str, Any]:
+    entry: Dict[str, Any] = {"reads": [list(rd) for rd in p.reads]}
+    # reg_probe with a lookup table decodes without importing the module
+    table = getattr(p.decode, "__self__", None)
+    if isinstance(table, dict) and getattr(p.decode, "__name__", "") == "get":
+        entry["map"] = [[k, v] for k, v in table.items()]
+    return entry
+
+
+def tweak_entry(t: Tweak) -> Dict[str, Any]:
+    e = {f: getattr(t, f) for f in _FIELDS}
+    e["has_ps_fragment"] = t.ps_fragment is not None
+    e["has_reg_ops"] = t.reg_ops is not None
+    e["probe"] = _probe_entry(t.probe) if t.probe is not None else None
+    e["constraints"] = [{"refs": list(c.refs), "message": c.message} for c in t.constraints or ()]
+    return e
+
+
+def _lazy_probe(module: str, e: Dict[str, Any]) -> Optional[Probe]:
+    p = e.get("probe")
+    if not p:
+        return None
+    reads = tuple(tuple(rd) for rd in p["reads"])
+    if "map" in p:
+        table = {k: v for k, v in p["map"]}
+        return Probe(reads, table.get)
+    return Probe(reads, _LazyCall(module, e["id"], "probe", "decode"))
+
+
+def lazy_tweak(module: str, e: Dict[str, Any]) -> Tweak:
+    tid = e["id"]
+    return Tweak(
+        **{f: e[f] for f in _FIELDS},
+        apply=_LazyCall(module, tid, "apply"),
+        ps_fragment=_LazyCall(module, tid, "ps_fragment") if e["has_ps_fragment"] else None,
+        reg_ops=_LazyCall(module, tid, "reg_ops") if e["has_reg_ops"] else None,
+        probe=_lazy_probe(module, e),
+        constraints=[Constraint(tuple(c["refs"]), _LazyCall(module, tid, "constraints", i, "check"), c["message"])
+                     for i, c in enumerate(e["constraints"])] or None,
+    )
+
+
+# ---- Load / store ----
+
+def _read(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == MANIFEST_VERSION and isinstance(data.get("modules"), dict):
+            return data
+    except Exception:
+        pass
+    return {"version": MANIFEST_VERSION, "modules": {}}
+
+
+def _write(path: str, data: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _discover(package: str, paths: Iterable[str], internal: Iterable[str]) -> List[Tuple[str, str]]:
+    """[(qualified module name, source file)] for tweak modules in the package."""
+    skip = set(internal)
+    out = []
+    for finder, modname, ispkg in pkgutil.iter_modules(list(paths)):
+        if ispkg or modname in skip:
+            continue
+        out.append((f"{package}.{modname}", os.path.join(getattr(finder, "path", ""), modname + ".py")))
+    return out
+
+
+def load_tweaks(package: str, paths: Iterable[str], internal: Iterable[str], path: Optional[str] = None) -> List[Tweak]:
+    """Load tweaks through the manifest, importing only modules whose entries are missing or stale."""
+    path = path or manifest_path()
+    data = _read(path)
+    prev_shared = data.get("shared") or {}
+    shared = _shared_stamps(prev_shared)
+    if _digests(shared) != _digests(prev_shared):
+        data["modules"] = {}  # a shared module changed: no entry can be trusted
+    prefix = package + "."
+    # Entries of other packages sharing the cache file are kept as they are
+    others = {k: v for k, v in data["modules"].items() if not k.startswith(prefix)}
+    old = {k: v for k, v in data["modules"].items() if k.startswith(prefix)}
+    modules: Dict[str, Any] = {}
+    tweaks: List[Tweak] = []
+    changed = False
+    for module, src in _discover(package, paths, internal):
+        entry = old.get(module)
+        try:
+            stamp = _stamp(src, entry.get("stamp") if entry else None)
+        except OSError:
+            stamp = None
+        if entry is not None and stamp is not None and entry["stamp"].get("sha256") == stamp["sha256"]:
+            if entry["stamp"] != stamp:
+                entry["stamp"] = stamp  # touched but identical content
+                changed = True
+            with phase("load_module", module=module, source="manifest"):
+                tweaks.extend(lazy_tweak(module, e) for e in entry["tweaks"])
+            modules[module] = entry
+            continue
+        with phase("load_module", module=module, source="import"):
+            mod = importlib.import_module(module)
+            real = list(mod.get_tweaks()) if hasattr(mod, "get_tweaks") else []
+        with _resolve_lock:
+            _resolved[module] = {t.id: t for t in real}
+        tweaks.extend(real)
+        if stamp is not None:
+            modules[module] = {"stamp": stamp, "tweaks": [tweak_entry(t) for t in real]}
+        changed = True
+    if changed or set(modules) != set(old) or shared != prev_shared:
+        data["modules"] = {**others, **modules}
+        data["shared"] = shared
+        try:
+            _write(path, data)
+        except Exception:
+            pass  # unwritable cache dir or metadata JSON can't hold; discovery still worked
+    return tweaks
@@ -0,0 +1,111 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+# Tweak model. Kept free of Qt so discovery, settings and the apply pipeline
+# run headless; widgets live in tweaks.base.
+
+Category = str
+# Apply returns (ok, message)
+ApplyFn = Callable[[Any], Tuple[bool, str]]
+# Optional PowerShell fragment builder; returns util.psbatch.PSFragment (or None when nothing to do)
+FragmentFn = Callable[[Any], Any]
+# Optional registry write declaration; returns a list of util.registry.RegOp
+RegOpsFn = Callable[[Any], List[Any]]
+
+
+class Probe(NamedTuple):
+    """Read-back of a tweak's live state: registry values in, control value out.
+
+    decode receives one argument per read (None when the value is absent) and
+    returns the matching control value, or None when the state doesn't map to one.
+    """
+    reads: Tuple[Tuple[Any, str, str], ...]
+    decode: Callable[..., Any]
+
+
+class Constraint(NamedTuple):
+    """Cross-field rule: check receives the values of refs (in order) and returns True when they are consistent.
+
+    Declared on any one of the tweaks involved; refs may span categories.
+    """
+    refs: Tuple[str, ...]
+    check: Callable[..., bool]
+    message: str
+
+
+def reg_probe(root, path: str, name: str, decode: Union[Callable[[Any], Any], Dict[Any, Any]]) -> Probe:
+    """Probe for a single registry value; decode may be a {registry value: control value} map."""
+    fn = decode.get if isinstance(decode, dict) else decode
+    return Probe(((root, path, name),), fn)
+
+
+@dataclass
+class Tweak:
+    id: str
+    category: Category
+    label: str
+    type: str  # dropdown|toggle|number|slider|text
+    default: Any
+    tooltip: str = ""
+    help: str = ""
+    warning: str = ""
+    options: Optional[List[str]] = None
+    minimum: Optional[int] = None
+    maximum: Optional[int] = None
+    step: Optional[int] = None
+    apply: ApplyFn = lambda value: (True, "noop")
+    # When set, the apply pipeline batches this tweak's PowerShell with the others instead of calling apply
+    ps_fragment: Optional[FragmentFn] = None
+    # Registry writes, flushed in one session with every other tweak's writes (one open per key)
+    reg_ops: Optional[RegOpsFn] = None
+    # Optional read-back of the machine's current value (see Probe)
+    probe: Optional[Probe] = None
+    # Rules over this and other tweaks' values, checked as the user edits (see tweaks.constraints)
+    constraints: Optional[List[Constraint]] = None
+    # What must happen after the write for it to take effect, e.g. "explorer" (see tweaks.effects)
+    side_effects: Optional[List[str]] = None
+
+
+def coerce_value(t: Tweak, raw: Any) -> Any:
+    """Turn a stored setting (QSettings hands back strings on most backends) into the control's value type."""
+    if t.type == "toggle":
+        return raw is True or str(raw).lower() == "true"
+    if t.type in ("number", "slider"):
+        if type(raw) is int:  # already typed (JSON settings store)
+            return raw
+        try:
+            return int(str(raw))
+        except Exception:
+            return int(t.default)
+    if t.type == "dropdown":
+        sval = str(raw)
+        return sval if t.options and sval in t.options else t.default
+    return str(raw)
+
+
+def strict_value(t: Tweak, raw: Any) -> Any:
+    """Like coerce_value for external input (profiles), but raises ValueError instead of falling back to the default."""
+    if t.type == "toggle":
+        if isinstance(raw, bool):
+            return raw
+        if str(raw).lower() in ("true", "false"):
+            return str(raw).lower() == "true"
+        raise ValueError(f"expected true or false, got {raw!r}")
+    if t.type in ("number", "slider"):
+        if isinstance(raw, bool) or not isinstance(raw, (int, str)):
+            raise ValueError(f"expected a whole number, got {raw!r}")
+        try:
+            val = int(raw)
+        except ValueError:
+            raise ValueError(f"expected a whole number, got {raw!r}") from None
+        if (t.minimum is not None and val < t.minimum) or (t.maximum is not None and val > t.maximum):
+            raise ValueError(f"{val} is outside {t.minimum}..{t.maximum}")
+        return val
+    if t.type == "dropdown":
+        if not t.options or raw not in t.options:
+            raise ValueError(f"{raw!r} is not one of {t.options}")
+        return raw
+    if not isinstance(raw, str):
+        raise ValueError(f"expected text, got {raw!r}")
+    return raw
@@ -1,7 +1,10 @@
 from __future__ import annotations
-from typing import List
-from .base import Tweak
-from util.ps import ps
+from typing import List, NamedTuple, Optional, Tuple
+from .model import Constraint, Tweak, reg_probe
+from .effects import POLICY
+from .updates import WU_DISABLED
+from util import psquery, registry as r
+from util.psbatch import PSFragment, run_fragment
 
 # ---- Network implementations ----
 
@@ -13,32 +16,130 @@ DNS_PRESETS = {
 }
 
 
-def apply_dns(preset: str) -> tuple[bool, str]:
-    # Applies to all Ethernet/Wi-Fi adapters set to DHCP; advanced setups may need per-adapter selection.
+# Adapters the DNS tweaks touch; shared by every DNS fragment in a batch
+NIC_PRELUDE = "$__w11t_nics = @(Get-DnsClient | Where-Object {$_.InterfaceAlias -match 'Ethernet|Wi-Fi'})"
+DO_POLICY_KEY = r"Software\Policies\Microsoft\Windows\DeliveryOptimization"
+DO_POLICY = "HKLM:" + DO_POLICY_KEY
+DOH_SERVER = "1.1.1.1"
+DOH_TEMPLATE = "https://cloudflare-dns.com/dns-query"
+
+
+# ---- Live network state (cached queries) ----
+
+class NicDns(NamedTuple):
+    index: int
+    alias: str
+    servers: Tuple[str, ...]
+    static: bool  # servers set by hand (NameServer in the registry) rather than by DHCP
+
+
+class DohEntry(NamedTuple):
+    server: str
+    template: str
+    auto_upgrade: bool
+
+
+NIC_QUERY = (
+    "Get-DnsClient | Where-Object {$_.InterfaceAlias -match 'Ethernet|Wi-Fi'} | ForEach-Object { "
+    "$a = Get-NetAdapter -InterfaceIndex $_.InterfaceIndex -ErrorAction SilentlyContinue; "
+    "$ns = if ($a) { (Get-ItemProperty \"HKLM:\\SYSTEM\\CurrentControlSet\\Services\\Tcpip\\Parameters\\Interfaces\\$($a.InterfaceGuid)\" "
+    "-ErrorAction SilentlyContinue).NameServer }; "
+    "[pscustomobject]@{ Index = $_.InterfaceIndex; Alias = $_.InterfaceAlias; Static = [bool]$ns; "
+    "Servers = @((Get-DnsClientServerAddress -InterfaceIndex $_.InterfaceIndex -AddressFamily IPv4).ServerAddresses) } }"
+)
+DOH_QUERY = "Get-DnsClientDohServerAddress | Select-Object ServerAddress, DohTemplate, AutoUpgrade"
+
+
+def _parse_nics(rows: List[dict]) -> List[NicDns]:
+    return [NicDns(int(x["Index"]), str(x["Alias"]), tuple(str(a) for a in (x.get("Servers") or ())), bool(x.get("Static")))
+            for x in rows]
+
+
+def _parse_doh(rows: List[dict]) -> List[DohEntry]:
+    return [DohEntry(str(x["ServerAddress"]), str(x.get("DohTemplate") or ""), bool(x.get("AutoUpgrade"))) for x in rows]
+
+
+def dns_adapters() -> Optional[List[NicDns]]:
+    """Ethernet/Wi-Fi adapters with their IPv4 DNS servers; None when they can't be queried."""
+    return psquery.query(NIC_QUERY, _parse_nics)
+
+
+def doh_entries() -> Optional[List[DohEntry]]:
+    return psquery.query(DOH_QUERY, _parse_doh)
+
+
+# ---- Fragments ----
+
+def dns_fragment(preset: str) -> Optional[PSFragment]:
+    """Commands for the adapters whose DNS differs from the preset; None when all already match."""
     servers = DNS_PRESETS.get(preset)
+    nics = dns_adapters()
+    if nics is None:
+        return _dns_fragment_all(servers)
     if servers is None:
-        # Reset to DHCP
-        ok1, m1 = ps("Get-DnsClient | Where-Object {$_.InterfaceAlias -match 'Ethernet|Wi-Fi'} | ForEach-Object { Set-DnsClientServerAddress -InterfaceIndex $_.InterfaceIndex -ResetServerAddresses }")
-        return ok1, m1
-    cmd = (
-        "Get-DnsClient | Where-Object {$_.InterfaceAlias -match 'Ethernet|Wi-Fi'} | "
-        f"ForEach-Object {{ Set-DnsClientServerAddress -InterfaceIndex $_.InterfaceIndex -ServerAddresses {servers[0]},{servers[1]} }}"
+        # Reset to DHCP only where servers were set by hand
+        cmds = [f"Set-DnsClientServerAddress -InterfaceIndex {n.index} -ResetServerAddresses" for n in nics if n.static]
+    else:
+        cmds = [f"Set-DnsClientServerAddress -InterfaceIndex {n.index} -ServerAddresses {','.join(servers)}"
+                for n in nics if list(n.servers) != servers]
+    return PSFragment("; ".join(cmds)) if cmds else None
+
+
+def _dns_fragment_all(servers: Optional[List[str]]) -> PSFragment:
+    # No inventory (exported script, query failed): every Ethernet/Wi-Fi adapter, each checked in the script itself
+    if servers is None:
+        return PSFragment("$__w11t_nics | ForEach-Object { Set-DnsClientServerAddress -InterfaceIndex $_.InterfaceIndex -ResetServerAddresses }", NIC_PRELUDE)
+    want = ",".join(servers)
+    return PSFragment(
+        "$__w11t_nics | ForEach-Object { "
+        "if ((@((Get-DnsClientServerAddress -InterfaceIndex $_.InterfaceIndex -AddressFamily IPv4).ServerAddresses) -join ',') -ne "
+        f"'{want}') {{ Set-DnsClientServerAddress -InterfaceIndex $_.InterfaceIndex -ServerAddresses {want} }} }}",
+        NIC_PRELUDE,
     )
-    return ps(cmd)
 
 
-def apply_doh(enable: bool) -> tuple[bool, str]:
+def doh_fragment(enable: bool) -> Optional[PSFragment]:
     # Windows 11 DoH per-profile is usually configured by DNS policy; simplified approach via PowerShell netsh
+    entries = doh_entries()
+    if entries is not None:
+        cur = next((e for e in entries if e.server == DOH_SERVER), None)
+        if enable and cur is not None and cur.template == DOH_TEMPLATE and cur.auto_upgrade:
+            return None
+        if not enable and cur is None:
+            return None
     if enable:
-        return ps("netsh dns add encryption server=1.1.1.1 dohtemplate=https://cloudflare-dns.com/dns-query autoupgrade=yes")
-    else:
-        return ps("netsh dns delete encryption server=1.1.1.1")
+        return PSFragment(f"netsh dns add encryption server={DOH_SERVER} dohtemplate={DOH_TEMPLATE} autoupgrade=yes")
+    return PSFragment(f"netsh dns delete encryption server={DOH_SERVER}")
 
 
-def apply_wu_bandwidth(limit_percent: int) -> tuple[bool, str]:
+def wu_bandwidth_fragment(limit_percent: int) -> PSFragment:
     # Delivery Optimization policy
     # DODownloadMode=3 (HTTP blended) often default; limit via MaxDownloadBandwidth
-    return ps(f"Set-DeliveryOptimizationStatus -Verbose; New-Item -Path HKLM:Software\\Policies\\Microsoft\\Windows\\DeliveryOptimization -Force; New-ItemProperty -Path HKLM:Software\\Policies\\Microsoft\\Windows\\DeliveryOptimization -Name MaxDownloadBandwidth -Value {limit_percent} -PropertyType DWord -Force")
+    return PSFragment(f"Set-DeliveryOptimizationStatus -Verbose; New-Item -Path {DO_POLICY} -Force; New-ItemProperty -Path {DO_POLICY} -Name MaxDownloadBandwidth -Value {limit_percent} -PropertyType DWord -Force")
+
+
+def bw_limit_allowed(limit: int, mode: str) -> bool:
+    """Constraint on wu_bw_limit: no limit while wu_mode turns automatic updates off.
+
+    Keyed on Windows Update's mode rather than on Delivery Optimization itself,
+    because no tweak here sets the DO download mode: with automatic updates off
+    there are no update downloads for DO to throttle, so a limit is a no-op.
+    """
+    return not limit or mode != WU_DISABLED
+
+
+def apply_dns(preset: str) -> tuple[bool, str]:
+    frag = dns_fragment(preset)
+    return run_fragment(frag) if frag is not None else (True, "already set")
+
+
+def apply_doh(enable: bool) -> tuple[bool, str]:
+    frag = doh_fragment(enable)
+    return run_fragment(frag) if frag is not None else (True, "already set")
+
+
+def apply_wu_bandwidth(limit_percent: int) -> tuple[bool, str]:
+    return run_fragment(wu_bandwidth_fragment(limit_percent))
 
 
 def get_tweaks() -> List[Tweak]:
@@ -51,7 +152,8 @@ def get_tweaks() -> List[Tweak]:
             options=list(DNS_PRESETS.keys()),
             default="System default",
             tooltip="Applies to Ethernet/Wi-Fi adapters; advanced setups may need manual per-adapter changes.",
-            apply=lambda v: apply_dns(v)
+            apply=lambda v: apply_dns(v),
+            ps_fragment=dns_fragment,
         ),
         Tweak(
             id="doh",
@@ -61,7 +163,8 @@ def get_tweaks() -> List[Tweak]:
             default=False,
             tooltip="Enables DoH for known DNS endpoints (simplified).",
             warning="Implementation is simplified; advanced users should configure per-profile.",
-            apply=lambda v: apply_doh(v)
+            apply=lambda v: apply_doh(v),
+            ps_fragment=doh_fragment,
         ),
         Tweak(
             id="wu_bw_limit",
@@ -71,6 +174,11 @@ def get_tweaks() -> List[Tweak]:
             minimum=0, maximum=100, step=5,
             default=0,
             tooltip="Limit Windows Update bandwidth as % of measured throughput.",
-            apply=lambda v: apply_wu_bandwidth(v)
+            apply=lambda v: apply_wu_bandwidth(v),
+            ps_fragment=wu_bandwidth_fragment,
+            probe=reg_probe(r.HKEY_LOCAL_MACHINE, DO_POLICY_KEY, "MaxDownloadBandwidth", lambda v: int(v or 0)),
+            constraints=[Constraint(("wu_bw_limit", "wu_mode"), bw_limit_allowed,
+                                    "A Windows Update bandwidth limit has no effect while updates are disabled; set it to 0.")],
+            side_effects=[POLICY],
         ),
     ]
@@ -0,0 +1,171 @@
+from __future__ import annotations
+import threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import effects
+from .journal import Journal
+from .model import Tweak
+from .probe import get_engine
+from util import metrics, registry as r
+from util.psbatch import run_batch
+from util.timing import phase
+
+# Apply pipeline shared by the tabs. Pending tweaks are split into
+# independent groups that run in parallel on a small worker pool:
+#   hkcu / hklm  - registry writes, flushed in one session per hive (one open per key)
+#   powershell   - fragments coalesced into one batched script
+#   other        - plain apply functions, run one after another
+# Cancellation is honoured between tweaks and before each batch. With
+# ordered=True (execution plans) the groups run one after another instead.
+# Before any registry write, the previous values of all registry targets are
+# journaled in one grouped read (tweaks/journal.py) so the run can be rolled back.
+# After all writes, the side effects of the tweaks that succeeded run once each
+# (tweaks/effects.py), or are handed to an enclosing effects.deferred() block.
+
+ApplyResult = Tuple[Tweak, bool, str]
+ProgressFn = Callable[[Tweak, bool, str], None]
+
+MAX_WORKERS = 3
+CANCELLED = "cancelled"
+
+# Per-tweak latency runs from the start of the tweak's group to its result, so
+# batched targets (registry sessions, PowerShell batches) report the batch time
+_APPLY_SECONDS = metrics.histogram("tweaker_apply_seconds", "Time until a tweak's apply result", ("tweak", "target"))
+_APPLY_TOTAL = metrics.counter("tweaker_apply_total", "Tweak applies by result (ok, failed, cancelled)", ("tweak", "result"))
+_RUN_SECONDS = metrics.histogram("tweaker_apply_run_seconds", "Duration of a whole apply run")
+
+
+def target_group(t: Tweak, ops: Optional[List[r.RegOp]] = None) -> str:
+    if t.reg_ops is not None:
+        roots = {op.root for op in (ops if ops is not None else t.reg_ops(t.default))}
+        return "hkcu" if roots == {r.HKEY_CURRENT_USER} else "hklm"
+    if t.ps_fragment is not None:
+        return "powershell"
+    return "other"
+
+
+def resolve(items: Sequence[Tuple[Tweak, Any]], done: Callable[[int, bool, str], None]) -> Dict[str, List[Tuple[int, Any]]]:
+    """Group items by target; items that need no work or fail to resolve are reported through done."""
+    groups: Dict[str, List[Tuple[int, Any]]] = {}
+    for i, (t, val) in enumerate(items):
+        try:
+            if t.reg_ops is not None:
+                ops = t.reg_ops(val)
+                groups.setdefault(target_group(t, ops), []).append((i, ops))
+            elif t.ps_fragment is not None:
+                frag = t.ps_fragment(val)
+                if frag is None:
+                    done(i, True, "nothing to do")
+                else:
+                    groups.setdefault("powershell", []).append((i, frag))
+            else:
+                groups.setdefault("other", []).append((i, val))
+        except Exception as e:
+            done(i, False, str(e))
+    return groups
+
+
+def run_apply(items: Sequence[Tuple[Tweak, Any]], progress: Optional[ProgressFn] = None,
+              cancel: Optional[threading.Event] = None, max_workers: int = MAX_WORKERS,
+              journal: bool = True, side_effects: bool = True,
+              groups: Optional[Dict[str, List[Tuple[int, Any]]]] = None, ordered: bool = False) -> List[ApplyResult]:
+    """Apply (tweak, value) pairs; results come back in input order.
+
+    groups: already resolved work, {group: [(item index, ops | fragment | value)]}
+    (see tweaks/plan.py); the items are then not resolved again.
+    ordered: run the groups sequentially, in the order of groups, instead of in parallel.
+    """
+    run_start = time.perf_counter()
+    results: List[Any] = [None] * len(items)
+    lock = threading.Lock()
+
+    def done(i: int, ok: bool, out: str, target: str = "", start: Optional[float] = None):
+        t = items[i][0]
+        with lock:
+            results[i] = (t, ok, out)
+        _APPLY_TOTAL.inc(t.id, "ok" if ok else CANCELLED if out == CANCELLED else "failed")
+        if start is not None:
+            _APPLY_SECONDS.observe(time.perf_counter() - start, t.id, target)
+        if progress is not None:
+            progress(t, ok, out)
+
+    def cancelled() -> bool:
+        return cancel is not None and cancel.is_set()
+
+    if groups is None:
+        groups = resolve(items, done)
+
+    def run_registry(target: str, entries: List[Tuple[int, List[r.RegOp]]]):
+        start = time.perf_counter()
+        if cancelled():
+            for i, _ in entries:
+                done(i, False, CANCELLED)
+            return
+        session = r.RegistrySession()
+        slots = [(i, [session.add(op) for op in ops]) for i, ops in entries]
+        with phase("apply_registry", tweaks=[items[i][0].id for i, _ in entries]):
+            flushed = session.flush()
+        for i, idxs in slots:
+            res = [flushed[j] for j in idxs]
+            if res and all(m == r.UNSUPPORTED for _, m in res):
+                done(i, False, r.UNSUPPORTED, target, start)
+            else:
+                done(i, all(ok for ok, _ in res), "; ".join(m for _, m in res) or "nothing to do", target, start)
+
+    def run_powershell(target: str, entries: List[Tuple[int, Any]]):
+        start = time.perf_counter()
+        if cancelled():
+            for i, _ in entries:
+                done(i, False, CANCELLED)
+            return
+        with phase("apply_powershell", tweaks=[items[i][0].id for i, _ in entries]):
+            batch = run_batch(entries)
+        for i, (ok, out) in batch.items():
+            done(i, ok, out, target, start)
+
+    def run_other(target: str, entries: List[Tuple[int, Any]]):
+        for i, val in entries:
+            if cancelled():
+                done(i, False, CANCELLED)
+                continue
+            start = time.perf_counter()
+            try:
+                with phase("apply", tweak=items[i][0].id):
+                    ok, out = items[i][0].apply(val)
+            except Exception as e:
+                ok, out = False, str(e)
+            done(i, ok, out, target, start)
+
+    jr: Optional[Journal] = None
+    targets = [(items[i][0].id, op) for g in ("hkcu", "hklm") for i, ops in groups.get(g, []) for op in ops]
+    if journal and targets and not cancelled():
+        try:
+            with phase("journal", targets=len(targets)):
+                jr = Journal.begin(targets)
+        except OSError:
+            jr = None  # no journal, no rollback for this run; the apply itself still goes ahead
+
+    runners = {"hkcu": run_registry, "hklm": run_registry, "powershell": run_powershell, "other": run_other}
+    if ordered or len(groups) <= 1 or max_workers <= 1:
+        for name, entries in groups.items():
+            runners[name](name, entries)
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="apply") as pool:
+            for f in [pool.submit(runners[name], name, entries) for name, entries in groups.items()]:
+                f.result()
+    if jr is not None:
+        try:
+            jr.finish(results)
+        except OSError:
+            pass
+    # Live state changed underneath any cached probe snapshot
+    get_engine().invalidate()
+    _RUN_SECONDS.observe(time.perf_counter() - run_start)
+    if side_effects:
+        succeeded = [t for t, ok, _ in results if ok]
+        if not effects.collect(succeeded):
+            with phase("side_effects"):
+                effects.run(effects.required(succeeded))
+    metrics.flush()
+    return results
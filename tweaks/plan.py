@@ -0,0 +1,275 @@
+from __future__ import annotations
+import json, threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from . import effects
+from .journal import decode_value, encode_value
+from .model import Tweak
+from .pipeline import MAX_WORKERS, ApplyResult, ProgressFn, resolve, run_apply
+from util import psquery, registry as r
+from util.psbatch import PSFragment
+
+# Execution plan for Apply All: every pending (tweak, value) of every tab,
+# resolved once into registry ops / PowerShell fragments / apply calls.
+#
+# Writes to the same registry value are deduplicated (the later tweak wins,
+# as applying the tabs one after another would end up), identical PowerShell
+# fragments run once, and steps are ordered by target: HKCU, HKLM,
+# PowerShell, then plain apply functions. The targets also execute in that
+# order, one after another (run_apply(ordered=True)). A plan is previewed as
+# a whole, can be saved as JSON and run again later (headless --plan); a
+# saved plan executes the ops it was reviewed with, not whatever the tweaks
+# resolve to at run time.
+#
+# A plan that runs right away is resolved against live state (adapter DNS,
+# DoH entries), so PowerShell steps only touch what differs. A saved plan
+# may run later or on another machine, so it is resolved offline
+# (psquery.offline(), as exported scripts are): its PowerShell steps check
+# the machine themselves when they run instead of carrying this one's
+# adapter indexes or "nothing to do" results.
+#
+# File layout: {"version": 1, "steps": [{"id", "value", "target",
+#   "ops": [{"hive", "path", "name", "value"+"type" | "delete"}] |
+#   "script"+"prelude", "superseded_by", "result": [ok, message]}]}
+
+PLAN_VERSION = 1
+TARGETS = ("hkcu", "hklm", "powershell", "other")
+_TITLES = {"hkcu": "HKCU", "hklm": "HKLM", "powershell": "PowerShell", "other": "Other"}
+_HIVES = {name: root for root, name in r.ROOT_NAMES.items()}
+
+
+class Step(NamedTuple):
+    tweak: Tweak
+    value: Any
+    target: str                 # one of TARGETS, or "" when there is nothing to run
+    payload: Any = None         # [RegOp] | PSFragment | value, as run_apply's groups take them
+    superseded_by: Optional[str] = None  # every write of this step is overwritten by that tweak
+    result: Optional[Tuple[bool, str]] = None  # known without running (nothing to do, resolve error)
+
+
+def _value_key(op: r.RegOp) -> Tuple[Any, str, str]:
+    return (*r.key_id(op.root, op.path), op.name.lower())
+
+
+class Plan:
+    """Ordered, deduplicated steps for a set of (tweak, value) pairs."""
+
+    def __init__(self, steps: List[Step], dropped: int = 0, offline: bool = True,
+                 source: Optional[List[Tuple[Tweak, Any]]] = None):
+        self.steps = steps
+        self.dropped = dropped  # duplicate writes removed when the plan was built
+        self.offline = offline  # resolved without live queries of this machine, so it can be saved
+        self._source = source   # the items it was built from, in input order
+
+    @classmethod
+    def build(cls, items: Sequence[Tuple[Tweak, Any]], offline: bool = False) -> "Plan":
+        """offline: resolve without querying this machine, for a plan that is saved rather than run now."""
+        if offline:
+            with psquery.offline():
+                return cls._build(items, True)
+        return cls._build(items, False)
+
+    @classmethod
+    def _build(cls, items: Sequence[Tuple[Tweak, Any]], offline: bool) -> "Plan":
+        known: Dict[int, Tuple[bool, str]] = {}
+        groups = resolve(items, lambda i, ok, out: known.__setitem__(i, (ok, out)))
+        steps: List[Optional[Step]] = [None] * len(items)
+        for i, res in known.items():
+            steps[i] = Step(items[i][0], items[i][1], "", result=res)
+        for target, entries in groups.items():
+            for i, payload in entries:
+                steps[i] = Step(items[i][0], items[i][1], target, payload)
+
+        # Last writer of each registry value, in input order
+        last: Dict[Tuple[Any, str, str], Tuple[int, int]] = {}
+        for i, s in enumerate(steps):
+            if s.target in ("hkcu", "hklm"):
+                for j, op in enumerate(s.payload):
+                    last[_value_key(op)] = (i, j)
+        dropped = 0
+        first_script: Dict[PSFragment, int] = {}
+        for i, s in enumerate(steps):
+            if s.target in ("hkcu", "hklm") and s.payload:
+                keep = [op for j, op in enumerate(s.payload) if last[_value_key(op)] == (i, j)]
+                dropped += len(s.payload) - len(keep)
+                if not keep:
+                    winner = steps[last[_value_key(s.payload[-1])][0]].tweak.id
+                    steps[i] = s._replace(payload=[], superseded_by=winner)
+                elif len(keep) < len(s.payload):
+                    steps[i] = s._replace(payload=keep)
+            elif s.target == "powershell":
+                k = first_script.setdefault(s.payload, i)
+                if k != i:
+                    dropped += 1
+                    steps[i] = s._replace(superseded_by=steps[k].tweak.id)
+        order = {t: n for n, t in enumerate(TARGETS)}
+        steps.sort(key=lambda s: order.get(s.target, len(TARGETS)))  # stable: input order within a target
+        return cls(steps, dropped, offline, list(items))
+
+    # ---- Inspection ----
+
+    def runnable(self) -> List[Step]:
+        return [s for s in self.steps if _runnable(s)]
+
+    def items(self) -> List[Tuple[Tweak, Any]]:
+        return [(s.tweak, s.value) for s in self.steps]
+
+    def writes(self) -> int:
+        return sum(len(s.payload) for s in self.runnable() if s.target in ("hkcu", "hklm"))
+
+    def side_effects(self) -> List[str]:
+        return effects.required(s.tweak for s in self.steps if s.result is None or s.result[0])
+
+    def actions(self) -> List[str]:
+        """Preview lines: a summary, then each target's steps in execution order."""
+        run = self.runnable()
+        labels = {s.tweak.id: s.tweak.label for s in self.steps}
+        lines = [f"{len(self.steps)} tweak(s): {self.writes()} registry write(s), "
+                 f"{sum(1 for s in run if s.target == 'powershell')} PowerShell fragment(s)"
+                 + (f", {self.dropped} duplicate(s) dropped" if self.dropped else "")]
+        section = None
+        for s in self.steps:
+            title = _TITLES.get(s.target, "Skipped")
+            if title != section:
+                section = title
+                lines.append(f"── {title} ──")
+            head = f"[{s.tweak.category}] {s.tweak.label} → {s.value}"
+            if s.superseded_by is not None:
+                lines.append(f"{head} (superseded by {labels.get(s.superseded_by, s.superseded_by)})")
+            elif s.result is not None:
+                lines.append(f"{head} ({s.result[1]})")
+            else:
+                lines.append(head)
+                if s.target in ("hkcu", "hklm"):
+                    lines += [f"    {_describe(op)}" for op in s.payload]
+        lines += [f"Afterwards: {effects.resolve(k).label}" for k in self.side_effects()]
+        return lines
+
+    # ---- Execution ----
+
+    def execute(self, progress: Optional[ProgressFn] = None, cancel: Optional[threading.Event] = None,
+                max_workers: int = MAX_WORKERS, side_effects: bool = True, journal: bool = True) -> List[ApplyResult]:
+        """Run the plan through the apply pipeline, one target after another; results come back in plan order."""
+        run = [k for k, s in enumerate(self.steps) if _runnable(s)]
+        items = [(self.steps[k].tweak, self.steps[k].value) for k in run]
+        groups: Dict[str, List[Tuple[int, Any]]] = {}
+        for n, k in enumerate(run):
+            groups.setdefault(self.steps[k].target, []).append((n, self.steps[k].payload))
+        groups = {t: groups[t] for t in TARGETS if t in groups}
+        got = run_apply(items, progress, cancel, max_workers, side_effects=side_effects, journal=journal,
+                        groups=groups, ordered=True)
+        out: List[Any] = [None] * len(self.steps)
+        for n, k in enumerate(run):
+            out[k] = got[n]
+        winners = {t.id: (ok, msg) for t, ok, msg in got}
+        for k, s in enumerate(self.steps):
+            if out[k] is not None:
+                continue
+            if s.superseded_by is not None:
+                ok, msg = winners.get(s.superseded_by, (False, "not run"))
+                res = (s.tweak, ok, f"superseded by {s.superseded_by}" if ok else msg)
+            else:
+                res = (s.tweak, *s.result)
+            out[k] = res
+            if progress is not None:
+                progress(*res)
+        return out
+
+    # ---- Serialization ----
+
+    def to_dict(self) -> Dict[str, Any]:
+        steps = []
+        for s in self.steps:
+            d: Dict[str, Any] = {"id": s.tweak.id, "value": s.value, "target": s.target}
+            if s.target in ("hkcu", "hklm"):
+                d["ops"] = [_op_dict(op) for op in s.payload]
+            elif s.target == "powershell":
+                d["script"], d["prelude"] = s.payload.script, s.payload.prelude
+            if s.superseded_by is not None:
+                d["superseded_by"] = s.superseded_by
+            if s.result is not None:
+                d["result"] = list(s.result)
+            steps.append(d)
+        return {"version": PLAN_VERSION, "steps": steps, "dropped": self.dropped}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], tweaks: Iterable[Tweak]) -> "Plan":
+        if not isinstance(data, dict) or data.get("version") != PLAN_VERSION:
+            raise ValueError(f"not a version {PLAN_VERSION} plan")
+        by_id = {t.id: t for t in tweaks}
+        steps: List[Step] = []
+        for d in data.get("steps", []):
+            t = by_id.get(d.get("id"))
+            if t is None:
+                raise ValueError(f"plan references unknown tweak {d.get('id')!r}")
+            target = d.get("target", "")
+            if target in ("hkcu", "hklm"):
+                payload: Any = [_op_from(o) for o in d.get("ops", [])]
+            elif target == "powershell":
+                payload = PSFragment(d["script"], d.get("prelude", ""))
+            elif target == "other":
+                payload = d.get("value")
+            elif target == "":
+                payload = None
+            else:
+                raise ValueError(f"{t.id}: unknown plan target {target!r}")
+            result = d.get("result")
+            steps.append(Step(t, d.get("value"), target, payload, d.get("superseded_by"),
+                              (bool(result[0]), str(result[1])) if result else None))
+        return cls(steps, int(data.get("dropped", 0)))
+
+    def portable(self) -> "Plan":
+        """This plan, or the same items resolved offline if it was built against live state."""
+        if self.offline or self._source is None:
+            return self
+        return Plan.build(self._source, offline=True)
+
+    def save(self, path: str) -> Tuple[bool, str]:
+        """Write the plan's portable() form."""
+        try:
+            data = self.portable().to_dict()
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1)
+        except (OSError, TypeError) as e:
+            return False, f"saving the plan failed: {e}"
+        return True, f"wrote {path}"
+
+    @classmethod
+    def load(cls, path: str, tweaks: Iterable[Tweak]) -> "Plan":
+        """Raises OSError / ValueError for unreadable or invalid plans."""
+        with open(path, encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}: {e}") from None
+        try:
+            return cls.from_dict(data, tweaks)
+        except (KeyError, TypeError, IndexError) as e:
+            raise ValueError(f"{path}: malformed plan ({e})") from None
+
+
+def _runnable(s: Step) -> bool:
+    return s.result is None and s.superseded_by is None
+
+
+def _describe(op: r.RegOp) -> str:
+    where = f"{r.ROOT_NAMES.get(op.root, op.root)}\\{op.path}\\{op.name}"
+    return f"{where} (delete)" if op.delete else f"{where} = {op.value!r}"
+
+
+def _op_dict(op: r.RegOp) -> Dict[str, Any]:
+    d: Dict[str, Any] = {"hive": r.ROOT_NAMES.get(op.root, op.root), "path": op.path, "name": op.name}
+    if op.delete:
+        d["delete"] = True
+    else:
+        d["value"], d["type"] = encode_value(op.value), op.reg_type
+    return d
+
+
+def _op_from(d: Dict[str, Any]) -> r.RegOp:
+    root = _HIVES.get(d["hive"])
+    if root is None:
+        raise ValueError(f"unknown registry hive {d['hive']!r}")
+    if d.get("delete"):
+        return r.delete_op(root, d["path"], d["name"])
+    return r.set_op(root, d["path"], d["name"], decode_value(d.get("value")), d.get("type"))
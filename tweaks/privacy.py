@@ -1,73 +1,81 @@
 from __future__ import annotations
-from typing import List, Tuple
-from .base import Tweak
+from typing import Any, List, Tuple
+from .model import Probe, Tweak, reg_probe
+from .effects import POLICY, service
 from util import registry as r
-import winreg
 
 # ---- Privacy tweak implementations ----
 
+CONSENT_STORE = r"SOFTWARE\Microsoft\Windows\CurrentVersion\CapabilityAccessManager\ConsentStore"
+
+
+DATA_COLLECTION = r"SOFTWARE\Policies\Microsoft\Windows\DataCollection"
+ADVERTISING_INFO = r"SOFTWARE\Microsoft\Windows\CurrentVersion\AdvertisingInfo"
+CONTENT_DELIVERY = r"Software\Microsoft\Windows\CurrentVersion\ContentDeliveryManager"
+LFSVC_CONFIG = r"SYSTEM\CurrentControlSet\Services\lfsvc\Service\Configuration"
+
+# 0: Security, 1: Basic, 2: Enhanced, 3: Full
+TELEMETRY_LEVELS = {
+    "Security (minimal)": 0,
+    "Basic": 1,
+    "Enhanced": 2,
+    "Optional (Full)": 3,
+}
+
+
+def telemetry_ops(level: str) -> List[r.RegOp]:
+    v = TELEMETRY_LEVELS.get(level, 1)
+    return [r.set_op(r.HKEY_LOCAL_MACHINE, DATA_COLLECTION, "AllowTelemetry", int(v), r.REG_DWORD)]
+
+
+def ads_id_ops(disable: bool) -> List[r.RegOp]:
+    return [r.set_op(r.HKEY_CURRENT_USER, ADVERTISING_INFO, "Enabled", 0 if disable else 1, r.REG_DWORD)]
+
+
+def suggestions_ops(disable: bool) -> List[r.RegOp]:
+    # Hide suggestions in Settings (experience may vary by build)
+    return [r.set_op(r.HKEY_CURRENT_USER, CONTENT_DELIVERY, "SubscribedContent-338389Enabled", 0 if disable else 1, r.REG_DWORD)]
+
+
+def location_service_ops(disable: bool) -> List[r.RegOp]:
+    return [r.set_op(r.HKEY_LOCAL_MACHINE, LFSVC_CONFIG, "Status", 0 if disable else 1, r.REG_DWORD)]
+
+
+def background_cam_mic_ops(block: bool) -> List[r.RegOp]:
+    # Privacy consent policy for background app access is app-scoped in many cases; provide a global default
+    val = "Deny" if block else "Allow"
+    return [
+        r.set_op(r.HKEY_LOCAL_MACHINE, CONSENT_STORE + r"\microphone", "Value", val, r.REG_SZ),
+        r.set_op(r.HKEY_LOCAL_MACHINE, CONSENT_STORE + r"\webcam", "Value", val, r.REG_SZ),
+    ]
+
+
+def _cam_mic_state(mic: Any, cam: Any) -> Any:
+    if mic == cam == "Deny":
+        return True
+    if mic == cam == "Allow":
+        return False
+    return None
+
+
 def apply_telemetry(level: str) -> tuple[bool, str]:
-    # 0: Security, 1: Basic, 2: Enhanced, 3: Full
-    mapv = {
-        "Security (minimal)": 0,
-        "Basic": 1,
-        "Enhanced": 2,
-        "Optional (Full)": 3,
-    }
-    v = mapv.get(level, 1)
-    hkey = getattr(winreg, 'HKEY_LOCAL_MACHINE', None)
-    regtype = getattr(winreg, 'REG_DWORD', None)
-    if hkey is None or regtype is None:
-        return False, "Registry access not supported on this platform."
-    return r.set_reg_value(hkey,
-                           r"SOFTWARE\Policies\Microsoft\Windows\DataCollection",
-                           "AllowTelemetry", int(v), regtype)
+    return r.write_ops(telemetry_ops(level))
 
 
 def apply_ads_id(disable: bool) -> tuple[bool, str]:
-    hkey = getattr(winreg, 'HKEY_CURRENT_USER', None)
-    regtype = getattr(winreg, 'REG_DWORD', None)
-    if hkey is None or regtype is None:
-        return False, "Registry access not supported on this platform."
-    return r.set_reg_value(hkey,
-                           r"SOFTWARE\Microsoft\Windows\CurrentVersion\AdvertisingInfo",
-                           "Enabled", 0 if disable else 1, regtype)
+    return r.write_ops(ads_id_ops(disable))
 
 
 def apply_suggestions(disable: bool) -> tuple[bool, str]:
-    # Hide suggestions in Settings (experience may vary by build)
-    hkey = getattr(winreg, 'HKEY_CURRENT_USER', None)
-    regtype = getattr(winreg, 'REG_DWORD', None)
-    if hkey is None or regtype is None:
-        return False, "Registry access not supported on this platform."
-    return r.set_reg_value(hkey,
-                           r"Software\Microsoft\Windows\CurrentVersion\ContentDeliveryManager",
-                           "SubscribedContent-338389Enabled", 0 if disable else 1, regtype)
+    return r.write_ops(suggestions_ops(disable))
 
 
 def apply_location_service(disable: bool) -> tuple[bool, str]:
-    hkey = getattr(winreg, 'HKEY_LOCAL_MACHINE', None)
-    regtype = getattr(winreg, 'REG_DWORD', None)
-    if hkey is None or regtype is None:
-        return False, "Registry access not supported on this platform."
-    return r.set_reg_value(hkey,
-                           r"SYSTEM\CurrentControlSet\Services\lfsvc\Service\Configuration",
-                           "Status", 0 if disable else 1, regtype)
+    return r.write_ops(location_service_ops(disable))
 
 
 def apply_background_cam_mic(block: bool) -> tuple[bool, str]:
-    # Privacy consent policy for background app access is app-scoped in many cases; provide a global default
-    hkey = getattr(winreg, 'HKEY_LOCAL_MACHINE', None)
-    regtype = getattr(winreg, 'REG_SZ', None)
-    if hkey is None or regtype is None:
-        return False, "Registry access not supported on this platform."
-    ok1, m1 = r.set_reg_value(hkey,
-                              r"SOFTWARE\Microsoft\Windows\CurrentVersion\CapabilityAccessManager\ConsentStore\microphone",
-                              "Value", "Deny" if block else "Allow", regtype)
-    ok2, m2 = r.set_reg_value(hkey,
-                              r"SOFTWARE\Microsoft\Windows\CurrentVersion\CapabilityAccessManager\ConsentStore\webcam",
-                              "Value", "Deny" if block else "Allow", regtype)
-    return (ok1 and ok2), f"mic: {m1}; cam: {m2}"
+    return r.write_ops(background_cam_mic_ops(block))
 
 
 # ---- Export tweak list ----
@@ -83,7 +91,10 @@ def get_tweaks() -> List[Tweak]:
             default="Security (minimal)",
             tooltip="Controls Windows diagnostic data level.",
             warning="Major updates may revert this.",
-            apply=lambda v: apply_telemetry(v)
+            apply=lambda v: apply_telemetry(v),
+            reg_ops=telemetry_ops,
+            probe=reg_probe(r.HKEY_LOCAL_MACHINE, DATA_COLLECTION, "AllowTelemetry", {v: k for k, v in TELEMETRY_LEVELS.items()}),
+            side_effects=[POLICY],
         ),
         Tweak(
             id="ads_id",
@@ -92,7 +103,9 @@ def get_tweaks() -> List[Tweak]:
             type="toggle",
             default=True,
             tooltip="Prevents apps using the advertising identifier.",
-            apply=lambda v: apply_ads_id(v)
+            apply=lambda v: apply_ads_id(v),
+            reg_ops=ads_id_ops,
+            probe=reg_probe(r.HKEY_CURRENT_USER, ADVERTISING_INFO, "Enabled", {0: True, 1: False}),
         ),
         Tweak(
             id="suggestions",
@@ -101,7 +114,9 @@ def get_tweaks() -> List[Tweak]:
             type="toggle",
             default=True,
             tooltip="Hides Microsoft suggestions and tips in Settings panes.",
-            apply=lambda v: apply_suggestions(v)
+            apply=lambda v: apply_suggestions(v),
+            reg_ops=suggestions_ops,
+            probe=reg_probe(r.HKEY_CURRENT_USER, CONTENT_DELIVERY, "SubscribedContent-338389Enabled", {0: True, 1: False}),
         ),
         Tweak(
             id="location_service",
@@ -110,7 +125,10 @@ def get_tweaks() -> List[Tweak]:
             type="toggle",
             default=False,
             tooltip="Turns off system location service.",
-            apply=lambda v: apply_location_service(v)
+            apply=lambda v: apply_location_service(v),
+            reg_ops=location_service_ops,
+            probe=reg_probe(r.HKEY_LOCAL_MACHINE, LFSVC_CONFIG, "Status", {0: True, 1: False}),
+            side_effects=[service("lfsvc")],
         ),
         Tweak(
             id="background_cam_mic",
@@ -119,6 +137,9 @@ def get_tweaks() -> List[Tweak]:
             type="toggle",
             default=True,
             tooltip="Restricts background access (foreground apps still prompt).",
-            apply=lambda v: apply_background_cam_mic(v)
+            apply=lambda v: apply_background_cam_mic(v),
+            reg_ops=background_cam_mic_ops,
+            probe=Probe(((r.HKEY_LOCAL_MACHINE, CONSENT_STORE + r"\microphone", "Value"),
+                          (r.HKEY_LOCAL_MACHINE, CONSENT_STORE + r"\webcam", "Value")), _cam_mic_state),
         ),
     ]
@@ -0,0 +1,83 @@
+from __future__ import annotations
+import threading, time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .model import Tweak
+from util import registry as r
+
+# Probe engine: reads the live value of every probed tweak in one grouped
+# registry pass and decodes it back into control values. Drift is judged
+# against expected(): values that write the same registry state (e.g. color
+# mode "Auto (system)" and "Light") read back as one of them.
+
+Read = Tuple[Any, str, str]
+
+
+class ProbeEngine:
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._raw: Dict[Read, Any] = {}
+        self._stamp = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._raw = {}
+            self._stamp = 0.0
+
+    def _read(self, reads: List[Read], refresh: bool) -> Dict[Read, Any]:
+        with self._lock:
+            fresh = not refresh and time.monotonic() - self._stamp < self.ttl
+            missing = [rd for rd in reads if rd not in self._raw] if fresh else reads
+            if missing:
+                vals = r.get_reg_values(missing, cached=not refresh)
+                if not fresh:
+                    self._raw = {}
+                    self._stamp = time.monotonic()
+                self._raw.update(zip(missing, vals))
+            return dict(self._raw)
+
+    def read_all(self, tweaks: Sequence[Tweak], refresh: bool = False) -> Dict[str, Any]:
+        """Return {tweak id: live control value} for every probed tweak whose state decodes."""
+        probed = [t for t in tweaks if t.probe is not None]
+        reads = list(dict.fromkeys(rd for t in probed for rd in t.probe.reads))
+        raw = self._read(reads, refresh)
+        live: Dict[str, Any] = {}
+        for t in probed:
+            try:
+                val = t.probe.decode(*(raw.get(rd) for rd in t.probe.reads))
+            except Exception:
+                val = None
+            if val is not None:
+                live[t.id] = val
+        return live
+
+
+def expected(t: Tweak, value: Any) -> Any:
+    """Control value the probe reads back once value is applied (value itself unless another one writes the same state)."""
+    if t.probe is None or t.reg_ops is None:
+        return value
+    try:
+        written = {(*r.key_id(op.root, op.path), op.name.lower()): None if op.delete else op.value for op in t.reg_ops(value)}
+        keys = [(*r.key_id(root, path), name.lower()) for root, path, name in t.probe.reads]
+        if not all(k in written for k in keys):
+            return value  # the probe reads something the apply doesn't write
+        back = t.probe.decode(*(written[k] for k in keys))
+    except Exception:
+        return value
+    return value if back is None else back
+
+
+def drifted(t: Tweak, value: Any, live: Dict[str, Any]) -> bool:
+    """True when the live state (read_all result) differs from what applying value leaves."""
+    return t.id in live and live[t.id] != expected(t, value)
+
+
+_engine: Optional[ProbeEngine] = None
+
+
+def get_engine() -> ProbeEngine:
+    global _engine
+    if _engine is None:
+        _engine = ProbeEngine()
+    return _engine
@@ -0,0 +1,132 @@
+from __future__ import annotations
+import bisect, re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .model import Category, Tweak
+
+# Search index over the catalog, built once at load (Qt-free).
+#
+# Label, tooltip, help, warning, category, option strings and id are split
+# into lowercase word tokens. Each query word matches every indexed token it
+# is a prefix of (a bisect range over the sorted vocabulary); all query
+# words must match. Postings are int bitsets (bit i = i-th tweak), so union,
+# intersection and per-category counts are a handful of big-int operations.
+# The widest ranges, one- and two-letter prefixes, are precomputed; longer
+# prefixes are memoized as the user types.
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_SHORT = 2
+_MEMO_LIMIT = 4096
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def _fields(t: Tweak) -> Iterable[str]:
+    yield t.label
+    yield t.tooltip or ""
+    yield t.help or ""
+    yield t.warning or ""
+    yield t.category
+    yield t.id.replace("_", " ")
+    for opt in t.options or ():
+        yield str(opt)
+
+
+class Matches:
+    """Result of a search: a read-only set of tweak ids backed by a bitset."""
+
+    __slots__ = ("_index", "bits")
+
+    def __init__(self, index: "SearchIndex", bits: int):
+        self._index = index
+        self.bits = bits
+
+    def __contains__(self, tid: object) -> bool:
+        i = self._index._pos.get(tid)  # type: ignore[arg-type]
+        return i is not None and bool(self.bits >> i & 1)
+
+    def __len__(self) -> int:
+        return self.bits.bit_count()
+
+    def __iter__(self) -> Iterator[str]:
+        tweaks, bits = self._index.tweaks, self.bits
+        while bits:
+            low = bits & -bits
+            yield tweaks[low.bit_length() - 1].id
+            bits ^= low
+
+
+class SearchIndex:
+    def __init__(self, tweaks: Iterable[Tweak]):
+        self.tweaks: List[Tweak] = list(tweaks)
+        self._pos: Dict[str, int] = {}
+        postings: Dict[str, List[int]] = {}
+        cats: Dict[Category, List[int]] = {}
+        for i, t in enumerate(self.tweaks):
+            self._pos[t.id] = i
+            cats.setdefault(t.category, []).append(i)
+            for tok in set(tokenize("\n".join(_fields(t)))):
+                postings.setdefault(tok, []).append(i)
+        self._vocab: List[str] = sorted(postings)
+        self._postings: List[int] = [_bits(postings[tok]) for tok in self._vocab]
+        self._cats: Dict[Category, int] = {cat: _bits(ix) for cat, ix in cats.items()}
+        self._all = (1 << len(self.tweaks)) - 1
+        short: Dict[str, List[int]] = {}
+        for tok, ix in postings.items():
+            for n in range(1, min(_SHORT, len(tok)) + 1):
+                short.setdefault(tok[:n], []).extend(ix)
+        self._short: Dict[str, int] = {p: _bits(ix) for p, ix in short.items()}
+        self._memo: Dict[str, int] = {}
+
+    def _prefix(self, word: str) -> int:
+        hit = self._short.get(word, 0) if len(word) <= _SHORT else self._memo.get(word)
+        if hit is not None:
+            return hit
+        lo = bisect.bisect_left(self._vocab, word)
+        hi = bisect.bisect_left(self._vocab, word + "\U0010ffff", lo)
+        found = 0
+        for bits in self._postings[lo:hi]:
+            found |= bits
+        if len(self._memo) >= _MEMO_LIMIT:
+            self._memo.clear()
+        self._memo[word] = found
+        return found
+
+    def search(self, query: str) -> Optional[Matches]:
+        """Tweaks matching every word of the query; None for a blank query (everything matches)."""
+        words = tokenize(query)
+        if not words:
+            return None
+        hits = self._all
+        # Longest words first: their ranges are the narrowest
+        for w in sorted(set(words), key=len, reverse=True):
+            hits &= self._prefix(w)
+            if not hits:
+                break
+        return Matches(self, hits)
+
+    def categories(self, matches: Optional[Matches]) -> Dict[Category, int]:
+        """Match count of each category that has matches (every tweak when matches is None)."""
+        bits = self._all if matches is None else matches.bits
+        out: Dict[Category, int] = {}
+        for cat, mask in self._cats.items():
+            n = (bits & mask).bit_count()
+            if n:
+                out[cat] = n
+        return out
+
+
+def _bits(indices: Iterable[int]) -> int:
+    """Bitset of the given positions; long lists go through bytes, which is linear unlike repeated |=."""
+    indices = list(indices)
+    if len(indices) < 16:
+        bits = 0
+        for i in indices:
+            bits |= 1 << i
+        return bits
+    buf = bytearray(max(indices) // 8 + 1)
+    for i in indices:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
@@ -0,0 +1,110 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .model import Category, Tweak, coerce_value
+from .probe import drifted as is_drifted
+from util.timing import phase
+
+# Widget-free state of one category. Tabs are views over it, so global
+# actions (save, revert, reset, apply) work on categories whose tab was never built.
+
+
+class CategoryState:
+    def __init__(self, category: Category, tweaks: List[Tweak], settings):
+        self.category = category
+        self.tweaks = tweaks
+        # QSettings or anything with value/setValue/sync
+        self.settings = settings
+        self._values: Optional[Dict[str, Any]] = None
+        # ConstraintEngine over this and the other categories; attached by the engine
+        self.constraints = None
+
+    @property
+    def values(self) -> Dict[str, Any]:
+        # Loaded on first use so untouched categories cost nothing at startup
+        if self._values is None:
+            self._load()
+        return self._values
+
+    def loaded(self) -> bool:
+        return self._values is not None
+
+    def _key(self, tid: str) -> str:
+        return f"{self.category}/{tid}"
+
+    def _applied_key(self, tid: str) -> str:
+        # Last successfully applied value, kept next to the saved choice
+        return f"{self.category}/{tid}.applied"
+
+    def value(self, t: Tweak) -> Any:
+        return self.values[t.id]
+
+    def set(self, t: Tweak, val: Any) -> Set[str]:
+        """Returns the ids whose constraint results were re-evaluated (to re-mark them)."""
+        self.values[t.id] = val
+        return self._changed([t.id])
+
+    def _changed(self, ids: List[str]) -> Set[str]:
+        return self.constraints.changed(ids) if self.constraints is not None else set()
+
+    def _load(self):
+        with phase("load_settings", category=self.category):
+            self._values = {t.id: coerce_value(t, self.settings.value(self._key(t.id), t.default)) for t in self.tweaks}
+
+    def load_settings(self):
+        self._load()
+        self._changed([t.id for t in self.tweaks])
+
+    def load_defaults(self):
+        self._values = {t.id: t.default for t in self.tweaks}
+        self._changed([t.id for t in self.tweaks])
+
+    def save_settings(self):
+        if self._values is None:
+            return  # nothing was loaded, so nothing can have changed
+        for t in self.tweaks:
+            self.settings.setValue(self._key(t.id), self._values[t.id])
+        self.settings.sync()
+
+    def validate(self) -> Tuple[bool, str]:
+        """Constraint results for this category's tweaks (cached; see tweaks.constraints)."""
+        if self.constraints is None:
+            return True, ""
+        return self.constraints.check(t.id for t in self.tweaks)
+
+    def errors(self, t: Tweak) -> List[str]:
+        return self.constraints.errors_for(t.id) if self.constraints is not None else []
+
+    # ----- Dirty tracking -----
+    def applied_value(self, t: Tweak) -> Any:
+        """Value last applied successfully, or None if this tweak was never applied."""
+        raw = self.settings.value(self._applied_key(t.id), None)
+        return None if raw is None else coerce_value(t, raw)
+
+    def is_dirty(self, t: Tweak) -> bool:
+        applied = self.applied_value(t)
+        return applied is None or applied != self.value(t)
+
+    def pending_tweaks(self, force: bool = False) -> List[Tweak]:
+        return list(self.tweaks) if force else [t for t in self.tweaks if self.is_dirty(t)]
+
+    def mark_applied(self, t: Tweak, value: Any):
+        self.settings.setValue(self._applied_key(t.id), value)
+
+    def forget_applied(self, t: Tweak):
+        """After a rollback the machine no longer holds the applied value, so the tweak is pending again."""
+        self.settings.remove(self._applied_key(t.id))
+
+    def collect_actions(self, force: bool = False) -> List[str]:
+        return [f"[{self.category}] {t.label} → {self.value(t)}" for t in self.pending_tweaks(force)]
+
+    # ----- Live system state -----
+    def drifted(self, live: Dict[str, Any]) -> List[Tweak]:
+        return [t for t in self.tweaks if is_drifted(t, self.value(t), live)]
+
+    def load_live(self, live: Dict[str, Any]):
+        ids = [t.id for t in self.tweaks if t.id in live]
+        for t in self.tweaks:
+            if t.id in live:
+                self.values[t.id] = live[t.id]
+        self._changed(ids)
@@ -1,87 +1,85 @@
 from __future__ import annotations
 from typing import List, Tuple
-from .base import Tweak
+from .model import Tweak, reg_probe
+from .effects import EXPLORER as RESTART_EXPLORER
 from util import registry as r
-import winreg
 
 # ---- UI implementations ----
 
-def apply_color_mode(mode: str) -> tuple[bool, str]:
+PERSONALIZE = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Themes\Personalize"
+EXPLORER = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Explorer"
+EXPLORER_ADVANCED = EXPLORER + r"\Advanced"
+
+
+def color_mode_ops(mode: str) -> List[r.RegOp]:
     # Light/Dark via Personalize keys
     # 1 = Light, 0 = Dark
     app_light = 1 if mode in ("Light", "Auto (system)") else 0
     sys_light = 1 if mode in ("Light", "Auto (system)") else 0
-    hkey = getattr(winreg, 'HKEY_CURRENT_USER', None)
-    if hkey is None:
-        return False, "Registry access not supported on this platform."
-    ok1, m1 = r.set_reg_value(hkey,
-                              r"SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Themes\\Personalize",
-                              "AppsUseLightTheme", app_light)
-    ok2, m2 = r.set_reg_value(hkey,
-                              r"SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Themes\\Personalize",
-                              "SystemUsesLightTheme", sys_light)
-    return (ok1 and ok2), f"{m1}; {m2}"
+    return [
+        r.set_op(r.HKEY_CURRENT_USER, PERSONALIZE, "AppsUseLightTheme", app_light),
+        r.set_op(r.HKEY_CURRENT_USER, PERSONALIZE, "SystemUsesLightTheme", sys_light),
+    ]
 
 
-def apply_taskbar_alignment(align: str) -> tuple[bool, str]:
+def taskbar_alignment_ops(align: str) -> List[r.RegOp]:
     # 0 = left, 1 = center
     val = 1 if align == "Center" else 0
-    hkey = getattr(winreg, 'HKEY_CURRENT_USER', None)
-    if hkey is None:
-        return False, "Registry access not supported on this platform."
-    return r.set_reg_value(hkey,
-                           r"SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced",
-                           "TaskbarAl", val)
+    return [r.set_op(r.HKEY_CURRENT_USER, EXPLORER_ADVANCED, "TaskbarAl", val)]
+
+
+def start_recommendations_ops(hide: bool) -> List[r.RegOp]:
+    return [r.set_op(r.HKEY_CURRENT_USER, EXPLORER, "HideRecommendedSection", 1 if hide else 0)]
+
+
+def transparency_effects_ops(enable: bool) -> List[r.RegOp]:
+    return [r.set_op(r.HKEY_CURRENT_USER, PERSONALIZE, "EnableTransparency", 1 if enable else 0)]
+
+
+# 0=small, 1=medium (default), 2=large
+TASKBAR_SIZES = {"Small": 0, "Medium": 1, "Large": 2}
+
+
+def taskbar_size_ops(size: str) -> List[r.RegOp]:
+    return [r.set_op(r.HKEY_CURRENT_USER, EXPLORER_ADVANCED, "TaskbarSi", TASKBAR_SIZES.get(size, 1))]
+
+
+def show_file_extensions_ops(show: bool) -> List[r.RegOp]:
+    # HideFileExt: 0 = show, 1 = hide
+    return [r.set_op(r.HKEY_CURRENT_USER, EXPLORER_ADVANCED, "HideFileExt", 0 if show else 1)]
+
+
+def show_hidden_files_ops(show: bool) -> List[r.RegOp]:
+    # Hidden: 1 = show, 2 = don't show
+    return [r.set_op(r.HKEY_CURRENT_USER, EXPLORER_ADVANCED, "Hidden", 1 if show else 2)]
+
+
+def apply_color_mode(mode: str) -> tuple[bool, str]:
+    return r.write_ops(color_mode_ops(mode))
+
+
+def apply_taskbar_alignment(align: str) -> tuple[bool, str]:
+    return r.write_ops(taskbar_alignment_ops(align))
 
 
 def apply_start_recommendations(hide: bool) -> tuple[bool, str]:
-    hkey = getattr(winreg, 'HKEY_CURRENT_USER', None)
-    if hkey is None:
-        return False, "Registry access not supported on this platform."
-    return r.set_reg_value(hkey,
-                           r"SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer",
-                           "HideRecommendedSection", 1 if hide else 0)
+    return r.write_ops(start_recommendations_ops(hide))
 
 
 def apply_transparency_effects(enable: bool) -> tuple[bool, str]:
-    hkey = getattr(winreg, 'HKEY_CURRENT_USER', None)
-    if hkey is None:
-        return False, "Registry access not supported on this platform."
-    return r.set_reg_value(hkey,
-                           r"SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Themes\\Personalize",
-                           "EnableTransparency", 1 if enable else 0)
+    return r.write_ops(transparency_effects_ops(enable))
 
 
 def apply_taskbar_size(size: str) -> tuple[bool, str]:
-    # 0=small, 1=medium (default), 2=large
-    mapv = {"Small": 0, "Medium": 1, "Large": 2}
-    val = mapv.get(size, 1)
-    hkey = getattr(winreg, 'HKEY_CURRENT_USER', None)
-    if hkey is None:
-        return False, "Registry access not supported on this platform."
-    return r.set_reg_value(hkey,
-                           r"SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced",
-                           "TaskbarSi", val)
+    return r.write_ops(taskbar_size_ops(size))
 
 
 def apply_show_file_extensions(show: bool) -> tuple[bool, str]:
-    # HideFileExt: 0 = show, 1 = hide
-    hkey = getattr(winreg, 'HKEY_CURRENT_USER', None)
-    if hkey is None:
-        return False, "Registry access not supported on this platform."
-    return r.set_reg_value(hkey,
-                           r"SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced",
-                           "HideFileExt", 0 if show else 1)
+    return r.write_ops(show_file_extensions_ops(show))
 
 
 def apply_show_hidden_files(show: bool) -> tuple[bool, str]:
-    # Hidden: 1 = show, 2 = don't show
-    hkey = getattr(winreg, 'HKEY_CURRENT_USER', None)
-    if hkey is None:
-        return False, "Registry access not supported on this platform."
-    return r.set_reg_value(hkey,
-                           r"SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced",
-                           "Hidden", 1 if show else 2)
+    return r.write_ops(show_hidden_files_ops(show))
 
 
 def get_tweaks() -> List[Tweak]:
@@ -94,7 +92,11 @@ def get_tweaks() -> List[Tweak]:
             options=["Light", "Dark", "Auto (system)"],
             default="Light",
             tooltip="Sets light/dark for apps and system.",
-            apply=lambda v: apply_color_mode(v)
+            apply=lambda v: apply_color_mode(v),
+            reg_ops=color_mode_ops,
+            # "Auto (system)" writes the Light values, so it reads back (and is compared) as Light
+            probe=reg_probe(r.HKEY_CURRENT_USER, PERSONALIZE, "AppsUseLightTheme", {1: "Light", 0: "Dark"}),
+            side_effects=[RESTART_EXPLORER],
         ),
         Tweak(
             id="transparency_effects",
@@ -103,7 +105,10 @@ def get_tweaks() -> List[Tweak]:
             type="toggle",
             default=True,
             tooltip="Enable or disable system transparency effects.",
-            apply=lambda v: apply_transparency_effects(v)
+            apply=lambda v: apply_transparency_effects(v),
+            reg_ops=transparency_effects_ops,
+            probe=reg_probe(r.HKEY_CURRENT_USER, PERSONALIZE, "EnableTransparency", {1: True, 0: False}),
+            side_effects=[RESTART_EXPLORER],
         ),
         Tweak(
             id="taskbar_size",
@@ -113,7 +118,10 @@ def get_tweaks() -> List[Tweak]:
             options=["Small", "Medium", "Large"],
             default="Medium",
             tooltip="Change Windows 11 taskbar size.",
-            apply=lambda v: apply_taskbar_size(v)
+            apply=lambda v: apply_taskbar_size(v),
+            reg_ops=taskbar_size_ops,
+            probe=reg_probe(r.HKEY_CURRENT_USER, EXPLORER_ADVANCED, "TaskbarSi", {v: k for k, v in TASKBAR_SIZES.items()}),
+            side_effects=[RESTART_EXPLORER],
         ),
         Tweak(
             id="taskbar_align",
@@ -123,7 +131,10 @@ def get_tweaks() -> List[Tweak]:
             options=["Center", "Left"],
             default="Center",
             tooltip="Align taskbar icons.",
-            apply=lambda v: apply_taskbar_alignment(v)
+            apply=lambda v: apply_taskbar_alignment(v),
+            reg_ops=taskbar_alignment_ops,
+            probe=reg_probe(r.HKEY_CURRENT_USER, EXPLORER_ADVANCED, "TaskbarAl", {1: "Center", 0: "Left"}),
+            side_effects=[RESTART_EXPLORER],
         ),
         Tweak(
             id="show_file_extensions",
@@ -132,7 +143,10 @@ def get_tweaks() -> List[Tweak]:
             type="toggle",
             default=True,
             tooltip="Show known file type extensions in File Explorer.",
-            apply=lambda v: apply_show_file_extensions(v)
+            apply=lambda v: apply_show_file_extensions(v),
+            reg_ops=show_file_extensions_ops,
+            probe=reg_probe(r.HKEY_CURRENT_USER, EXPLORER_ADVANCED, "HideFileExt", {0: True, 1: False}),
+            side_effects=[RESTART_EXPLORER],
         ),
         Tweak(
             id="show_hidden_files",
@@ -141,7 +155,10 @@ def get_tweaks() -> List[Tweak]:
             type="toggle",
             default=False,
             tooltip="Show hidden files and folders in File Explorer.",
-            apply=lambda v: apply_show_hidden_files(v)
+            apply=lambda v: apply_show_hidden_files(v),
+            reg_ops=show_hidden_files_ops,
+            probe=reg_probe(r.HKEY_CURRENT_USER, EXPLORER_ADVANCED, "Hidden", {1: True, 2: False}),
+            side_effects=[RESTART_EXPLORER],
         ),
         Tweak(
             id="start_recommendations",
@@ -150,7 +167,10 @@ def get_tweaks() -> List[Tweak]:
             type="toggle",
             default=True,
             tooltip="Hide 'Recommended' items in Start (where supported).",
-            apply=lambda v: apply_start_recommendations(v)
+            apply=lambda v: apply_start_recommendations(v),
+            reg_ops=start_recommendations_ops,
+            probe=reg_probe(r.HKEY_CURRENT_USER, EXPLORER, "HideRecommendedSection", {1: True, 0: False}),
+            side_effects=[RESTART_EXPLORER],
         ),
     ]
 
@@ -1,69 +1,80 @@
 from __future__ import annotations
-from typing import List, Tuple
-from .base import Tweak
-from util.ps import ps
+from typing import Any, List, Tuple
+from .model import Constraint, Probe, Tweak, reg_probe
+from .effects import POLICY
 from util import registry as r
-import winreg
 
 # ---- Windows Update implementations ----
 
 WU_AU = r"SOFTWARE\Policies\Microsoft\Windows\WindowsUpdate\AU"
 UX_SETTINGS = r"SOFTWARE\Microsoft\WindowsUpdate\UX\Settings"
+WU_POLICY = r"SOFTWARE\Policies\Microsoft\Windows\WindowsUpdate"
+WU_DISABLED = "Disable (not recommended)"  # wu_mode option that turns automatic updates off
 
 
-def apply_wu_mode(mode: str) -> tuple[bool, str]:
+def wu_mode_ops(mode: str) -> List[r.RegOp]:
     # Map GUI selection to policy values
     # 2 = notify before download (NoAutoUpdate=0, AUOptions=2)
     # 3 = auto download and notify for install (AUOptions=3)
     # 4 = auto download and schedule install (AUOptions=4)
-    hkey = getattr(winreg, 'HKEY_LOCAL_MACHINE', None)
-    if hkey is None:
-        return False, "Registry access not supported on this platform."
+    hkey = r.HKEY_LOCAL_MACHINE
     if mode == "Default (Windows decides)":
         # Remove policies
-        ok1, m1 = r.delete_reg_value(hkey, WU_AU, "NoAutoUpdate")
-        ok2, m2 = r.delete_reg_value(hkey, WU_AU, "AUOptions")
-        return (ok1 and ok2), f"{m1}; {m2}"
+        return [r.delete_op(hkey, WU_AU, "NoAutoUpdate"), r.delete_op(hkey, WU_AU, "AUOptions")]
     if mode == "Notify before download":
-        ok1, m1 = r.set_reg_value(hkey, WU_AU, "NoAutoUpdate", 0)
-        ok2, m2 = r.set_reg_value(hkey, WU_AU, "AUOptions", 2)
-        return (ok1 and ok2), f"{m1}; {m2}"
+        return [r.set_op(hkey, WU_AU, "NoAutoUpdate", 0), r.set_op(hkey, WU_AU, "AUOptions", 2)]
     if mode == "Auto download, schedule install":
-        ok1, m1 = r.set_reg_value(hkey, WU_AU, "NoAutoUpdate", 0)
-        ok2, m2 = r.set_reg_value(hkey, WU_AU, "AUOptions", 4)
-        return (ok1 and ok2), f"{m1}; {m2}"
-    if mode == "Disable (not recommended)":
-        ok1, m1 = r.set_reg_value(hkey, WU_AU, "NoAutoUpdate", 1)
-        ok2, m2 = r.delete_reg_value(hkey, WU_AU, "AUOptions")
-        return (ok1 and ok2), f"{m1}; {m2}"
-    return False, "unknown mode"
+        return [r.set_op(hkey, WU_AU, "NoAutoUpdate", 0), r.set_op(hkey, WU_AU, "AUOptions", 4)]
+    if mode == WU_DISABLED:
+        return [r.set_op(hkey, WU_AU, "NoAutoUpdate", 1), r.delete_op(hkey, WU_AU, "AUOptions")]
+    raise ValueError("unknown mode")
+
+
+def active_hours_start_ops(start_h: int) -> List[r.RegOp]:
+    return [
+        r.set_op(r.HKEY_LOCAL_MACHINE, UX_SETTINGS, "ActiveHoursStart", int(start_h)),
+        r.set_op(r.HKEY_LOCAL_MACHINE, UX_SETTINGS, "IsActiveHoursEnabled", 1),
+    ]
+
+
+def active_hours_end_ops(end_h: int) -> List[r.RegOp]:
+    return [r.set_op(r.HKEY_LOCAL_MACHINE, UX_SETTINGS, "ActiveHoursEnd", int(end_h))]
+
+
+def driver_updates_ops(include: bool) -> List[r.RegOp]:
+    # Windows 11 22H2+ exposes driver updates toggle via policy
+    return [r.set_op(r.HKEY_LOCAL_MACHINE, WU_POLICY, "ExcludeWUDriversInQualityUpdate", 0 if include else 1)]
+
+
+def _wu_mode_state(no_auto: Any, au_options: Any) -> Any:
+    if no_auto is None and au_options is None:
+        return "Default (Windows decides)"
+    if no_auto == 1:
+        return WU_DISABLED
+    return {2: "Notify before download", 4: "Auto download, schedule install"}.get(au_options)
+
+
+def _hour(v: Any) -> Any:
+    return int(v) if isinstance(v, int) and 0 <= v <= 23 else None
+
+
+def apply_wu_mode(mode: str) -> tuple[bool, str]:
+    try:
+        return r.write_ops(wu_mode_ops(mode))
+    except ValueError:
+        return False, "unknown mode"
 
 
 def apply_active_hours_start(start_h: int) -> tuple[bool, str]:
-    hkey = getattr(winreg, 'HKEY_LOCAL_MACHINE', None)
-    if hkey is None:
-        return False, "Registry access not supported on this platform."
-    ok1, m1 = r.set_reg_value(hkey, UX_SETTINGS, "ActiveHoursStart", int(start_h))
-    ok2, m2 = r.set_reg_value(hkey, UX_SETTINGS, "IsActiveHoursEnabled", 1)
-    return (ok1 and ok2), f"{m1}; {m2}"
+    return r.write_ops(active_hours_start_ops(start_h))
 
 
 def apply_active_hours_end(end_h: int) -> tuple[bool, str]:
-    hkey = getattr(winreg, 'HKEY_LOCAL_MACHINE', None)
-    if hkey is None:
-        return False, "Registry access not supported on this platform."
-    return r.set_reg_value(hkey, UX_SETTINGS, "ActiveHoursEnd", int(end_h))
+    return r.write_ops(active_hours_end_ops(end_h))
 
 
 def apply_driver_updates(include: bool) -> tuple[bool, str]:
-    # Windows 11 22H2+ exposes driver updates toggle via policy
-    val = 0 if include else 1
-    hkey = getattr(winreg, 'HKEY_LOCAL_MACHINE', None)
-    if hkey is None:
-        return False, "Registry access not supported on this platform."
-    return r.set_reg_value(hkey,
-                           r"SOFTWARE\Policies\Microsoft\Windows\WindowsUpdate",
-                           "ExcludeWUDriversInQualityUpdate", val)
+    return r.write_ops(driver_updates_ops(include))
 
 
 def get_tweaks() -> List[Tweak]:
@@ -77,12 +88,15 @@ def get_tweaks() -> List[Tweak]:
                 "Default (Windows decides)",
                 "Notify before download",
                 "Auto download, schedule install",
-                "Disable (not recommended)",
+                WU_DISABLED,
             ],
             default="Default (Windows decides)",
             tooltip="Choose how Windows obtains and installs updates.",
             warning="Disabling updates reduces security.",
-            apply=lambda v: apply_wu_mode(v)
+            apply=lambda v: apply_wu_mode(v),
+            reg_ops=wu_mode_ops,
+            probe=Probe(((r.HKEY_LOCAL_MACHINE, WU_AU, "NoAutoUpdate"), (r.HKEY_LOCAL_MACHINE, WU_AU, "AUOptions")), _wu_mode_state),
+            side_effects=[POLICY],
         ),
         Tweak(
             id="active_start",
@@ -92,7 +106,9 @@ def get_tweaks() -> List[Tweak]:
             minimum=0, maximum=23, step=1,
             default=8,
             tooltip="Start of Active Hours to avoid restarts.",
-            apply=lambda v: apply_active_hours_start(v)
+            apply=lambda v: apply_active_hours_start(v),
+            reg_ops=active_hours_start_ops,
+            probe=reg_probe(r.HKEY_LOCAL_MACHINE, UX_SETTINGS, "ActiveHoursStart", _hour),
         ),
         Tweak(
             id="active_end",
@@ -102,7 +118,11 @@ def get_tweaks() -> List[Tweak]:
             minimum=0, maximum=23, step=1,
             default=20,
             tooltip="End of Active Hours to avoid restarts.",
-            apply=lambda v: apply_active_hours_end(v)
+            apply=lambda v: apply_active_hours_end(v),
+            reg_ops=active_hours_end_ops,
+            probe=reg_probe(r.HKEY_LOCAL_MACHINE, UX_SETTINGS, "ActiveHoursEnd", _hour),
+            constraints=[Constraint(("active_start", "active_end"), lambda start, end: start < end,
+                                    "Active hours must start before they end.")],
         ),
         Tweak(
             id="driver_updates",
@@ -111,6 +131,9 @@ def get_tweaks() -> List[Tweak]:
             type="toggle",
             default=True,
             tooltip="Include drivers in Windows Update.",
-            apply=lambda v: apply_driver_updates(v)
+            apply=lambda v: apply_driver_updates(v),
+            reg_ops=driver_updates_ops,
+            probe=reg_probe(r.HKEY_LOCAL_MACHINE, WU_POLICY, "ExcludeWUDriversInQualityUpdate", lambda v: v != 1),
+            side_effects=[POLICY],
         ),
     ]
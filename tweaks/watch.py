@@ -0,0 +1,175 @@
+from __future__ import annotations
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from . import effects
+from .model import Tweak
+from .pipeline import ApplyResult
+from .plan import Plan
+from .probe import drifted as is_drifted, get_engine
+from util import metrics
+
+# Drift watch: re-applies tweaks that something else (typically a Windows
+# update) changed back.
+#
+# The baseline is each tweak's last applied value (the ".applied" marker in
+# the settings), never an unapplied edit. A check reads the live state of
+# every probed baseline tweak in one grouped registry pass, and re-applies
+# only the ones that differ, through a Plan. Side effects of a re-apply run,
+# except those that would ask first (Explorer restart). Tweaks without a probe
+# can't be watched. Re-applies are not journaled: they restore values the
+# user's own (journaled) apply wrote, and must not push that run out of the
+# journal or become the run "Roll Back Last Apply" undoes.
+#
+# A tweak whose drift survives its re-apply (the write failed, or the live
+# state can't hold the value) is reported as stuck and left alone until its
+# live value matches again, its baseline value changes, or check_now().
+#
+# The interval backs off (x BACKOFF, up to max_interval) after every check
+# that re-applied nothing and drops back to min_interval once drift is fixed,
+# so an idle watcher costs one batched read every few hours.
+#
+# Checks never overlap (the watch thread and a check_now() run while the
+# watch is off take turns); the stuck set and the interval are also touched
+# from the GUI thread and are guarded by a lock.
+
+MIN_INTERVAL = 300.0       # seconds
+MAX_INTERVAL = 6 * 3600.0
+BACKOFF = 2.0
+
+_CHECKS = metrics.counter("tweaker_watch_checks_total", "Drift checks by outcome (clean, drifted, failed)", ("result",))
+_DRIFT = metrics.counter("tweaker_watch_drift_total", "Drifted tweaks found by the watcher", ("tweak",))
+
+Baseline = Callable[[], List[Tuple[Tweak, Any]]]
+
+
+class WatchResult(NamedTuple):
+    watched: int                                 # baseline tweaks with a probe
+    drifted: List[Tuple[Tweak, Any, Any]]        # (tweak, wanted, live)
+    results: List[ApplyResult]                   # re-apply results (empty when nothing drifted or reapply is off)
+    side_effects: List[Tuple[str, bool, str]]
+    interval: float                              # seconds until the next check
+    stuck: List[Tuple[Tweak, Any, Any]]          # (tweak, wanted, live) still drifted after this re-apply
+
+
+class Watcher:
+    """Periodic drift check over a baseline; run in a thread with start()/stop() or call check() directly."""
+
+    def __init__(self, baseline: Baseline, min_interval: float = MIN_INTERVAL, max_interval: float = MAX_INTERVAL,
+                 backoff: float = BACKOFF, reapply: bool = True, side_effects: bool = True,
+                 on_result: Optional[Callable[[WatchResult], None]] = None):
+        self.baseline = baseline
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.backoff = backoff
+        self.reapply = reapply
+        self.side_effects = side_effects
+        self.on_result = on_result
+        self.interval = min_interval
+        self._stuck: Dict[str, Any] = {}  # tweak id -> baseline value whose re-apply didn't hold
+        self._lock = threading.Lock()  # interval, _stuck
+        self._checking = threading.Lock()  # held for a whole check
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> WatchResult:
+        with self._checking:
+            return self._check()
+
+    def _check(self) -> WatchResult:
+        items = [(t, v) for t, v in self.baseline() if t.probe is not None]
+        live = get_engine().read_all([t for t, _ in items], refresh=True)
+        drifted: List[Tuple[Tweak, Any, Any]] = []
+        with self._lock:
+            for t, v in items:
+                if not is_drifted(t, v, live):
+                    self._stuck.pop(t.id, None)
+                elif t.id not in self._stuck or self._stuck[t.id] != v:
+                    drifted.append((t, v, live[t.id]))
+        results: List[ApplyResult] = []
+        done: List[Tuple[str, bool, str]] = []
+        stuck: List[Tuple[Tweak, Any, Any]] = []
+        if drifted and self.reapply:
+            with effects.deferred() as keys:
+                results = Plan.build([(t, v) for t, v, _ in drifted]).execute(journal=False)
+            if self.side_effects:
+                done = effects.run(keys, skip=[k for k in keys if effects.resolve(k).confirm])
+            after = get_engine().read_all([t for t, _, _ in drifted], refresh=True)
+            stuck = [(t, v, after[t.id]) for t, v, _ in drifted if is_drifted(t, v, after)]
+        for t, _, _ in drifted:
+            _DRIFT.inc(t.id)
+        _CHECKS.inc("drifted" if drifted else "clean")
+        fixed = len(drifted) > len(stuck) if self.reapply else bool(drifted)
+        with self._lock:
+            for t, v, _ in stuck:
+                self._stuck[t.id] = v
+            self.interval = interval = self.min_interval if fixed else min(self.interval * self.backoff, self.max_interval)
+        return WatchResult(len(items), drifted, results, done, interval, stuck)
+
+    def run(self, stop: Optional[threading.Event] = None):
+        """Check until stop is set (or stop() is called); each wait is the current (adaptive) interval."""
+        stop = stop or self._stop
+        while not stop.is_set():
+            res = self._check_once()
+            if res is not None and self.on_result is not None and not stop.is_set():
+                self.on_result(res)
+            with self._lock:
+                interval = self.interval
+            self._wake.wait(interval)
+            self._wake.clear()
+
+    def _check_once(self) -> Optional[WatchResult]:
+        try:
+            res: Optional[WatchResult] = self.check()
+        except Exception:
+            _CHECKS.inc("failed")
+            res = None
+        metrics.flush()
+        return res
+
+    def start(self):
+        if self.running():
+            return
+        self._stop = threading.Event()  # a thread still finishing its last check keeps its own (set) event
+        self._wake.clear()  # a check_now() or stop() since the last run must not trigger an extra check
+        with self._lock:
+            self.interval = self.min_interval
+        self._thread = threading.Thread(target=self.run, args=(self._stop,), name="drift-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def check_now(self):
+        """Check right away (stuck tweaks are retried): wakes the watch thread, or without one runs a
+        single check on a worker thread; either way the result goes to on_result."""
+        with self._lock:
+            self.interval = self.min_interval
+            self._stuck.clear()
+        if self.running():
+            self._wake.set()
+            return
+        threading.Thread(target=self._check_and_report, name="drift-check", daemon=True).start()
+
+    def _check_and_report(self):
+        res = self._check_once()
+        if res is not None and self.on_result is not None:
+            self.on_result(res)
+
+
+def applied_baseline(states: Sequence[Any]) -> Baseline:
+    """Baseline from CategoryStates: every tweak with an applied value."""
+    def baseline() -> List[Tuple[Tweak, Any]]:
+        out: List[Tuple[Tweak, Any]] = []
+        for s in states:
+            for t in s.tweaks:
+                v = s.applied_value(t)
+                if v is not None:
+                    out.append((t, v))
+        return out
+    return baseline
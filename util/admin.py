@@ -1,8 +1,11 @@
 from __future__ import annotations
 import ctypes, sys, subprocess
-from typing import Tuple
+from typing import Optional, Tuple
+
+from . import proc
 
 UAC_PROMPT_SHOWN = False
+RUN_TIMEOUT = 120.0  # seconds before run() kills the command and its children
 
 
 def is_admin() -> bool:
@@ -31,6 +34,15 @@ def ensure_admin(relaunch_args: str = "") -> Tuple[bool, str]:
         return False, f"elevation failed: {e}"
 
 
-def run(cmd: list[str] | str, check: bool = False) -> subprocess.CompletedProcess:
-    return subprocess.run(cmd, capture_output=True, text=True, shell=isinstance(cmd, str), check=check)
+def run(cmd: list[str] | str, check: bool = False, timeout: Optional[float] = RUN_TIMEOUT,
+        on_line: Optional[proc.LineFn] = None) -> subprocess.CompletedProcess:
+    """Run a command (a string goes through the shell). Output streams to on_line(line, stream) as it arrives.
+    Raises subprocess.TimeoutExpired after killing the process tree when the deadline passes."""
+    res = proc.run(cmd, timeout=timeout, on_line=on_line)
+    if res.timed_out:
+        raise subprocess.TimeoutExpired(cmd, timeout, res.stdout, res.stderr)
+    done = subprocess.CompletedProcess(cmd, res.returncode, res.stdout, res.stderr)
+    if check:
+        done.check_returncode()
+    return done
 
@@ -0,0 +1,244 @@
+from __future__ import annotations
+import atexit, json, os, tempfile, threading, time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Always-on operation metrics: counters and latency histograms.
+#
+# Modules declare their metrics at import (counter()/histogram() return the
+# existing metric when the name is taken) and record with inc()/observe(),
+# which cost a lock and a dict lookup. Label values are passed positionally
+# in the order of the metric's label names. The registry can be written as a
+# Prometheus textfile (node_exporter textfile collector) or as JSON; set
+# TWEAKER_METRICS to a path (".json" for JSON) or call enable() to write it
+# there. Once enabled, it is rewritten after every apply run and drift-watch
+# check (flush()), so a long-running GUI or --watch process, or one that is
+# killed without running atexit, leaves current numbers; exit writes it once more.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0)
+
+_lock = threading.Lock()
+_metrics: Dict[str, "Metric"] = {}
+_path: Optional[str] = None
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _check(self, labels: Tuple[str, ...]):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {labels}")
+
+    def series(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return sorted((k, v if not isinstance(v, list) else list(v)) for k, v in self._values.items())
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            v = self._values.get(labels)
+            if v is None:
+                self._check(labels)
+                v = 0
+            self._values[labels] = v + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            v = self._values.get(labels)
+            if v is None:
+                self._check(labels)
+                # per-bucket counts (the last one is +Inf), then sum and count
+                v = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            v[i] += 1
+            v[-2] += value
+            v[-1] += 1
+
+    def time(self, *labels: str) -> "_Timer":
+        """`with hist.time("checkpoint"): ...` observes the block's duration."""
+        return _Timer(self, labels)
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            v = self._values.get(labels)
+            return v[-1] if v else 0
+
+
+class _Timer:
+    __slots__ = ("hist", "labels", "start")
+
+    def __init__(self, hist: Histogram, labels: Tuple[str, ...]):
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+def _register(cls, name: str, *args, **kw) -> Any:
+    with _lock:
+        m = _metrics.get(name)
+        if m is None:
+            m = _metrics[name] = cls(name, *args, **kw)
+        elif not isinstance(m, cls):
+            raise ValueError(f"metric {name} is already registered as a {m.kind}")
+        return m
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return _register(Counter, name, help, labelnames)
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram, name, help, labelnames, buckets)
+
+
+def get(name: str) -> Optional[Metric]:
+    with _lock:
+        return _metrics.get(name)
+
+
+def reset():
+    """Zero every metric (the metrics stay registered)."""
+    with _lock:
+        ms = list(_metrics.values())
+    for m in ms:
+        m.clear()
+
+
+# ---- Export ----
+
+def _all() -> List[Metric]:
+    with _lock:
+        return [_metrics[k] for k in sorted(_metrics)]
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def prometheus_text() -> str:
+    """Prometheus text exposition format (0.0.4)."""
+    lines: List[str] = []
+    for m in _all():
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        for labels, v in m.series():
+            if isinstance(m, Histogram):
+                total = 0
+                for le, n in zip(m.buckets + (float("inf"),), v):
+                    total += n
+                    bound = 'le="%s"' % ("+Inf" if le == float("inf") else _num(le))
+                    lines.append(f"{m.name}_bucket{_labels(m.labelnames, labels, bound)} {total}")
+                lines.append(f"{m.name}_sum{_labels(m.labelnames, labels)} {_num(v[-2])}")
+                lines.append(f"{m.name}_count{_labels(m.labelnames, labels)} {v[-1]}")
+            else:
+                lines.append(f"{m.name}{_labels(m.labelnames, labels)} {_num(v)}")
+    return "\n".join(lines) + "\n"
+
+
+def to_json() -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for m in _all():
+        series = []
+        for labels, v in m.series():
+            s: Dict[str, Any] = {"labels": dict(zip(m.labelnames, labels))}
+            if isinstance(m, Histogram):
+                cum, total = [], 0
+                for le, n in zip(m.buckets + (None,), v):
+                    total += n
+                    cum.append(["+Inf" if le is None else le, total])
+                s.update(count=v[-1], sum=round(v[-2], 6), buckets=cum)
+            else:
+                s["value"] = v
+            series.append(s)
+        out[m.name] = {"type": m.kind, "help": m.help, "series": series}
+    return {"generated": round(time.time(), 3), "metrics": out}
+
+
+def write(path: str) -> Tuple[bool, str]:
+    """Write all metrics to path, atomically (textfile collectors may read at any time); JSON for *.json."""
+    text = json.dumps(to_json(), indent=1) + "\n" if path.lower().endswith(".json") else prometheus_text()
+    folder = os.path.dirname(os.path.abspath(path))
+    try:
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+    except OSError as e:
+        return False, f"writing metrics failed: {e}"
+    return True, f"wrote {path}"
+
+
+def enable(path: Optional[str] = None):
+    """Write the metrics to path on every flush() and when the process exits."""
+    global _path
+    first = _path is None
+    _path = path or _path
+    if first and _path:
+        atexit.register(_write_at_exit)
+
+
+def flush() -> Optional[Tuple[bool, str]]:
+    """Write the metrics to the enable()d path now; None when not enabled."""
+    path = _path
+    return write(path) if path else None
+
+
+def _write_at_exit():
+    flush()
+
+
+_env = os.environ.get("TWEAKER_METRICS")
+if _env:
+    enable(_env)
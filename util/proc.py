@@ -0,0 +1,140 @@
+from __future__ import annotations
+import asyncio, os, signal, subprocess, sys, threading, time
+from typing import Callable, List, NamedTuple, Optional, Sequence, Union
+
+# Async process runner: streams stdout/stderr line by line to a callback,
+# enforces a per-command deadline and kills the whole process tree when it
+# passes, and runs a bounded number of commands at once. Synchronous
+# wrappers (run, run_many) work from any thread, with or without a running
+# event loop.
+
+Command = Union[str, Sequence[str]]
+# on_line(line, stream) with stream "stdout" or "stderr"
+LineFn = Callable[[str, str], None]
+
+_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+
+class ProcResult(NamedTuple):
+    args: Command
+    returncode: Optional[int]  # None when the process was killed on timeout
+    stdout: str
+    stderr: str
+    timed_out: bool = False
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+
+def kill_tree(pid: int):
+    """Kill a process and everything it started."""
+    try:
+        if sys.platform == "win32":
+            subprocess.run(["taskkill", "/T", "/F", "/PID", str(pid)], capture_output=True, creationflags=_NO_WINDOW)
+        else:
+            # Children are started in their own session, so the group id is the pid
+            os.killpg(pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError):
+        try:
+            os.kill(pid, signal.SIGKILL if hasattr(signal, "SIGKILL") else signal.SIGTERM)
+        except OSError:
+            pass
+
+
+def popen_kwargs() -> dict:
+    """Process-creation flags that let kill_tree reach every descendant."""
+    if sys.platform == "win32":
+        return {"creationflags": _NO_WINDOW}
+    return {"start_new_session": True}
+
+
+async def _pump(stream: asyncio.StreamReader, name: str, on_line: Optional[LineFn], sink: Optional[List[str]]):
+    while True:
+        raw = await stream.readline()
+        if not raw:
+            return
+        line = raw.decode("utf-8", "replace").rstrip("\r\n")
+        if sink is not None:
+            sink.append(line)
+        if on_line is not None:
+            try:
+                on_line(line, name)
+            except Exception:
+                pass  # a broken callback must not wedge the process pipes
+
+
+async def run_async(cmd: Command, timeout: Optional[float] = None, on_line: Optional[LineFn] = None,
+                    capture: bool = True, cwd: Optional[str] = None, env: Optional[dict] = None) -> ProcResult:
+    """Run one command; a string runs through the shell, a sequence as argv."""
+    start = time.monotonic()
+    kw = dict(stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd, env=env, **popen_kwargs())
+    if isinstance(cmd, str):
+        proc = await asyncio.create_subprocess_shell(cmd, **kw)
+    else:
+        proc = await asyncio.create_subprocess_exec(*cmd, **kw)
+    out: Optional[List[str]] = [] if capture else None
+    err: Optional[List[str]] = [] if capture else None
+    pumps = asyncio.gather(_pump(proc.stdout, "stdout", on_line, out), _pump(proc.stderr, "stderr", on_line, err))
+    timed_out = False
+    try:
+        await asyncio.wait_for(asyncio.shield(asyncio.gather(pumps, proc.wait())), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        kill_tree(proc.pid)
+        try:
+            await asyncio.wait_for(asyncio.gather(pumps, proc.wait()), 5)
+        except asyncio.TimeoutError:
+            pumps.cancel()  # a detached grandchild still holds the pipe
+    except asyncio.CancelledError:
+        kill_tree(proc.pid)
+        raise
+    return ProcResult(cmd, None if timed_out else proc.returncode,
+                      "\n".join(out or []), "\n".join(err or []), timed_out, time.monotonic() - start)
+
+
+async def run_many_async(cmds: Sequence[Command], limit: int = 4, timeout: Optional[float] = None,
+                         on_line: Optional[Callable[[int, str, str], None]] = None) -> List[ProcResult]:
+    """Run commands with at most `limit` alive at once; results in input order. on_line gets the command index."""
+    sem = asyncio.Semaphore(max(1, limit))
+
+    async def one(i: int, cmd: Command) -> ProcResult:
+        async with sem:
+            cb = (lambda line, stream: on_line(i, line, stream)) if on_line is not None else None
+            return await run_async(cmd, timeout=timeout, on_line=cb)
+
+    return list(await asyncio.gather(*(one(i, c) for i, c in enumerate(cmds))))
+
+
+def _sync(coro_fn: Callable[[], "asyncio.Future"]):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro_fn())
+    # Called from inside a running loop: run on a private loop in a helper thread
+    box: list = []
+
+    def work():
+        try:
+            box.append((True, asyncio.run(coro_fn())))
+        except BaseException as e:
+            box.append((False, e))
+
+    t = threading.Thread(target=work, daemon=True)
+    t.start()
+    t.join()
+    ok, val = box[0]
+    if not ok:
+        raise val
+    return val
+
+
+def run(cmd: Command, timeout: Optional[float] = None, on_line: Optional[LineFn] = None,
+        capture: bool = True, cwd: Optional[str] = None, env: Optional[dict] = None) -> ProcResult:
+    return _sync(lambda: run_async(cmd, timeout, on_line, capture, cwd, env))
+
+
+def run_many(cmds: Sequence[Command], limit: int = 4, timeout: Optional[float] = None,
+             on_line: Optional[Callable[[int, str, str], None]] = None) -> List[ProcResult]:
+    return _sync(lambda: run_many_async(cmds, limit, timeout, on_line))
@@ -1,27 +1,264 @@
 from __future__ import annotations
-import subprocess
-from typing import Tuple
+import atexit, base64, os, queue, shlex, subprocess, threading, time, uuid
+from typing import Callable, List, Optional, Tuple
+
+from . import metrics, proc as _proc
 
 # PowerShell helpers
+#
+# Commands run on a small pool of long-lived hosts fed over stdin instead of a
+# fresh `powershell` process per call. Every command is framed so the host
+# prints a unique sentinel line carrying the exit status once it is done.
+# Every command has a deadline (PS_TIMEOUT); past it the host and the whole
+# process tree it started are killed and the pool spawns a replacement.
+
+DEFAULT_HOST = ["powershell", "-NoProfile", "-NonInteractive", "-ExecutionPolicy", "Bypass", "-Command", "-"]
+POOL_SIZE = 2
+PS_TIMEOUT = 300.0  # seconds per command before its host (and everything it started) is killed
+_SENTINEL = "__W11T_DONE__"
+
+_PROCESSES = metrics.counter("tweaker_ps_processes_total", "PowerShell processes started: pool hosts and one-off runs", ("kind",))
+_COMMANDS = metrics.counter("tweaker_ps_commands_total", "Commands run through ps() by result", ("result",))
+_OPERATION_SECONDS = metrics.histogram("tweaker_operation_seconds", "Duration of system operations (restore point, Explorer restart, ...)", ("operation",))
+
+# frame(cmd, token) -> text written to the host's stdin
+FrameFn = Callable[[str, str], str]
+
+
+def _frame_powershell(cmd: str, token: str) -> str:
+    # The command travels base64-encoded so quoting and newlines survive the single-line stdin protocol.
+    # Each output record is written (and flushed) as it arrives, so on_line streams; ForEach-Object runs
+    # in this scope, so an ErrorRecord seen on the way still fails the command.
+    b64 = base64.b64encode(cmd.encode("utf-8")).decode("ascii")
+    return (
+        "$global:LASTEXITCODE = 0; $__ok = $true; "
+        f"$__sb = [ScriptBlock]::Create([Text.Encoding]::UTF8.GetString([Convert]::FromBase64String('{b64}'))); "
+        "try { & $__sb 2>&1 | ForEach-Object { "
+        "if ($_ -is [System.Management.Automation.ErrorRecord]) { $__ok = $false }; "
+        "[Console]::Out.WriteLine(($_ | Out-String).TrimEnd()); [Console]::Out.Flush() }; "
+        "if ($LASTEXITCODE) { $__ok = $false } } "
+        "catch { [Console]::Out.WriteLine(($_ | Out-String).TrimEnd()); $__ok = $false }; "
+        f"[Console]::Out.WriteLine('{token} ' + [int](-not $__ok)); [Console]::Out.Flush()\n"
+    )
+
+
+def _frame_sh(cmd: str, token: str) -> str:
+    # Stand-in POSIX shell host (used to exercise the pool off Windows); subshell keeps state isolated.
+    return f"( {cmd}\n) </dev/null 2>&1; printf '\\n%s %d\\n' '{token}' $?\n"
+
+
+DIALECTS = {"powershell": _frame_powershell, "sh": _frame_sh}
+
+
+def _dialect_for(argv: List[str]) -> str:
+    exe = os.path.basename(argv[0]).lower()
+    return "sh" if exe in {"sh", "bash", "dash", "zsh", "ksh"} else "powershell"
+
+
+class PSHost:
+    """One long-lived shell process executing framed commands sequentially."""
+
+    def __init__(self, argv: List[str], frame: FrameFn):
+        self.argv = argv
+        self.frame = frame
+        self.proc: Optional[subprocess.Popen] = None
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            self.argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, encoding="utf-8", errors="replace", bufsize=1, **_proc.popen_kwargs(),
+        )
+        _PROCESSES.inc("host")
+        threading.Thread(target=self._pump, args=(self.proc, self._lines), daemon=True).start()
+
+    @staticmethod
+    def _pump(proc: subprocess.Popen, lines: "queue.Queue[Optional[str]]"):
+        for line in proc.stdout:
+            lines.put(line.rstrip("\r\n"))
+        lines.put(None)
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def run(self, cmd: str, timeout: Optional[float] = None, on_line: Optional[Callable[[str], None]] = None) -> tuple[bool, str]:
+        if not self.alive():
+            return False, "PowerShell host is not running"
+        token = f"{_SENTINEL}{uuid.uuid4().hex}"
+        try:
+            self.proc.stdin.write(self.frame(cmd, token))
+            self.proc.stdin.flush()
+        except (OSError, ValueError) as e:
+            return False, f"PowerShell host write failed: {e}"
+        out: List[str] = []
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                line = self._lines.get(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                self.close(kill=True)
+                return False, f"timed out after {timeout}s"
+            if line is None:
+                return False, ("\n".join(out).strip() or "PowerShell host exited")
+            if line.startswith(token):
+                status = line[len(token):].strip()
+                text = "\n".join(out).strip()
+                if status == "0":
+                    return True, text or "ok"
+                return False, text or "error"
+            out.append(line)
+            if on_line is not None:
+                try:
+                    on_line(line)
+                except Exception as e:
+                    # The rest of this command's output is still queued; the host can't be reused
+                    self.close(kill=True)
+                    return False, f"output handler failed: {e}"
+
+    def close(self, kill: bool = False):
+        proc, self.proc = self.proc, None
+        if proc is None:
+            return
+        if kill:
+            # The command may have started its own children (netsh, Checkpoint-Computer workers)
+            _proc.kill_tree(proc.pid)
+            try:
+                proc.wait(timeout=2)
+            except Exception:
+                pass
+            return
+        try:
+            proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            proc.wait(timeout=2)
+        except Exception:
+            proc.kill()
+
+
+class PSPool:
+    """Bounded pool of warm hosts. A host whose command fails is replaced with a fresh one."""
+
+    def __init__(self, argv: Optional[List[str]] = None, dialect: Optional[str] = None, size: int = POOL_SIZE):
+        self.argv = list(argv or DEFAULT_HOST)
+        self.frame = DIALECTS[dialect or _dialect_for(self.argv)]
+        self.size = max(1, size)
+        self._idle: List[PSHost] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
 
-def ps(cmd: str) -> tuple[bool, str]:
-    """Run a PowerShell command; returns (ok, output_or_error)."""
+    def _spawn(self) -> PSHost:
+        host = PSHost(self.argv, self.frame)
+        host.start()
+        return host
+
+    def warm(self, count: Optional[int] = None):
+        """Pre-start hosts so the first command doesn't pay process startup."""
+        with self._lock:
+            while len(self._idle) < min(count or self.size, self.size):
+                self._idle.append(self._spawn())
+
+    def run(self, cmd: str, timeout: Optional[float] = None, on_line: Optional[Callable[[str], None]] = None) -> tuple[bool, str]:
+        with self._slots:
+            with self._lock:
+                host = self._idle.pop() if self._idle else None
+            try:
+                if host is None or not host.alive():
+                    host = self._spawn()
+            except Exception as e:
+                return False, str(e)
+            ok, out = host.run(cmd, timeout, on_line)
+            if not ok or not host.alive():
+                host.close()
+                try:
+                    host = self._spawn()
+                except Exception:
+                    host = None
+            with self._lock:
+                if host is not None:
+                    if self._closed:
+                        host.close()
+                    else:
+                        self._idle.append(host)
+            return ok, out
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            hosts, self._idle = self._idle, []
+        for h in hosts:
+            h.close()
+
+
+_pool: Optional[PSPool] = None
+_pool_lock = threading.Lock()
+
+
+def configure_pool(argv: Optional[List[str]] = None, dialect: Optional[str] = None, size: int = POOL_SIZE) -> PSPool:
+    """Replace the shared pool, e.g. configure_pool(["bash"]) to run against a stand-in shell."""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, PSPool(argv, dialect, size)
+    if old is not None:
+        old.shutdown()
+    return _pool
+
+
+def get_pool() -> PSPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            env = os.environ.get("TWEAKER_PS_HOST")
+            _pool = PSPool(shlex.split(env) if env else None, os.environ.get("TWEAKER_PS_DIALECT") or None)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, None
+    if old is not None:
+        old.shutdown()
+
+
+atexit.register(shutdown_pool)
+
+
+def ps(cmd: str, timeout: Optional[float] = PS_TIMEOUT, on_line: Optional[Callable[[str], None]] = None) -> tuple[bool, str]:
+    """Run a PowerShell command on a pooled host; returns (ok, output_or_error).
+    Output lines go to on_line as they arrive; past the deadline the host's process tree is killed."""
     try:
-        cp = subprocess.run([
-            "powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", cmd
-        ], capture_output=True, text=True)
-        if cp.returncode == 0:
-            return True, (cp.stdout or "ok").strip()
-        else:
-            return False, (cp.stderr or cp.stdout or "error").strip()
+        ok, out = get_pool().run(cmd, timeout, on_line)
     except Exception as e:
+        ok, out = False, str(e)
+    _COMMANDS.inc("ok" if ok else "failed")
+    return ok, out
+
+
+def ps_once(cmd: str, timeout: Optional[float] = PS_TIMEOUT, on_line: Optional[_proc.LineFn] = None) -> tuple[bool, str]:
+    """Run a command in a fresh PowerShell process (no pool), e.g. when it must not share a host's state."""
+    argv = DEFAULT_HOST[:-1] + [cmd]
+    _PROCESSES.inc("once")
+    try:
+        res = _proc.run(argv, timeout=timeout, on_line=on_line)
+    except OSError as e:
         return False, str(e)
+    if res.timed_out:
+        return False, f"timed out after {timeout}s"
+    text = "\n".join(p for p in (res.stdout.strip(), res.stderr.strip()) if p)
+    return res.ok, text or ("ok" if res.ok else "error")
+
+
+CHECKPOINT_TIMEOUT = 600.0
 
 
 def checkpoint(description: str = "Windows11Tweaker") -> tuple[bool, str]:
     # Create a system restore point (works if Protection is enabled)
     cmd = f"Checkpoint-Computer -Description '{description}' -RestorePointType 'MODIFY_SETTINGS'"
-    return ps(cmd)
+    with _OPERATION_SECONDS.time("checkpoint"):
+        return ps(cmd, timeout=CHECKPOINT_TIMEOUT)
 
 
 def restart_explorer() -> tuple[bool, str]:
@@ -31,4 +268,18 @@ def restart_explorer() -> tuple[bool, str]:
         "Stop-Process -Name explorer -Force -ErrorAction SilentlyContinue; "
         "Start-Process explorer.exe"
     )
-    return ps(cmd)
+    with _OPERATION_SECONDS.time("restart_explorer"):
+        return ps(cmd)
+
+
+def refresh_policy() -> tuple[bool, str]:
+    """Re-read group policy so policy registry values take effect without a reboot."""
+    with _OPERATION_SECONDS.time("refresh_policy"):
+        return ps("gpupdate /force | Out-String")
+
+
+def restart_service(name: str) -> tuple[bool, str]:
+    """Restart a Windows service (no-op if it is not running)."""
+    svc = name.replace("'", "''")
+    with _OPERATION_SECONDS.time("restart_service"):
+        return ps(f"Get-Service -Name '{svc}' -ErrorAction Stop | Where-Object Status -eq 'Running' | Restart-Service -Force -ErrorAction Stop")
@@ -0,0 +1,74 @@
+from __future__ import annotations
+import base64
+from typing import Dict, Hashable, List, NamedTuple, Sequence, Tuple
+
+from . import psquery
+from .ps import ps
+
+# Batch several PowerShell fragments into one script run on a single host.
+# Each fragment is wrapped in its own try/catch and reports a result marker
+# line, so callers still get one (ok, message) per fragment.
+
+_MARKER = "__W11T_RESULT__"
+
+
+class PSFragment(NamedTuple):
+    script: str
+    # Shared setup (e.g. an adapter query); identical preludes run once per batch
+    prelude: str = ""
+
+
+def _wrap(index: int, script: str) -> str:
+    return (
+        "$global:LASTEXITCODE = 0\n"
+        f"try {{ $__r = @(& {{\n{script}\n}} 2>&1); "
+        "$__ok = (-not ($__r | Where-Object { $_ -is [System.Management.Automation.ErrorRecord] })) -and (-not $LASTEXITCODE) }\n"
+        "catch { $__r = @($_); $__ok = $false }\n"
+        f"[Console]::Out.WriteLine('{_MARKER} {index} ' + [int](-not $__ok) + ' ' + "
+        "[Convert]::ToBase64String([Text.Encoding]::UTF8.GetBytes(($__r | Out-String))))\n"
+    )
+
+
+def compile_batch(fragments: Sequence[PSFragment]) -> str:
+    preludes: List[str] = []
+    for f in fragments:
+        if f.prelude and f.prelude not in preludes:
+            preludes.append(f.prelude)
+    parts = [f"try {{ {p} }} catch {{ }}\n" for p in preludes]
+    parts += [_wrap(i, f.script) for i, f in enumerate(fragments)]
+    return "".join(parts)
+
+
+def parse_results(output: str, count: int) -> Dict[int, Tuple[bool, str]]:
+    results: Dict[int, Tuple[bool, str]] = {}
+    for line in output.splitlines():
+        if not line.startswith(_MARKER):
+            continue
+        try:
+            _, idx, status, payload = (line.split(" ", 3) + [""])[:4]
+            text = base64.b64decode(payload).decode("utf-8", "replace").strip() if payload else ""
+            i = int(idx)
+        except Exception:
+            continue
+        if 0 <= i < count:
+            results[i] = (status == "0", text or ("ok" if status == "0" else "error"))
+    return results
+
+
+def run_batch(items: Sequence[Tuple[Hashable, PSFragment]]) -> Dict[Hashable, Tuple[bool, str]]:
+    """Run all fragments in one script; returns {key: (ok, message)}."""
+    if not items:
+        return {}
+    frags = [f for _, f in items]
+    ok, out = ps(compile_batch(frags))
+    psquery.invalidate()  # the fragments may have changed what cached queries saw
+    parsed = parse_results(out, len(frags))
+    results: Dict[Hashable, Tuple[bool, str]] = {}
+    for i, (key, _) in enumerate(items):
+        # A fragment without a marker never ran (host died or the script failed to parse)
+        results[key] = parsed.get(i, (False, out if not ok else "no result reported"))
+    return results
+
+
+def run_fragment(frag: PSFragment) -> tuple[bool, str]:
+    return run_batch([(0, frag)])[0]
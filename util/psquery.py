@@ -0,0 +1,79 @@
+from __future__ import annotations
+import json, threading, time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from .ps import ps
+
+# Cached read-only PowerShell queries.
+#
+# A query is a script whose objects are serialized with ConvertTo-Json, parsed
+# once and turned into typed records by a caller-supplied function. Results
+# are cached per script for a TTL; invalidate() after anything that may have
+# changed them. Inside offline() queries are not run at all (None comes back),
+# for code that must not depend on this machine, e.g. exported scripts.
+
+T = TypeVar("T")
+
+DEFAULT_TTL = 60.0
+
+_cache: Dict[str, Tuple[float, Any]] = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def run_json(script: str) -> Optional[List[Any]]:
+    """Run a script and parse its output objects; None if it failed or its output is not JSON."""
+    ok, out = ps(f"@({script}) | ConvertTo-Json -Depth 4 -Compress")
+    if not ok:
+        return None
+    for line in out.splitlines():
+        line = line.strip()
+        if line.startswith(("[", "{")):
+            try:
+                data = json.loads(line)
+            except ValueError:
+                return None
+            # ConvertTo-Json unwraps a single object
+            return data if isinstance(data, list) else [data]
+    return []  # an empty pipeline prints nothing
+
+
+def query(script: str, parse: Callable[[List[Any]], T], ttl: float = DEFAULT_TTL) -> Optional[T]:
+    """Cached, parsed result of a read-only query; None when unavailable (or offline)."""
+    if getattr(_local, "offline", 0):
+        return None
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(script)
+        if hit is not None and now - hit[0] < ttl:
+            return hit[1]
+    rows = run_json(script)
+    if rows is None:
+        return None
+    try:
+        value = parse(rows)
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+    with _lock:
+        _cache[script] = (time.monotonic(), value)
+    return value
+
+
+def invalidate(script: Optional[str] = None):
+    with _lock:
+        if script is None:
+            _cache.clear()
+        else:
+            _cache.pop(script, None)
+
+
+class offline:
+    """Context manager: queries return None in this thread (nothing about this machine leaks in)."""
+
+    def __enter__(self):
+        _local.offline = getattr(_local, "offline", 0) + 1
+        return self
+
+    def __exit__(self, *exc):
+        _local.offline -= 1
+        return False
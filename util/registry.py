@@ -1,72 +1,389 @@
 from __future__ import annotations
-import winreg
-from typing import Any, Tuple
+import threading, time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from . import metrics
+
+try:
+    import winreg
+except ImportError:  # not on Windows
+    winreg = None
 
 # Generic registry helpers returning (ok, message)
+#
+# Reads go through a shared LRU cache (ReadCache) that every write made here
+# invalidates; pass cached=False where an external change must be seen.
 
-def set_reg_value(root, path: str, name: str, value: Any, reg_type=None) -> tuple[bool, str]:
-    reg_type = reg_type or getattr(winreg, 'REG_DWORD', None)
-    CreateKeyEx = getattr(winreg, 'CreateKeyEx', None)
-    KEY_SET_VALUE = getattr(winreg, 'KEY_SET_VALUE', None)
-    SetValueEx = getattr(winreg, 'SetValueEx', None)
-    CloseKey = getattr(winreg, 'CloseKey', None)
-    if None in (reg_type, CreateKeyEx, KEY_SET_VALUE, SetValueEx, CloseKey):
-        return False, "Registry access not supported on this platform."
-    try:
-        if CreateKeyEx is None:
-            return False, "Registry access not supported on this platform."
-        key = CreateKeyEx(root, path, 0, KEY_SET_VALUE)
-        if key is None:
-            return False, "Registry access not supported on this platform."
-        if SetValueEx is None or CloseKey is None:
-            return False, "Registry access not supported on this platform."
-        SetValueEx(key, name, 0, reg_type, value)
-        CloseKey(key)
-        return True, f"{path}::{name} set to {value}"
-    except Exception as e:
-        return False, f"reg set failed {path}::{name}: {e}"
+HKEY_CURRENT_USER = getattr(winreg, 'HKEY_CURRENT_USER', 0x80000001)
+HKEY_LOCAL_MACHINE = getattr(winreg, 'HKEY_LOCAL_MACHINE', 0x80000002)
+REG_SZ = getattr(winreg, 'REG_SZ', 1)
+REG_DWORD = getattr(winreg, 'REG_DWORD', 4)
+ROOT_NAMES = {HKEY_CURRENT_USER: "HKCU", HKEY_LOCAL_MACHINE: "HKLM"}
+
+UNSUPPORTED = "Registry access not supported on this platform."
+UNREADABLE = object()  # get_reg_entries: the value exists but could not be read
+
+# Backend calls: key opens, value reads (plus reads answered by the cache) and writes/deletes
+_OPS = metrics.counter("tweaker_registry_operations_total", "Registry key opens, value reads and writes", ("op",))
+
+
+class RegOp(NamedTuple):
+    root: Any
+    path: str
+    name: str
+    value: Any = None
+    reg_type: Any = None
+    delete: bool = False
+
+
+def set_op(root, path: str, name: str, value: Any, reg_type=None) -> RegOp:
+    return RegOp(root, path, name, value, reg_type)
+
+
+def delete_op(root, path: str, name: str) -> RegOp:
+    return RegOp(root, path, name, delete=True)
+
+
+def key_id(root, path: str) -> Tuple[Any, str]:
+    """Normalized (root, path) used to group operations on the same key (the registry is case-insensitive)."""
+    return root, "\\".join(p for p in path.split("\\") if p).lower()
+
+
+# ---- Backends ----
+
+class WinregBackend:
+    """Thin adapter over the winreg module."""
+
+    @property
+    def supported(self) -> bool:
+        return winreg is not None and all(hasattr(winreg, n) for n in (
+            'CreateKeyEx', 'OpenKey', 'SetValueEx', 'QueryValueEx', 'DeleteValue', 'CloseKey'))
+
+    def create_key(self, root, path: str):
+        return winreg.CreateKeyEx(root, path, 0, winreg.KEY_SET_VALUE)
+
+    def open_key(self, root, path: str, write: bool = False):
+        return winreg.OpenKey(root, path, 0, winreg.KEY_SET_VALUE if write else winreg.KEY_READ)
+
+    def set_value(self, key, name: str, reg_type, value: Any):
+        winreg.SetValueEx(key, name, 0, reg_type, value)
+
+    def query_value(self, key, name: str) -> Tuple[Any, Any]:
+        return winreg.QueryValueEx(key, name)
+
+    def delete_value(self, key, name: str):
+        winreg.DeleteValue(key, name)
+
+    def close_key(self, key):
+        winreg.CloseKey(key)
+
+
+class MemoryBackend:
+    """In-memory registry with winreg semantics, for running off Windows and in tests."""
+
+    supported = True
+
+    def __init__(self):
+        self.keys: Dict[Tuple[Any, str], Dict[str, Tuple[Any, Any]]] = {}
+
+    def create_key(self, root, path: str):
+        k = key_id(root, path)
+        self.keys.setdefault(k, {})
+        return k
+
+    def open_key(self, root, path: str, write: bool = False):
+        k = key_id(root, path)
+        if k not in self.keys:
+            raise FileNotFoundError(2, "The system cannot find the file specified")
+        return k
+
+    def set_value(self, key, name: str, reg_type, value: Any):
+        self.keys[key][name.lower()] = (value, reg_type)
+
+    def query_value(self, key, name: str) -> Tuple[Any, Any]:
+        try:
+            return self.keys[key][name.lower()]
+        except KeyError:
+            raise FileNotFoundError(2, "The system cannot find the file specified") from None
+
+    def delete_value(self, key, name: str):
+        try:
+            del self.keys[key][name.lower()]
+        except KeyError:
+            raise FileNotFoundError(2, "The system cannot find the file specified") from None
+
+    def close_key(self, key):
+        pass
+
+
+# ---- Read cache ----
+
+class ReadCache:
+    """Thread-safe LRU of registry reads keyed by (root, path, name), with optional TTL.
+
+    Entries are (value, reg_type) or None for an absent value. Writes through
+    this module invalidate the values they touch; a read that raced with an
+    invalidation is not stored (generation check).
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: Optional[float] = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Tuple[Any, str, str], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = self.misses = self.evictions = 0
+
+    @staticmethod
+    def key(root, path: str, name: str) -> Tuple[Any, str, str]:
+        return (*key_id(root, path), name.lower())
+
+    def get(self, k) -> Tuple[bool, Any]:
+        with self._lock:
+            hit = self._data.get(k)
+            if hit is not None and (self.ttl is None or time.monotonic() - hit[0] < self.ttl):
+                self._data.move_to_end(k)
+                self.hits += 1
+                return True, hit[1]
+            if hit is not None:
+                del self._data[k]
+            self.misses += 1
+            return False, None
+
+    def put(self, k, entry: Any, generation: int):
+        with self._lock:
+            if generation != self.generation or self.maxsize <= 0:
+                return
+            self._data[k] = (time.monotonic(), entry)
+            self._data.move_to_end(k)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys: Iterable[Tuple[Any, str, str]]):
+        with self._lock:
+            self.generation += 1
+            for k in keys:
+                self._data.pop(k, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
 
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._data)}
 
-def get_reg_value(root, path: str, name: str, default: Any = None) -> Any:
-    OpenKey = getattr(winreg, 'OpenKey', None)
-    KEY_READ = getattr(winreg, 'KEY_READ', None)
-    QueryValueEx = getattr(winreg, 'QueryValueEx', None)
-    CloseKey = getattr(winreg, 'CloseKey', None)
-    if None in (OpenKey, KEY_READ, QueryValueEx, CloseKey):
-        return default
+
+_cache = ReadCache()
+
+
+def configure_cache(maxsize: int = 4096, ttl: Optional[float] = 30.0):
+    """Resize the read cache or change its TTL (None = no expiry, maxsize 0 = off); drops cached reads."""
+    with _cache._lock:
+        _cache.maxsize, _cache.ttl = maxsize, ttl
+    _cache.clear()
+
+
+def flush_cache():
+    _cache.clear()
+
+
+def cache_stats() -> Dict[str, int]:
+    return _cache.stats()
+
+
+_backend: Any = WinregBackend()
+
+
+def get_backend():
+    return _backend
+
+
+def set_backend(backend) -> Any:
+    """Swap the registry backend (e.g. MemoryBackend()); returns the previous one."""
+    global _backend
+    old, _backend = _backend, backend
+    _cache.clear()
+    return old
+
+
+# ---- Batched writes ----
+
+class RegistrySession:
+    """Queue set/delete operations and flush them with one open per (root, path).
+
+    with RegistrySession() as s:
+        s.set(HKEY_CURRENT_USER, path, "A", 1)
+        s.set(HKEY_CURRENT_USER, path, "B", 0)
+    s.results  # [(ok, msg), (ok, msg)] in queue order
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.ops: List[RegOp] = []
+        self.results: List[Tuple[bool, str]] = []
+
+    def add(self, op: RegOp) -> int:
+        self.ops.append(op)
+        return len(self.ops) - 1
+
+    def set(self, root, path: str, name: str, value: Any, reg_type=None) -> int:
+        return self.add(set_op(root, path, name, value, reg_type))
+
+    def delete(self, root, path: str, name: str) -> int:
+        return self.add(delete_op(root, path, name))
+
+    def flush(self) -> List[Tuple[bool, str]]:
+        ops, self.ops = self.ops, []
+        self.results = _execute(self.backend or _backend, ops)
+        return self.results
+
+    def __enter__(self) -> "RegistrySession":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+
+def _execute(backend, ops: Sequence[RegOp]) -> List[Tuple[bool, str]]:
+    results: List[Optional[Tuple[bool, str]]] = [None] * len(ops)
+    if not backend.supported:
+        return [(False, UNSUPPORTED)] * len(ops)
     try:
-        if OpenKey is None or KEY_READ is None:
-            return default
-        key = OpenKey(root, path, 0, KEY_READ)
-        if key is None or QueryValueEx is None or CloseKey is None:
-            return default
-        val, _ = QueryValueEx(key, name)
-        CloseKey(key)
-        return val
-    except FileNotFoundError:
-        return default
-    except Exception:
-        return default
+        return _execute_groups(backend, ops, results)
+    finally:
+        # Also after a failed write: the value may have changed anyway
+        _cache.invalidate(ReadCache.key(op.root, op.path, op.name) for op in ops)
 
 
-def delete_reg_value(root, path: str, name: str) -> tuple[bool, str]:
-    OpenKey = getattr(winreg, 'OpenKey', None)
-    KEY_SET_VALUE = getattr(winreg, 'KEY_SET_VALUE', None)
-    DeleteValue = getattr(winreg, 'DeleteValue', None)
-    CloseKey = getattr(winreg, 'CloseKey', None)
-    if None in (OpenKey, KEY_SET_VALUE, DeleteValue, CloseKey):
-        return False, "Registry access not supported on this platform."
+def _execute_groups(backend, ops: Sequence[RegOp], results: List[Optional[Tuple[bool, str]]]) -> List[Tuple[bool, str]]:
+    groups: "OrderedDict[Tuple[Any, str], List[int]]" = OrderedDict()
+    for i, op in enumerate(ops):
+        groups.setdefault(key_id(op.root, op.path), []).append(i)
+    _OPS.inc("open", amount=len(groups))
+    _OPS.inc("write", amount=len(ops))
+    for idxs in groups.values():
+        first = ops[idxs[0]]
+        writes = any(not ops[i].delete for i in idxs)
+        try:
+            key = backend.create_key(first.root, first.path) if writes else backend.open_key(first.root, first.path, write=True)
+        except FileNotFoundError:
+            # Only deletes target this key and it doesn't exist: nothing to remove
+            for i in idxs:
+                results[i] = (True, f"not present {ops[i].path}::{ops[i].name}")
+            continue
+        except Exception as e:
+            for i in idxs:
+                op = ops[i]
+                verb = "delete" if op.delete else "set"
+                results[i] = (False, f"reg {verb} failed {op.path}::{op.name}: {e}")
+            continue
+        try:
+            for i in idxs:
+                results[i] = _apply_one(backend, key, ops[i])
+        finally:
+            try:
+                backend.close_key(key)
+            except Exception:
+                pass
+    return results  # type: ignore[return-value]
+
+
+def _apply_one(backend, key, op: RegOp) -> Tuple[bool, str]:
+    if op.delete:
+        try:
+            backend.delete_value(key, op.name)
+            return True, f"deleted {op.path}::{op.name}"
+        except FileNotFoundError:
+            return True, f"not present {op.path}::{op.name}"
+        except Exception as e:
+            return False, f"reg delete failed {op.path}::{op.name}: {e}"
     try:
-        if OpenKey is None or KEY_SET_VALUE is None:
-            return False, "Registry access not supported on this platform."
-        key = OpenKey(root, path, 0, KEY_SET_VALUE)
-        if key is None or DeleteValue is None or CloseKey is None:
-            return False, "Registry access not supported on this platform."
-        DeleteValue(key, name)
-        CloseKey(key)
-        return True, f"deleted {path}::{name}"
-    except FileNotFoundError:
-        return True, f"not present {path}::{name}"
+        backend.set_value(key, op.name, op.reg_type or REG_DWORD, op.value)
+        return True, f"{op.path}::{op.name} set to {op.value}"
     except Exception as e:
-        return False, f"reg delete failed {path}::{name}: {e}"
+        return False, f"reg set failed {op.path}::{op.name}: {e}"
+
+
+def write_ops(ops: Sequence[RegOp]) -> tuple[bool, str]:
+    """Flush ops in one session and fold the results into a single (ok, message)."""
+    if not _backend.supported:
+        return False, UNSUPPORTED
+    results = _execute(_backend, ops)
+    return all(ok for ok, _ in results), "; ".join(m for _, m in results)
+
+
+# ---- Single-value helpers ----
 
+def set_reg_value(root, path: str, name: str, value: Any, reg_type=None) -> tuple[bool, str]:
+    return _execute(_backend, [set_op(root, path, name, value, reg_type)])[0]
+
+
+def get_reg_value(root, path: str, name: str, default: Any = None, cached: bool = True) -> Any:
+    return get_reg_values([(root, path, name)], default, cached)[0]
+
+
+def get_reg_values(reads: Sequence[Tuple[Any, str, str]], default: Any = None, cached: bool = True) -> List[Any]:
+    """Read many (root, path, name) values with one open per key; missing values come back as default."""
+    return [default if e is None or e is UNREADABLE else e[0] for e in get_reg_entries(reads, cached)]
+
+
+def get_reg_entries(reads: Sequence[Tuple[Any, str, str]], cached: bool = True) -> List[Any]:
+    """Like get_reg_values but keeps the type: (value, reg_type), None when absent, UNREADABLE on other errors.
+
+    cached=False skips the read cache (the fresh values are still stored)."""
+    backend = _backend
+    if not backend.supported:
+        return [UNREADABLE] * len(reads)
+    out: List[Any] = [None] * len(reads)
+    keys = [ReadCache.key(*rd) for rd in reads]
+    generation = _cache.generation
+    pending: List[int] = []
+    for i, k in enumerate(keys):
+        found, entry = _cache.get(k) if cached else (False, None)
+        if found:
+            out[i] = entry
+        else:
+            pending.append(i)
+    groups: "OrderedDict[Tuple[Any, str], List[int]]" = OrderedDict()
+    for i in pending:
+        root, path, _ = reads[i]
+        groups.setdefault(key_id(root, path), []).append(i)
+    if len(pending) < len(reads):
+        _OPS.inc("cached_read", amount=len(reads) - len(pending))
+    if pending:
+        _OPS.inc("open", amount=len(groups))
+        _OPS.inc("read", amount=len(pending))
+    for idxs in groups.values():
+        root, path, _ = reads[idxs[0]]
+        try:
+            key = backend.open_key(root, path)
+        except FileNotFoundError:
+            continue
+        except Exception:
+            for i in idxs:
+                out[i] = UNREADABLE
+            continue
+        try:
+            for i in idxs:
+                try:
+                    val, reg_type = backend.query_value(key, reads[i][2])
+                    out[i] = (val, reg_type)
+                except FileNotFoundError:
+                    pass
+                except Exception:
+                    out[i] = UNREADABLE
+        finally:
+            backend.close_key(key)
+    for i in pending:
+        if out[i] is not UNREADABLE:
+            _cache.put(keys[i], out[i], generation)
+    return out
+
+
+def delete_reg_value(root, path: str, name: str) -> tuple[bool, str]:
+    return _execute(_backend, [delete_op(root, path, name)])[0]
@@ -0,0 +1,195 @@
+from __future__ import annotations
+import atexit, json, os, tempfile, threading, weakref
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Set
+
+# Bulk settings store with the QSettings calls the app uses (value, setValue,
+# remove, contains, allKeys, sync).
+#
+# The whole profile is one JSON file read once into typed values; keys keep
+# the QSettings layout ("Category/id", "Category/id.applied", "General/..."),
+# so a profile can be migrated from QSettings as is. setValue only marks keys
+# that really changed; writes are debounced and atomic (temp file + rename),
+# and inside batch() every sync() collapses into a single write on exit.
+#
+# Several stores can share one file (the GUI and the short-lived ones of
+# headless runs), so sync() writes only what this store changed or removed:
+# it re-reads the file, merges those keys into it and takes the other keys
+# from disk.
+
+SETTINGS_VERSION = 1
+DEBOUNCE = 0.5  # seconds a setValue waits for more changes before writing
+
+# Open stores, flushed at exit
+_stores: "weakref.WeakSet[SettingsStore]" = weakref.WeakSet()
+
+
+def config_dir() -> str:
+    base = (os.environ.get("TWEAKER_CONFIG_DIR") or os.environ.get("APPDATA")
+            or os.path.join(os.path.expanduser("~"), ".config"))
+    return os.path.join(base, "Windows11Tweaker")
+
+
+def settings_path() -> str:
+    return os.environ.get("TWEAKER_SETTINGS") or os.path.join(config_dir(), "settings.json")
+
+
+class SettingsStore:
+    def __init__(self, path: Optional[str] = None, debounce: float = DEBOUNCE):
+        self.path = path or settings_path()
+        self.debounce = debounce
+        self._lock = threading.RLock()
+        # Held from snapshot to rename, so a newer snapshot is never overwritten by an older one
+        self._write_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        # Keys set / removed here since the last write
+        self._set: Set[str] = set()
+        self._removed: Set[str] = set()
+        self._batch = 0
+        self.writes = 0
+        self._values: Dict[str, Any] = self._read()
+        self.existed = os.path.exists(self.path)
+        _stores.add(self)
+
+    # ----- QSettings-compatible API -----
+    def value(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._values.get(key, default)
+
+    def setValue(self, key: str, value: Any):
+        with self._lock:
+            if key in self._values and self._values[key] == value and type(self._values[key]) is type(value):
+                return
+            self._values[key] = value
+            self._set.add(key)
+            self._removed.discard(key)
+            self._changed()
+
+    def remove(self, key: str):
+        with self._lock:
+            # QSettings semantics: removing "group" drops "group/..." too
+            doomed = [k for k in self._values if k == key or k.startswith(key + "/")]
+            for k in doomed:
+                del self._values[k]
+                self._set.discard(k)
+                self._removed.add(k)
+            if doomed:
+                self._changed()
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return key in self._values
+
+    def allKeys(self) -> List[str]:
+        with self._lock:
+            return sorted(self._values)
+
+    def sync(self):
+        """Write pending changes now (deferred to the end of an open batch())."""
+        with self._write_lock:
+            with self._lock:
+                if self._batch:
+                    return
+                self._cancel_timer()
+                if not self._set and not self._removed:
+                    return
+                changed = {k: self._values[k] for k in self._set}
+                removed, self._set, self._removed = self._removed, set(), set()
+            # Merge into the file as it is now, keeping keys other stores wrote since we read it
+            values = self._read()
+            for k in removed:
+                values.pop(k, None)
+            values.update(changed)
+            try:
+                _write(self.path, {"version": SETTINGS_VERSION, "values": values})
+                self.writes += 1
+                self.existed = True
+            except OSError:
+                with self._lock:
+                    # Retry on the next sync, unless newer changes superseded these keys
+                    self._set |= set(changed) - self._removed
+                    self._removed |= removed - self._set
+                return
+            with self._lock:
+                # Pick up the other stores' keys, except where this one changed since the snapshot
+                for k in self._removed:
+                    values.pop(k, None)
+                for k in self._set:
+                    values[k] = self._values[k]
+                self._values = values
+
+    # ----- Batching -----
+    @contextmanager
+    def batch(self):
+        """Group many setValue/sync calls (e.g. saving every category) into one write."""
+        with self._lock:
+            self._batch += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch -= 1
+                last = self._batch == 0
+            if last:
+                self.sync()
+
+    def _changed(self):
+        if self._batch or self._timer is not None:
+            return
+        self._timer = threading.Timer(self.debounce, self._flush_later)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_later(self):
+        with self._lock:
+            self._timer = None
+        self.sync()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    # ----- Migration -----
+    def migrate_from(self, legacy) -> int:
+        """Copy every key of a QSettings-like store that is missing here; returns the count copied."""
+        copied = 0
+        with self.batch():
+            for key in legacy.allKeys():
+                if not self.contains(key):
+                    self.setValue(key, legacy.value(key))
+                    copied += 1
+        return copied
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == SETTINGS_VERSION and isinstance(data.get("values"), dict):
+                return data["values"]
+        except Exception:
+            pass
+        return {}
+
+
+def _write(path: str, data: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, sort_keys=True, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+@atexit.register
+def _sync_all():
+    for store in list(_stores):
+        store.sync()
@@ -0,0 +1,105 @@
+from __future__ import annotations
+import atexit, json, os, threading, time
+from typing import Any, Dict, List, Optional
+
+# Phase timers for startup and apply.
+#
+# Disabled unless TWEAKER_TRACE is set (to 1 or to an output path) or
+# enable() is called; a disabled phase() returns a shared no-op context, so
+# instrumentation can stay in place. Events are written as a Chrome trace
+# (chrome://tracing, Perfetto) when the process exits or on dump().
+
+DEFAULT_TRACE = "tweaker-trace.json"
+
+_enabled = False
+_path: Optional[str] = None
+_events: List[Dict[str, Any]] = []
+_t0 = time.perf_counter()
+_pid = os.getpid()
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name: str, args: Dict[str, Any]):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        _events.append({
+            "name": self.name, "ph": "X", "pid": _pid, "tid": threading.get_ident(),
+            "ts": round((self.start - _t0) * 1e6, 1), "dur": round((end - self.start) * 1e6, 1),
+            "args": self.args,
+        })
+        return False
+
+
+def phase(name: str, **args):
+    """Time a block: `with phase("build_tab_widget", category=cat): ...`"""
+    if not _enabled:
+        return _NULL
+    return _Phase(name, args)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(path: Optional[str] = None):
+    global _enabled, _path
+    if not _enabled:
+        atexit.register(dump)
+    _enabled = True
+    _path = path or _path or DEFAULT_TRACE
+
+
+def events() -> List[Dict[str, Any]]:
+    return list(_events)
+
+
+def totals() -> Dict[str, float]:
+    """Total milliseconds per phase name."""
+    out: Dict[str, float] = {}
+    for e in list(_events):
+        out[e["name"]] = out.get(e["name"], 0.0) + e["dur"] / 1000.0
+    return out
+
+
+def summary(top: int = 4) -> str:
+    items = sorted(totals().items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return ", ".join(f"{name} {ms:.0f} ms" for name, ms in items)
+
+
+def dump(path: Optional[str] = None) -> Optional[str]:
+    path = path or _path
+    if not path or not _events:
+        return None
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": list(_events), "displayTimeUnit": "ms"}, f, default=str)
+    except OSError:
+        return None
+    return path
+
+
+_env = os.environ.get("TWEAKER_TRACE")
+if _env and _env.lower() not in ("0", "false", "no"):
+    enable(None if _env.lower() in ("1", "true", "yes") else _env)